@@ -1,26 +1,60 @@
-from datetime import date
+from datetime import date, datetime
+from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, File, HTTPException, status, Request, Response, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
 
-from typing import List, Optional
+from typing import List, NamedTuple, Optional, Union
+import io
 import traceback
 
-from app.database import get_db
-from app import models, schemas
+from app import bulk_import, codes, conditional, export, ownership, query
+from app.cache import CachedResponse, company_cache
+from app.database import get_db, get_read_db, read_session_factory
+from app import models, schemas, serializers, statements
+from app.pagination import cursor_values, keyset_paginate, offset_paginate, split_page
+from app.ledger import company_as_of, record_ledger_events
+from app.persons import UnknownPersonError, resolve_person_ids
+from app.replica import DB_REPLICA_STICKY_SECONDS
+from app.search import COMPANY_SORT_KEYS, apply_person_search, company_filter_conditions
+from app.summary import refresh_company_summaries
 
 
 import logging
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=serializers.EncodedResponse)
+
+# SQLite names the columns of a failed unique constraint instead of the constraint
+SHAREHOLDING_UNIQUE = (
+    "uq_shareholdings_company_person",
+    "UNIQUE constraint failed: shareholdings.company_id, shareholdings.person_id",
+)
+COMPANY_REG_CODE_UNIQUE = ("ix_companies_reg_code", "UNIQUE constraint failed: companies.reg_code")
+PERSON_CODE_UNIQUE = (
+    ("uq_persons_id_code", "UNIQUE constraint failed: persons.id_code"),
+    ("uq_persons_reg_code", "UNIQUE constraint failed: persons.reg_code"),
+)
+
+
+def _violates(error: IntegrityError, constraint: str, sqlite_message: str) -> bool:
+    # psycopg2 reports the constraint in diag, asyncpg on the wrapped exception
+    orig = error.orig
+    name = getattr(getattr(orig, "diag", None), "constraint_name", None) \
+        or getattr(orig.__cause__, "constraint_name", None)
+    if name is not None:
+        return name == constraint
+    return sqlite_message in str(orig)
 
 
 @router.post("/persons/", response_model=schemas.Person, status_code=status.HTTP_201_CREATED)
 def create_person(person: schemas.PersonCreate, db: Session = Depends(get_db)):
     try:
-        person_data = person.dict()
+        person_data = person.model_dump()
         if hasattr(person_data["type"], "value"):
             person_data["type"] = person_data["type"].value
 
@@ -30,6 +64,12 @@ def create_person(person: schemas.PersonCreate, db: Session = Depends(get_db)):
         db.refresh(db_person)
 
         return db_person
+    except IntegrityError as e:
+        db.rollback()
+        if any(_violates(e, *constraint) for constraint in PERSON_CODE_UNIQUE):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A person with this code already exists")
+        logger.error(f"Error creating person: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error creating person")
     except Exception as e:
         logger.error(f"Error creating person: {str(e)}")
         logger.error(traceback.format_exc())
@@ -40,13 +80,16 @@ def create_person(person: schemas.PersonCreate, db: Session = Depends(get_db)):
         )
 
 
-@router.get("/persons/", response_model=List[schemas.Person])
+@router.get("/persons/", response_model=Union[List[schemas.Person], schemas.Page[schemas.Person]])
 def get_persons(
+        request: Request,
+        response: Response,
         type: Optional[str] = None,
         search: Optional[str] = None,
         skip: int = 0,
         limit: int = 100,
-        db: Session = Depends(get_db)):
+        cursor: Optional[str] = None,
+        db: Session = Depends(get_read_db)):
     try:
         logger.info(f"Searching persons with type={type}, search={search}")
         query = db.query(models.Person)
@@ -57,41 +100,36 @@ def get_persons(
                     query = query.filter(models.Person.type == type)
                 else:
                     logger.warning(f"Invalid person type: {type}")
-                    return []
+                    return [] if cursor is None else schemas.Page(items=[])
             except Exception as e:
                 logger.error(f"Error filtering by type: {str(e)}")
-                return []
+                return [] if cursor is None else schemas.Page(items=[])
 
         if search and len(search) >= 2:
             try:
-                search_term = f"%{search.lower()}%"
-
-                if type == 'individual':
-                    query = query.filter(
-                        models.Person.first_name.ilike(search_term) |
-                        models.Person.last_name.ilike(search_term) |
-                        models.Person.id_code.ilike(search_term)
-                    )
-                elif type == 'legal':
-                    query = query.filter(
-                        models.Person.legal_name.ilike(search_term) |
-                        models.Person.reg_code.ilike(search_term)
-                    )
-                else:
-                    query = query.filter(
-                        models.Person.first_name.ilike(search_term) |
-                        models.Person.last_name.ilike(search_term) |
-                        models.Person.id_code.ilike(search_term) |
-                        models.Person.legal_name.ilike(search_term) |
-                        models.Person.reg_code.ilike(search_term)
-                    )
+                # Keyset pages are ordered by id, so ranking only applies to offset pages
+                query = apply_person_search(query, search, type, ranked=cursor is None)
             except Exception as e:
                 logger.error(f"Error applying search filters: {str(e)}")
 
         try:
-            persons = query.offset(skip).limit(limit).all()
+            next_cursor = None
+            if cursor is not None:
+                persons, next_cursor = keyset_paginate(query, [models.Person.id], cursor, limit)
+            else:
+                persons = query.order_by(models.Person.id).offset(skip).limit(limit).all()
             logger.info(f"Found {len(persons)} persons matching criteria")
+
+            etag, last_modified = conditional.rows_version("persons", request.url.query, rows=persons)
+            if conditional.is_not_modified(request, etag, last_modified):
+                return conditional.not_modified(etag, last_modified)
+            response.headers.update(conditional.validator_headers(etag, last_modified))
+
+            if cursor is not None:
+                return schemas.Page(items=persons, next_cursor=next_cursor)
             return persons
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Database error retrieving persons: {str(e)}")
             raise HTTPException(
@@ -99,6 +137,8 @@ def get_persons(
                 detail=f"Database error: {str(e)}"
             )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error in get_persons: {str(e)}")
         logger.error(traceback.format_exc())
@@ -108,12 +148,43 @@ def get_persons(
         )
 
 
+@router.post("/persons/batch", response_model=List[schemas.PersonWithShareholdings])
+def get_persons_batch(batch: schemas.PersonBatchRequest, db: Session = Depends(get_read_db)):
+    try:
+        ids = list(dict.fromkeys(batch.ids))
+        if not ids:
+            return []
+
+        persons = (
+            db.query(models.Person)
+            .options(selectinload(models.Person.shareholdings))
+            .filter(models.Person.id.in_(ids))
+            .all()
+        )
+        by_id = {person.id: person for person in persons}
+        return [by_id[person_id] for person_id in ids if person_id in by_id]
+    except Exception as e:
+        logger.error(f"Error retrieving persons batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving persons: {str(e)}"
+        )
+
+
 @router.get("/persons/{person_id}", response_model=schemas.PersonWithShareholdings)
-def get_person(person_id: int, db: Session = Depends(get_db)):
+def get_person(person_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
     try:
-        db_person = db.query(models.Person).filter(models.Person.id == person_id).first()
+        version = conditional.person_version(db, person_id)
+        if version is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person not found")
+        etag, last_modified = version
+        if conditional.is_not_modified(request, etag, last_modified):
+            return conditional.not_modified(etag, last_modified)
+
+        db_person = db.scalars(statements.PERSON_WITH_SHAREHOLDINGS, {"person_id": person_id}).first()
         if db_person is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person not found")
+        response.headers.update(conditional.validator_headers(etag, last_modified))
         return db_person
     except HTTPException:
         raise
@@ -126,24 +197,41 @@ def get_person(person_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/persons/{person_id}", response_model=schemas.Person)
-def update_person(person_id: int, person: schemas.PersonCreate, db: Session = Depends(get_db)):
+def update_person(person_id: int, person: schemas.PersonUpdate, db: Session = Depends(get_db)):
     try:
         db_person = db.query(models.Person).filter(models.Person.id == person_id).first()
         if db_person is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person not found")
-
-        person_data = person.dict()
+        try:
+            # Only a changed code is checked; stored codes may predate validation
+            if person.id_code is not None and person.id_code != db_person.id_code:
+                codes.validate_id_code(person.id_code)
+            if person.reg_code is not None and person.reg_code != db_person.reg_code:
+                codes.validate_registry_code(person.reg_code)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+        person_data = person.model_dump()
         if hasattr(person_data["type"], "value"):
             person_data["type"] = person_data["type"].value
 
         for key, value in person_data.items():
             setattr(db_person, key, value)
 
+        company_ids = [sh.company_id for sh in db_person.shareholdings]
+        refresh_company_summaries(db, company_ids)
         db.commit()
+        company_cache.invalidate(*company_ids)
         db.refresh(db_person)
         return db_person
     except HTTPException:
         raise
+    except IntegrityError as e:
+        db.rollback()
+        if any(_violates(e, *constraint) for constraint in PERSON_CODE_UNIQUE):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A person with this code already exists")
+        logger.error(f"Error updating person {person_id}: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error updating person")
     except Exception as e:
         logger.error(f"Error updating person {person_id}: {str(e)}")
         db.rollback()
@@ -160,8 +248,12 @@ def delete_person(person_id: int, db: Session = Depends(get_db)):
         if db_person is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person not found")
 
+        company_ids = [sh.company_id for sh in db_person.shareholdings]
         db.delete(db_person)
+        refresh_company_summaries(db, company_ids)
+        record_ledger_events(db, company_ids)
         db.commit()
+        company_cache.invalidate(*company_ids)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     except HTTPException:
         raise
@@ -177,8 +269,11 @@ def delete_person(person_id: int, db: Session = Depends(get_db)):
 @router.post("/companies/", response_model=schemas.Company, status_code=status.HTTP_201_CREATED)
 def create_company(company: schemas.CompanyCreate, db: Session = Depends(get_db)):
     try:
-        db_company = models.Company(**company.dict())
+        db_company = models.Company(**company.model_dump())
         db.add(db_company)
+        db.flush()
+        refresh_company_summaries(db, [db_company.id])
+        record_ledger_events(db, [db_company.id])
         db.commit()
         db.refresh(db_company)
         return db_company
@@ -191,64 +286,42 @@ def create_company(company: schemas.CompanyCreate, db: Session = Depends(get_db)
         )
 
 
-@router.get("/companies/", response_model=List[schemas.CompanyWithShareholders])
-def list_companies(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.get(
+    "/companies/",
+    response_model=Union[
+        List[schemas.CompanyWithShareholders],
+        schemas.Page[schemas.CompanyWithShareholders],
+        List[schemas.CompanySummary],
+        schemas.Page[schemas.CompanySummary],
+    ]
+)
+def list_companies(
+        request: Request,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        name: Optional[str] = None,
+        reg_code: Optional[str] = None,
+        founded_from: Optional[date] = None,
+        founded_to: Optional[date] = None,
+        capital_min: Optional[Decimal] = None,
+        capital_max: Optional[Decimal] = None,
+        shareholder: Optional[str] = None,
+        sort: str = "id",
+        view: str = "full",
+        db: Session = Depends(get_read_db)
+):
     try:
-        companies = (
-            db.query(models.Company)
-            .options(
-                joinedload(models.Company.shareholdings).joinedload(models.Shareholding.person)
-            )
-            .offset(skip)
-            .limit(limit)
-            .all()
+        page = load_company_page(
+            db, request, skip=skip, limit=limit, cursor=cursor, name=name, reg_code=reg_code,
+            founded_from=founded_from, founded_to=founded_to, capital_min=capital_min, capital_max=capital_max,
+            shareholder=shareholder, sort=sort, view=view,
         )
-
-        response_data = []
-        for company in companies:
-            company_data = schemas.CompanyWithShareholders(
-                id=company.id,
-                name=company.name,
-                reg_code=company.reg_code,
-                founding_date=company.founding_date,
-                capital=company.capital,
-                created_at=company.created_at,
-                updated_at=company.updated_at,
-                shareholders=[
-                    schemas.ShareholdingWithDetails(
-                        id=sh.id,
-                        company_id=sh.company_id,
-                        person_id=sh.person_id,
-                        share=sh.share,
-                        created_at=sh.created_at,
-                        updated_at=sh.updated_at,
-
-                        company=schemas.Company(
-                            id=company.id,
-                            name=company.name,
-                            reg_code=company.reg_code,
-                            founding_date=company.founding_date,
-                            capital=company.capital,
-                            created_at=company.created_at,
-                            updated_at=company.updated_at,
-                        ),
-                        person=schemas.Person(
-                            id=sh.person.id,
-                            type=sh.person.type.value if hasattr(sh.person.type, "value") else sh.person.type,
-                            first_name=sh.person.first_name,
-                            last_name=sh.person.last_name,
-                            id_code=sh.person.id_code,
-                            legal_name=sh.person.legal_name,
-                            reg_code=sh.person.reg_code,
-                            created_at=sh.person.created_at,
-                            updated_at=sh.person.updated_at,
-                        )
-                    )
-                    for sh in company.shareholdings
-                ]
-            )
-            response_data.append(company_data)
-        return response_data
+        if isinstance(page, Response):
+            return page
+        return render_company_page(page)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -256,79 +329,237 @@ def list_companies(skip: int = 0, limit: int = 100, db: Session = Depends(get_db
         )
 
 
+# The company list and detail handlers are split into the database work and
+# the rendering, so the async handlers in app.async_api can keep serialization
+# and cache IO off the event loop.
+
+class CompanyPage(NamedTuple):
+    view: str
+    rows: list
+    keyset: bool
+    next_cursor: Optional[str]
+    headers: dict
+
+
+def load_company_page(
+        db: Session,
+        request: Request,
+        *,
+        skip: int,
+        limit: int,
+        cursor: Optional[str],
+        name: Optional[str],
+        reg_code: Optional[str],
+        founded_from: Optional[date],
+        founded_to: Optional[date],
+        capital_min: Optional[Decimal],
+        capital_max: Optional[Decimal],
+        shareholder: Optional[str],
+        sort: str,
+        view: str,
+) -> Union[Response, CompanyPage]:
+    sort_key = sort.lstrip("-")
+    if sort_key not in COMPANY_SORT_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported sort: {sort}. Use one of {', '.join(COMPANY_SORT_KEYS)}, optionally prefixed with -"
+        )
+    if view not in ("full", "summary"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported view: {view}")
+    descending = sort.startswith("-")
+    # The summary view reads only the company_summary projection; the full
+    # view pages over companies and loads the shareholder graph.
+    source = models.CompanySummary if view == "summary" else models.Company
+    sort_columns = [source.id]
+    if sort_key != "id":
+        sort_columns.insert(0, getattr(source, sort_key))
+
+    conditions = company_filter_conditions(
+        name=name,
+        reg_code=reg_code,
+        founded_from=founded_from,
+        founded_to=founded_to,
+        capital_min=capital_min,
+        capital_max=capital_max,
+        shareholder=shareholder,
+        source=source,
+    )
+
+    if view == "summary":
+        query = db.query(models.CompanySummary).filter(*conditions)
+        next_cursor = None
+        if cursor is not None:
+            summaries, next_cursor = keyset_paginate(query, sort_columns, cursor, limit, descending)
+        else:
+            summaries = offset_paginate(query, sort_columns, skip, limit, descending)
+
+        etag, last_modified = conditional.rows_version("company_summary", request.url.query, rows=summaries)
+        if conditional.is_not_modified(request, etag, last_modified):
+            return conditional.not_modified(etag, last_modified)
+        return CompanyPage(
+            view, summaries, cursor is not None, next_cursor, conditional.validator_headers(etag, last_modified)
+        )
+
+    # The page is resolved to (id, updated_at) keys first, so an unchanged
+    # page can be answered with 304 before the shareholder graph is loaded.
+    keys = db.query(models.Company.id, models.Company.updated_at, *sort_columns[:-1]).filter(*conditions)
+
+    next_cursor = None
+    if cursor is not None:
+        page, next_cursor = keyset_paginate(keys, sort_columns, cursor, limit, descending)
+    else:
+        page = offset_paginate(keys, sort_columns, skip, limit, descending)
+
+    company_ids = [row.id for row in page]
+    etag, last_modified = conditional.rows_version(
+        "companies", request.url.query, *conditional.shareholders_version(db, company_ids), rows=page
+    )
+    if conditional.is_not_modified(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+
+    companies = []
+    if company_ids:
+        companies = db.scalars(
+            statements.COMPANIES_WITH_SHAREHOLDERS, {"company_ids": company_ids}
+        ).unique().all()
+    position = {company_id: index for index, company_id in enumerate(company_ids)}
+    companies.sort(key=lambda company: position[company.id])
+    return CompanyPage(
+        view, companies, cursor is not None, next_cursor, conditional.validator_headers(etag, last_modified)
+    )
+
+
+def render_company_page(page: CompanyPage) -> Response:
+    if page.view == "summary":
+        response_data = [serializers.company_summary_fields(summary) for summary in page.rows]
+    else:
+        persons = {}
+        response_data = [serializers.company_payload(company, persons) for company in page.rows]
+    if page.keyset:
+        return serializers.EncodedResponse({"items": response_data, "next_cursor": page.next_cursor}, headers=page.headers)
+    return serializers.EncodedResponse(response_data, headers=page.headers)
+
 
 @router.get("/companies/{company_id}", response_model=schemas.CompanyWithShareholders)
-def get_company(company_id: int, db: Session = Depends(get_db)):
+def get_company(
+        company_id: int,
+        request: Request,
+        as_of: Optional[datetime] = None,
+        db: Session = Depends(get_read_db)
+):
     try:
-        db_company = (
-            db.query(models.Company)
-            .options(joinedload(models.Company.shareholdings).joinedload(models.Shareholding.person))
-            .filter(models.Company.id == company_id)
-            .first()
+        if as_of is not None:
+            return company_as_of_response(company_id, load_company_as_of(db, company_id, as_of), request)
+
+        cached = company_cache.get(company_id)
+        if cached is not None:
+            return cached_company_response(request, cached)
+
+        token = company_cache.token(company_id)
+        loaded = load_company(db, company_id, request)
+        if isinstance(loaded, Response):
+            return loaded
+        return company_response(company_id, loaded, token)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving company: {str(e)}"
         )
-        if db_company is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
 
-        company_data = schemas.CompanyWithShareholders(
-            id=db_company.id,
-            name=db_company.name,
-            reg_code=db_company.reg_code,
-            founding_date=db_company.founding_date,
-            capital=db_company.capital,
-            created_at=db_company.created_at,
-            updated_at=db_company.updated_at,
-            shareholders=[
-                schemas.ShareholdingWithDetails(
-                    id=sh.id,
-                    company_id=sh.company_id,
-                    person_id=sh.person_id,
-                    share=sh.share,
-                    is_founder=sh.is_founder,
-                    created_at=sh.created_at,
-                    updated_at=sh.updated_at,
-                    company=schemas.Company(
-                        id=db_company.id,
-                        name=db_company.name,
-                        reg_code=db_company.reg_code,
-                        founding_date=db_company.founding_date,
-                        capital=db_company.capital,
-                        created_at=db_company.created_at,
-                        updated_at=db_company.updated_at,
-                    ),
-                    person=schemas.Person(
-                        id=sh.person.id,
-                        type=sh.person.type.value if hasattr(sh.person.type, "value") else sh.person.type,
-                        first_name=sh.person.first_name,
-                        last_name=sh.person.last_name,
-                        id_code=sh.person.id_code,
-                        legal_name=sh.person.legal_name,
-                        reg_code=sh.person.reg_code,
-                        created_at=sh.person.created_at,
-                        updated_at=sh.person.updated_at,
-                    )
-                )
-                for sh in db_company.shareholdings
-            ]
-        )
-        return company_data
+
+class LoadedCompany(NamedTuple):
+    company: models.Company
+    etag: str
+    last_modified: Optional[datetime]
+    # How stale the cached response may be: replica reads can lag the primary
+    max_lag: float
+
+
+def cached_company_response(request: Request, cached: CachedResponse) -> Response:
+    last_modified = conditional.parse_http_date(cached.headers.get("Last-Modified"))
+    if conditional.is_not_modified(request, cached.headers["ETag"], last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cached.headers)
+    return serializers.encoded_body(cached.body, cached.headers)
+
+
+def load_company(db: Session, company_id: int, request: Request) -> Union[Response, LoadedCompany]:
+    version = conditional.company_version(db, company_id)
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
+    etag, last_modified = version
+    if conditional.is_not_modified(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+
+    db_company = db.scalars(statements.COMPANY_WITH_SHAREHOLDERS, {"company_id": company_id}).unique().first()
+    if db_company is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
+    max_lag = DB_REPLICA_STICKY_SECONDS if db.info.get("replica") else 0.0
+    return LoadedCompany(db_company, etag, last_modified, max_lag)
+
+
+def company_response(company_id: int, loaded: LoadedCompany, token) -> Response:
+    body = serializers.dumps(serializers.company_payload(loaded.company))
+    headers = conditional.validator_headers(loaded.etag, loaded.last_modified)
+    company_cache.set(company_id, CachedResponse(body, headers), token, loaded.max_lag)
+    return serializers.encoded_body(body, headers)
+
+
+def load_company_as_of(db: Session, company_id: int, as_of: datetime) -> dict:
+    payload = company_as_of(db, company_id, conditional.naive_utc(as_of))
+    if payload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found at the given time")
+    return payload
+
+
+def company_as_of_response(company_id: int, payload: dict, request: Request) -> Response:
+    body = serializers.dumps(payload)
+    etag, last_modified = conditional.make_etag("company", company_id, body), payload["updated_at"]
+    if conditional.is_not_modified(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    return serializers.encoded_body(body, conditional.validator_headers(etag, last_modified))
+
+
+@router.get("/companies/{company_id}/beneficial_owners", response_model=schemas.BeneficialOwnership)
+def get_beneficial_owners(
+        company_id: int,
+        max_depth: int = Query(ownership.MAX_DEPTH, ge=1, le=50),
+        db: Session = Depends(get_read_db)
+):
+    try:
+        if db.get(models.Company, company_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
+        return serializers.EncodedResponse(ownership.beneficial_owners(db, company_id, max_depth))
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.error(f"Error resolving beneficial owners of company {company_id}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error retrieving company: {str(e)}"
+            detail=f"Error resolving beneficial owners: {str(e)}"
         )
 
 
 @router.put("/companies/{company_id}", response_model=schemas.Company)
-def update_company(company_id: int, company: schemas.CompanyCreate, db: Session = Depends(get_db)):
+def update_company(company_id: int, company: schemas.CompanyUpdate, db: Session = Depends(get_db)):
     try:
         db_company = db.query(models.Company).filter(models.Company.id == company_id).first()
         if db_company is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
+        if company.reg_code != db_company.reg_code:
+            try:
+                codes.validate_registry_code(company.reg_code)
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
 
-        for key, value in company.dict().items():
+        for key, value in company.model_dump().items():
             setattr(db_company, key, value)
 
+        refresh_company_summaries(db, [company_id])
+        record_ledger_events(db, [company_id])
         db.commit()
+        company_cache.invalidate(company_id)
         db.refresh(db_company)
         return db_company
     except HTTPException:
@@ -350,7 +581,9 @@ def delete_company(company_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
 
         db.delete(db_company)
+        refresh_company_summaries(db, [company_id])
         db.commit()
+        company_cache.invalidate(company_id)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     except HTTPException:
         raise
@@ -374,13 +607,25 @@ def create_shareholding(shareholding: schemas.ShareholdingCreate, db: Session =
         if not person:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person not found")
 
-        db_shareholding = models.Shareholding(**shareholding.dict())
+        db_shareholding = models.Shareholding(**shareholding.model_dump())
         db.add(db_shareholding)
+        refresh_company_summaries(db, [shareholding.company_id])
+        record_ledger_events(db, [shareholding.company_id])
         db.commit()
+        company_cache.invalidate(shareholding.company_id)
         db.refresh(db_shareholding)
         return db_shareholding
     except HTTPException:
         raise
+    except IntegrityError as e:
+        db.rollback()
+        if _violates(e, *SHAREHOLDING_UNIQUE):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The person is already a shareholder of this company"
+            )
+        logger.error(f"Error creating shareholding: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error creating shareholding")
     except Exception as e:
         logger.error(f"Error creating shareholding: {str(e)}")
         db.rollback()
@@ -390,24 +635,65 @@ def create_shareholding(shareholding: schemas.ShareholdingCreate, db: Session =
         )
 
 
-@router.get("/shareholdings/", response_model=List[schemas.Shareholding])
+@router.get(
+    "/shareholdings/",
+    response_model=Union[List[schemas.ShareholdingWithPerson], schemas.Page[schemas.ShareholdingWithPerson]]
+)
 def list_shareholdings(
+        request: Request,
         skip: int = 0,
         limit: int = 100,
         company_id: Optional[int] = None,
         person_id: Optional[int] = None,
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = None,
+        include: Optional[str] = None,
+        db: Session = Depends(get_read_db)
 ):
     try:
-        query = db.query(models.Shareholding)
+        expand = set(include.split(",")) if include else set()
+        if expand - {"person"}:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported include: {', '.join(sorted(expand - {'person'}))}"
+            )
 
-        if company_id:
-            query = query.filter(models.Shareholding.company_id == company_id)
-        if person_id:
-            query = query.filter(models.Shareholding.person_id == person_id)
+        columns = [models.Shareholding.id]
+        after_id = cursor_values(columns, cursor)[0] if cursor else None
+        stmt = statements.shareholdings_page(bool(company_id), bool(person_id), "person" in expand, after_id is not None)
+        params = {"company_id": company_id, "person_id": person_id, "after_id": after_id, "skip": skip, "limit": limit}
+
+        next_cursor = None
+        if cursor is not None:
+            # Keyset pages fetch one extra row to tell whether another page follows
+            shareholdings = db.scalars(stmt, {**params, "skip": 0, "limit": limit + 1}).all()
+            shareholdings, next_cursor = split_page(shareholdings, columns, limit)
+        else:
+            shareholdings = db.scalars(stmt, params).all()
+
+        related = [sh.person for sh in shareholdings] if "person" in expand else []
+        etag, last_modified = conditional.rows_version(
+            "shareholdings", request.url.query, *((p.id, p.updated_at) for p in related), rows=shareholdings
+        )
+        last_modified = conditional.latest(last_modified, *(p.updated_at for p in related))
+        if conditional.is_not_modified(request, etag, last_modified):
+            return conditional.not_modified(etag, last_modified)
 
-        shareholdings = query.offset(skip).limit(limit).all()
-        return shareholdings
+        persons = {}
+        response_data = []
+        for sh in shareholdings:
+            item = serializers.shareholding_fields(sh)
+            if "person" in expand:
+                item["person"] = persons.get(sh.person_id)
+                if item["person"] is None:
+                    item["person"] = persons[sh.person_id] = serializers.person_fields(sh.person)
+            response_data.append(item)
+
+        headers = conditional.validator_headers(etag, last_modified)
+        if cursor is not None:
+            return serializers.EncodedResponse({"items": response_data, "next_cursor": next_cursor}, headers=headers)
+        return serializers.EncodedResponse(response_data, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving shareholdings: {str(e)}")
         raise HTTPException(
@@ -417,9 +703,11 @@ def list_shareholdings(
 
 
 @router.get("/shareholdings/{shareholding_id}", response_model=schemas.ShareholdingWithDetails)
-def get_shareholding(shareholding_id: int, db: Session = Depends(get_db)):
+def get_shareholding(shareholding_id: int, db: Session = Depends(get_read_db)):
     try:
-        db_shareholding = db.query(models.Shareholding).filter(models.Shareholding.id == shareholding_id).first()
+        db_shareholding = db.scalars(
+            statements.SHAREHOLDING_WITH_DETAILS, {"shareholding_id": shareholding_id}
+        ).first()
         if db_shareholding is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shareholding not found")
         return db_shareholding
@@ -448,14 +736,27 @@ def update_shareholding(shareholding_id: int, shareholding: schemas.Shareholding
         if not person:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Person not found")
 
-        for key, value in shareholding.dict().items():
+        previous_company_id = db_shareholding.company_id
+        for key, value in shareholding.model_dump().items():
             setattr(db_shareholding, key, value)
 
+        refresh_company_summaries(db, [previous_company_id, shareholding.company_id])
+        record_ledger_events(db, [previous_company_id, shareholding.company_id])
         db.commit()
+        company_cache.invalidate(previous_company_id, shareholding.company_id)
         db.refresh(db_shareholding)
         return db_shareholding
     except HTTPException:
         raise
+    except IntegrityError as e:
+        db.rollback()
+        if _violates(e, *SHAREHOLDING_UNIQUE):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The person is already a shareholder of this company"
+            )
+        logger.error(f"Error updating shareholding {shareholding_id}: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error updating shareholding")
     except Exception as e:
         logger.error(f"Error updating shareholding {shareholding_id}: {str(e)}")
         db.rollback()
@@ -472,8 +773,12 @@ def delete_shareholding(shareholding_id: int, db: Session = Depends(get_db)):
         if db_shareholding is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shareholding not found")
 
+        company_id = db_shareholding.company_id
         db.delete(db_shareholding)
+        refresh_company_summaries(db, [company_id])
+        record_ledger_events(db, [company_id])
         db.commit()
+        company_cache.invalidate(company_id)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     except HTTPException:
         raise
@@ -488,55 +793,87 @@ def delete_shareholding(shareholding_id: int, db: Session = Depends(get_db)):
 @router.put("/companies/{company_id}/capital_update", response_model=schemas.CompanyWithShareholders)
 def update_company_capital(company_id: int, payload: schemas.CapitalIncreaseUpdate, db: Session = Depends(get_db)):
     try:
+        total_shares = sum(s.share for s in payload.shareholders)
+        if total_shares != payload.new_capital:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Sum of shareholder shares does not equal the new capital"
+            )
+
         with db.begin():
-            company = db.query(models.Company).filter(models.Company.id == company_id).first()
+            # The company row lock serializes concurrent capital changes; the
+            # shareholdings are locked with it in one query.
+            company = (
+                db.query(models.Company)
+                .filter(models.Company.id == company_id)
+                .with_for_update()
+                .first()
+            )
             if not company:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
-
-            total_shares = sum(s.share for s in payload.shareholders)
-            if total_shares != payload.new_capital:
+            if company.capital != payload.original_capital:
                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Sum of shareholder shares does not equal the new capital"
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Company capital has changed since it was loaded"
                 )
 
-            company.capital = payload.new_capital
+            holders = dict(db.execute(
+                select(models.Shareholding.id, models.Shareholding.person_id)
+                .where(models.Shareholding.company_id == company_id)
+                .with_for_update()
+            ).all())
+            updated = [s for s in payload.shareholders if s.id]
+            if any(s.id not in holders for s in updated):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shareholding not found")
 
-            for s in payload.shareholders:
-                if s.id:
-                    sh = db.query(models.Shareholding).filter(
-                        models.Shareholding.id == s.id,
-                        models.Shareholding.company_id == company_id
-                    ).first()
-                    if not sh:
-                        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shareholding not found")
-                    sh.share = s.share
-                    sh.is_founder = s.is_founder
-                else:
-                    if s.type == schemas.PersonType.INDIVIDUAL:
-                        new_person = models.Person(
-                            type=s.type.value,
-                            first_name=s.first_name,
-                            last_name=s.last_name,
-                            id_code=s.id_code
-                        )
-                    else:
-                        new_person = models.Person(
-                            type=s.type.value,
-                            legal_name=s.legal_name,
-                            reg_code=s.reg_code
-                        )
-                    db.add(new_person)
-                    db.flush()
-                    new_sh = models.Shareholding(
-                        company_id=company_id,
-                        person_id=new_person.id,
-                        share=s.share,
-                        is_founder=s.is_founder
+            company.capital = payload.new_capital
+            now = datetime.utcnow()
+
+            if updated:
+                # Bulk UPDATE by primary key, sent as a single executemany
+                db.execute(update(models.Shareholding), [
+                    {"id": s.id, "share": s.share, "is_founder": s.is_founder, "updated_at": now}
+                    for s in updated
+                ])
+
+            added = [s for s in payload.shareholders if not s.id]
+            if added:
+                person_ids = resolve_person_ids(db, added)
+                if set(person_ids) & set(holders.values()) or len(set(person_ids)) < len(person_ids):
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="A new shareholder is already a shareholder of this company"
                     )
-                    db.add(new_sh)
-            db.refresh(company)
-        return company
+                db.execute(insert(models.Shareholding), [
+                    {"company_id": company_id, "person_id": person_id, "share": s.share, "is_founder": s.is_founder}
+                    for s, person_id in zip(added, person_ids)
+                ])
+            refresh_company_summaries(db, [company_id])
+            record_ledger_events(db, [company_id])
+        company_cache.invalidate(company_id)
+
+        company = (
+            db.query(models.Company)
+            .options(joinedload(models.Company.shareholdings).joinedload(models.Shareholding.person))
+            .filter(models.Company.id == company_id)
+            .populate_existing()
+            .one()
+        )
+        return serializers.EncodedResponse(serializers.company_payload(company))
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        db.rollback()
+        if _violates(e, *SHAREHOLDING_UNIQUE):
+            # Another request made the person a shareholder in the meantime
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A new shareholder is already a shareholder of this company"
+            )
+        logger.error(f"Error updating capital of company {company_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error updating company capital"
+        )
     except Exception as e:
         db.rollback()
         logger.error(traceback.format_exc())
@@ -559,42 +896,102 @@ def register_company(registration: schemas.CompanyRegistration, db: Session = De
             db.add(db_company)
             db.flush()
 
-            for sh in registration.shareholders:
-                if sh.id:
-                    # Use the existing person id
-                    person_id = sh.id
-                else:
-                    # Create new person
-                    if sh.type == schemas.PersonType.INDIVIDUAL:
-                        person_data = {
-                            "type": sh.type.value,
-                            "first_name": sh.first_name,
-                            "last_name": sh.last_name,
-                            "id_code": sh.id_code
-                        }
-                    else:
-                        person_data = {
-                            "type": sh.type.value,
-                            "legal_name": sh.legal_name,
-                            "reg_code": sh.reg_code
-                        }
-                    db_person = models.Person(**person_data)
-                    db.add(db_person)
-                    db.flush()
-                    person_id = db_person.id
-
-                db_shareholding = models.Shareholding(
-                    company_id=db_company.id,
-                    person_id=person_id,
-                    share=sh.share,
-                    is_founder=True
-                )
-                db.add(db_shareholding)
-        db.refresh(db_company)
-        return db_company
+            # Existing persons are reused by code; only new ones are inserted
+            person_ids = resolve_person_ids(db, registration.shareholders)
+            if registration.shareholders:
+                db.execute(insert(models.Shareholding), [
+                    {"company_id": db_company.id, "person_id": person_id, "share": sh.share, "is_founder": True}
+                    for sh, person_id in zip(registration.shareholders, person_ids)
+                ])
+            refresh_company_summaries(db, [db_company.id])
+            record_ledger_events(db, [db_company.id])
+        company_cache.invalidate(db_company.id)
+
+        db_company = (
+            db.query(models.Company)
+            .options(joinedload(models.Company.shareholdings).joinedload(models.Shareholding.person))
+            .filter(models.Company.id == db_company.id)
+            .populate_existing()
+            .one()
+        )
+        return serializers.EncodedResponse(serializers.company_payload(db_company), status_code=status.HTTP_201_CREATED)
+    except HTTPException:
+        raise
+    except UnknownPersonError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except IntegrityError as e:
+        logger.error(f"Error registering company: {str(e)}")
+        if _violates(e, *COMPANY_REG_CODE_UNIQUE):
+            detail = "A company with this registration code already exists"
+        elif _violates(e, *SHAREHOLDING_UNIQUE):
+            detail = "A person is listed more than once as a shareholder"
+        else:
+            detail = "The registration conflicts with existing data"
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
     except Exception as e:
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error registering company: {str(e)}"
         )
+
+
+@router.post("/query")
+def run_query(request: schemas.QueryRequest, db: Session = Depends(get_read_db)):
+    try:
+        return serializers.EncodedResponse(query.run_query(
+            db, request.root, request.fields, ids=request.ids, limit=request.limit, cursor=request.cursor
+        ))
+    except query.QueryError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running query on {request.root}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error running query: {str(e)}"
+        )
+
+
+@router.post("/import/{entity}", response_model=schemas.ImportResult)
+def import_entities(
+        entity: str,
+        file: UploadFile = File(...),
+        format: Optional[str] = None,
+        batch_size: int = Query(bulk_import.BATCH_SIZE, ge=1, le=10000),
+        db: Session = Depends(get_db)
+):
+    if entity not in bulk_import.ENTITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported entity: {entity}. Use one of {', '.join(bulk_import.ENTITIES)}"
+        )
+    fmt = format or bulk_import.detect_format(file.filename)
+    if fmt not in bulk_import.FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported format: {fmt}")
+
+    try:
+        stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        return bulk_import.import_stream(db, entity, stream, fmt, batch_size)
+    except Exception as e:
+        logger.error(f"Error importing {entity}: {str(e)}")
+        logger.error(traceback.format_exc())
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing {entity}: {str(e)}"
+        )
+
+
+@router.get("/export/companies")
+def export_companies(request: Request, format: str = "ndjson", updated_since: Optional[datetime] = None):
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported format: {format}")
+    if updated_since is not None:
+        updated_since = conditional.naive_utc(updated_since)
+    return StreamingResponse(
+        export.stream_companies(format, updated_since, read_session_factory(request)),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="companies.{format}"'},
+    )
@@ -0,0 +1,113 @@
+import functools
+import inspect
+from typing import Callable
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from app import api
+from app.database import get_async_db, get_async_read_db, get_db, get_read_db
+
+ASYNC_DEPENDENCIES = {get_db: get_async_db, get_read_db: get_async_read_db}
+# CPU-bound handlers stay sync: run_sync executes the handler body on the event
+# loop, and reading and validating a whole upload would block every other
+# request. FastAPI runs them in its threadpool with a sync session instead.
+THREADPOOL_ENDPOINTS = {"import_entities"}
+
+
+async def get_company(db, company_id: int, request: Request, as_of=None):
+    try:
+        if as_of is not None:
+            payload = await db.run_sync(api.load_company_as_of, company_id, as_of)
+            return await run_in_threadpool(api.company_as_of_response, company_id, payload, request)
+
+        cached = await run_in_threadpool(api.company_cache.get, company_id)
+        if cached is not None:
+            return await run_in_threadpool(api.cached_company_response, request, cached)
+
+        token = await run_in_threadpool(api.company_cache.token, company_id)
+        loaded = await db.run_sync(api.load_company, company_id, request)
+        if isinstance(loaded, Response):
+            return loaded
+        return await run_in_threadpool(api.company_response, company_id, loaded, token)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving company: {str(e)}"
+        )
+
+
+async def list_companies(db, request: Request, **params):
+    try:
+        page = await db.run_sync(lambda session: api.load_company_page(session, request, **params))
+        if isinstance(page, Response):
+            return page
+        return await run_in_threadpool(api.render_company_page, page)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving companies: {str(e)}"
+        )
+
+
+# Hot read routes with native handlers: only the queries run through
+# run_sync, while cache IO and serialization go to the threadpool, so a slow
+# Redis call or a large payload does not stall the event loop.
+NATIVE_ENDPOINTS = {"get_company": get_company, "list_companies": list_companies}
+
+
+def _async_endpoint(endpoint: Callable) -> Callable:
+    # Other handlers run their sync body through AsyncSession.run_sync, so
+    # they keep using the ORM Session API while every query goes over the
+    # async driver on the event loop instead of occupying a threadpool worker.
+    if endpoint.__name__ in THREADPOOL_ENDPOINTS:
+        return endpoint
+    signature = inspect.signature(endpoint)
+    db_param = next(
+        (name for name, param in signature.parameters.items()
+         if getattr(param.default, "dependency", None) in ASYNC_DEPENDENCIES),
+        None
+    )
+    if db_param is None:
+        return endpoint
+    async_dependency = ASYNC_DEPENDENCIES[signature.parameters[db_param].default.dependency]
+
+    native = NATIVE_ENDPOINTS.get(endpoint.__name__)
+
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        db = kwargs.pop(db_param)
+        if native is not None:
+            return await native(db, **kwargs)
+        return await db.run_sync(lambda session: endpoint(**kwargs, **{db_param: session}))
+
+    wrapper.__signature__ = signature.replace(parameters=[
+        param.replace(default=Depends(async_dependency)) if name == db_param else param
+        for name, param in signature.parameters.items()
+    ])
+    return wrapper
+
+
+def build_async_router(sync_router: APIRouter) -> APIRouter:
+    router = APIRouter()
+    for route in sync_router.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        router.add_api_route(
+            route.path,
+            _async_endpoint(route.endpoint),
+            response_model=route.response_model,
+            status_code=route.status_code,
+            methods=route.methods,
+            name=route.name,
+            summary=route.summary,
+            description=route.description,
+            responses=route.responses,
+            response_class=route.response_class,
+        )
+    return router
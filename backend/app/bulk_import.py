@@ -0,0 +1,275 @@
+import argparse
+import csv
+import json
+import logging
+import sys
+from itertools import islice
+from typing import IO, Iterator, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.cache import company_cache
+from app.ledger import record_ledger_events
+from app.summary import refresh_company_summaries
+
+logger = logging.getLogger(__name__)
+
+ENTITIES = ("persons", "companies", "shareholdings")
+FORMATS = ("csv", "ndjson")
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+ROW_SCHEMAS = {
+    "persons": schemas.PERSON_CREATE,
+    "companies": TypeAdapter(schemas.CompanyCreate),
+    "shareholdings": TypeAdapter(schemas.ShareholdingImport),
+}
+
+TARGET_MODELS = {
+    "persons": models.Person,
+    "companies": models.Company,
+    "shareholdings": models.Shareholding,
+}
+
+
+def detect_format(filename: Optional[str]) -> str:
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return "ndjson"
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    # Yields (row number, record) pairs; unparseable records are yielded as
+    # the exception so they can be reported without stopping the import.
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            yield number, {key: (value if value != "" else None) for key, value in row.items() if key is not None}
+        return
+
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in error.errors()
+        )
+    return str(getattr(error, "orig", error))
+
+
+class BulkImporter:
+    def __init__(self, db: Session, entity: str, batch_size: int = BATCH_SIZE):
+        if entity not in ENTITIES:
+            raise ValueError(f"Unknown entity: {entity}")
+        self.db = db
+        self.entity = entity
+        self.batch_size = batch_size
+        self.model = TARGET_MODELS[entity]
+        self.schema = ROW_SCHEMAS[entity]
+        self.result = schemas.ImportResult(entity=entity)
+        self.touched_company_ids = set()
+
+    def error(self, number: int, message: str):
+        self.result.error_count += 1
+        if len(self.result.errors) < MAX_REPORTED_ERRORS:
+            self.result.errors.append(schemas.ImportRowError(row=number, error=message))
+
+    def run(self, rows: Iterator[Tuple[int, object]]) -> schemas.ImportResult:
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.result.processed += len(batch)
+
+            valid = []
+            for number, record in batch:
+                if isinstance(record, Exception):
+                    self.error(number, f"Malformed record: {record}")
+                    continue
+                try:
+                    valid.append((number, self.schema.validate_python(record)))
+                except (ValidationError, TypeError) as e:
+                    self.error(number, _describe(e))
+
+            prepare = getattr(self, f"_prepare_{self.entity}")
+            self._insert(prepare(valid))
+
+        company_cache.invalidate(*self.touched_company_ids)
+        logger.info(
+            f"Imported {self.entity}: {self.result.inserted} inserted, "
+            f"{self.result.skipped} skipped, {self.result.error_count} errors"
+        )
+        return self.result
+
+    def _existing(self, column, values) -> set:
+        if not values:
+            return set()
+        return set(self.db.scalars(select(column).where(column.in_(values))))
+
+    def _prepare_persons(self, batch: List[tuple]) -> List[tuple]:
+        # Persons are deduplicated on id_code (individuals) or reg_code (legal
+        # persons), both against the database and within the batch.
+        id_codes = {p.id_code for _, p in batch if p.type == schemas.PersonType.INDIVIDUAL}
+        reg_codes = {p.reg_code for _, p in batch if p.type == schemas.PersonType.LEGAL}
+        seen = {
+            "id_code": self._existing(models.Person.id_code, id_codes),
+            "reg_code": self._existing(models.Person.reg_code, reg_codes),
+        }
+
+        rows = []
+        for number, person in batch:
+            field = "id_code" if person.type == schemas.PersonType.INDIVIDUAL else "reg_code"
+            code = getattr(person, field)
+            if code in seen[field]:
+                self.result.skipped += 1
+                continue
+            seen[field].add(code)
+            data = person.model_dump()
+            data["type"] = person.type.value
+            rows.append((number, data))
+        return rows
+
+    def _prepare_companies(self, batch: List[tuple]) -> List[tuple]:
+        seen = self._existing(models.Company.reg_code, {c.reg_code for _, c in batch})
+
+        rows = []
+        for number, company in batch:
+            if company.reg_code in seen:
+                self.result.skipped += 1
+                continue
+            seen.add(company.reg_code)
+            rows.append((number, company.model_dump()))
+        return rows
+
+    def _prepare_shareholdings(self, batch: List[tuple]) -> List[tuple]:
+        # Shareholdings reference companies and persons by their natural keys,
+        # resolved here with one IN query per key type.
+        company_ids = dict(self.db.execute(
+            select(models.Company.reg_code, models.Company.id)
+            .where(models.Company.reg_code.in_({s.company_reg_code for _, s in batch}))
+        ).all())
+        by_id_code = dict(self.db.execute(
+            select(models.Person.id_code, models.Person.id)
+            .where(models.Person.id_code.in_({s.person_id_code for _, s in batch if s.person_id_code}))
+        ).all())
+        by_reg_code = dict(self.db.execute(
+            select(models.Person.reg_code, models.Person.id)
+            .where(models.Person.reg_code.in_({s.person_reg_code for _, s in batch if s.person_reg_code}))
+        ).all())
+        seen = set(self.db.execute(
+            select(models.Shareholding.company_id, models.Shareholding.person_id)
+            .where(models.Shareholding.company_id.in_(set(company_ids.values())))
+        ).all())
+
+        rows = []
+        for number, shareholding in batch:
+            company_id = company_ids.get(shareholding.company_reg_code)
+            if shareholding.person_id_code:
+                person_id = by_id_code.get(shareholding.person_id_code)
+            else:
+                person_id = by_reg_code.get(shareholding.person_reg_code)
+            if company_id is None:
+                self.error(number, f"Unknown company reg_code: {shareholding.company_reg_code}")
+                continue
+            if person_id is None:
+                self.error(number, "Unknown person code")
+                continue
+            if (company_id, person_id) in seen:
+                self.result.skipped += 1
+                continue
+            seen.add((company_id, person_id))
+            rows.append((number, {
+                "company_id": company_id,
+                "person_id": person_id,
+                "share": shareholding.share,
+                "is_founder": shareholding.is_founder,
+            }))
+        return rows
+
+    def _insert(self, rows: List[tuple]):
+        if not rows:
+            return
+        try:
+            # executemany; SQLAlchemy batches this into multi-row INSERTs
+            self.db.execute(insert(self.model), [data for _, data in rows])
+            self._refresh_summaries(rows)
+            self.db.commit()
+            self.result.inserted += len(rows)
+            self._touch(rows)
+            return
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"Batch insert of {self.entity} failed, retrying row by row: {str(e)}")
+
+        for number, data in rows:
+            try:
+                self.db.execute(insert(self.model), [data])
+                self._refresh_summaries([(number, data)])
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                self.error(number, _describe(e))
+                continue
+            self.result.inserted += 1
+            self._touch([(number, data)])
+
+    def _refresh_summaries(self, rows: List[tuple]):
+        if self.entity == "companies":
+            company_ids = self.db.scalars(
+                select(models.Company.id).where(models.Company.reg_code.in_([data["reg_code"] for _, data in rows]))
+            )
+        elif self.entity == "shareholdings":
+            company_ids = [data["company_id"] for _, data in rows]
+        else:
+            return
+        company_ids = set(company_ids)
+        refresh_company_summaries(self.db, company_ids)
+        record_ledger_events(self.db, company_ids)
+
+    def _touch(self, rows: List[tuple]):
+        if self.entity == "shareholdings":
+            self.touched_company_ids.update(data["company_id"] for _, data in rows)
+
+
+def import_stream(db: Session, entity: str, stream: IO[str], fmt: str, batch_size: int = BATCH_SIZE) -> schemas.ImportResult:
+    return BulkImporter(db, entity, batch_size).run(read_rows(stream, fmt))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import persons, companies or shareholdings from CSV or NDJSON")
+    parser.add_argument("entity", choices=ENTITIES)
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to csv for .csv files and ndjson otherwise")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    fmt = args.format or detect_format(args.path)
+    db = SessionLocal()
+    try:
+        if args.path == "-":
+            result = import_stream(db, args.entity, sys.stdin, fmt, args.batch_size)
+        else:
+            with open(args.path, encoding="utf-8-sig", newline="") as stream:
+                result = import_stream(db, args.entity, stream, fmt, args.batch_size)
+    finally:
+        db.close()
+
+    print(result.model_dump_json(indent=2))
+    return 1 if result.error_count else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sys.exit(main())
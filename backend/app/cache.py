@@ -0,0 +1,204 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+import orjson
+
+CACHE_BACKEND = os.getenv("COMPANY_CACHE_BACKEND", "memory").lower()
+CACHE_SIZE = int(os.getenv("COMPANY_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.getenv("COMPANY_CACHE_TTL", "300"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Worker count of uvicorn --workers and gunicorn; the memory backend needs 1
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+VERSION_TTL = 86400
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+
+    def pack(self) -> bytes:
+        return orjson.dumps(self.headers) + b"\n" + self.body
+
+    @classmethod
+    def unpack(cls, value: bytes) -> "CachedResponse":
+        headers, body = value.split(b"\n", 1)
+        return cls(body, orjson.loads(headers))
+
+
+class LRUBackend:
+    # Per process: an invalidation in one worker cannot reach the others, so
+    # build_company_cache only uses it when the app runs a single worker.
+    # Versions are one epoch for all keys, which is enough within a process.
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._invalidated_at = float("-inf")
+        self.evictions = 0
+
+    def get(self, key: str) -> Tuple[Optional[bytes], int]:
+        # The entry and the key's current version
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, self._epoch
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None, self._epoch
+            self._entries.move_to_end(key)
+            return value, self._epoch
+
+    def version(self, key: str) -> Tuple[int, float]:
+        return self._epoch, self._invalidated_at
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Iterable[str]):
+        with self._lock:
+            self._epoch += 1
+            self._invalidated_at = time.time()
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    # Works with any client exposing redis-py's get/set/delete, hash commands
+    # and pipelines, including fakeredis for local runs. Each key has a
+    # version hash shared by all workers; INCR on invalidation makes entries
+    # stored under an older version unusable everywhere.
+    def __init__(self, client, ttl: float, prefix: str = "company-cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _version_key(self, key: str) -> str:
+        return f"{self.prefix}version:{key}"
+
+    def get(self, key: str) -> Tuple[Optional[bytes], int]:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(self.prefix + key)
+        pipe.hget(self._version_key(key), "version")
+        value, version = pipe.execute()
+        return value, int(version or 0)
+
+    def version(self, key: str) -> Tuple[int, float]:
+        version, invalidated_at = self.client.hmget(self._version_key(key), "version", "at")
+        return int(version or 0), float(invalidated_at or "-inf")
+
+    def set(self, key: str, value: bytes):
+        self.client.set(self.prefix + key, value, ex=max(1, int(self.ttl)))
+
+    def invalidate(self, keys: Iterable[str]):
+        now = time.time()
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.hincrby(self._version_key(key), "version", 1)
+            pipe.hset(self._version_key(key), "at", repr(now))
+            # Kept far longer than any read takes, so a version never
+            # resets under a read that started before it was bumped
+            pipe.expire(self._version_key(key), VERSION_TTL)
+            pipe.delete(self.prefix + key)
+        pipe.execute()
+
+
+class ResponseCache:
+    # Entries carry the version their read started under. A read that
+    # overlapped an invalidation may have loaded rows from before the write
+    # committed; its entry no longer matches the key's version and is
+    # treated as a miss, whichever worker stored it.
+    def __init__(self, backend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _lookup(self, key: str) -> Optional[CachedResponse]:
+        value, current = self.backend.get(key)
+        if value is None:
+            return None
+        version, value = value.split(b"\n", 1)
+        if int(version) != current:
+            return None
+        return CachedResponse.unpack(value)
+
+    def get(self, key) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        cached = self._lookup(str(key))
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cached
+
+    def token(self, key) -> int:
+        return self.backend.version(str(key))[0] if self.enabled else 0
+
+    def set(self, key, value: CachedResponse, token: int, max_lag: float = 0.0):
+        # Reads from a replica pass max_lag, since for that long after an
+        # invalidation the replica may still hold the old rows.
+        if not self.enabled:
+            return
+        key = str(key)
+        version, invalidated_at = self.backend.version(key)
+        if token == version and time.time() - invalidated_at >= max_lag:
+            self.backend.set(key, b"%d\n" % token + value.pack())
+
+    def invalidate(self, *keys):
+        keys = [str(key) for key in keys if key is not None]
+        if not keys:
+            return
+        with self._lock:
+            self.invalidations += len(keys)
+        self.backend.invalidate(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "backend": CACHE_BACKEND if self.enabled else "none",
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+        if isinstance(self.backend, LRUBackend):
+            stats.update(size=len(self.backend), maxsize=self.backend.maxsize, evictions=self.backend.evictions)
+        return stats
+
+
+def build_company_cache() -> ResponseCache:
+    if CACHE_BACKEND == "redis":
+        import redis
+
+        return ResponseCache(RedisBackend(redis.Redis.from_url(REDIS_URL), CACHE_TTL))
+    enabled = CACHE_BACKEND != "none"
+    if enabled and WEB_CONCURRENCY > 1:
+        logger.warning(
+            f"COMPANY_CACHE_BACKEND=memory is per process and cannot be shared by {WEB_CONCURRENCY} workers; "
+            f"the company cache is disabled. Use COMPANY_CACHE_BACKEND=redis"
+        )
+        enabled = False
+    return ResponseCache(LRUBackend(CACHE_SIZE, CACHE_TTL), enabled=enabled)
+
+
+company_cache = build_company_cache()
@@ -0,0 +1,51 @@
+from datetime import date
+from operator import mul
+
+# Estonian personal identification codes (isikukood) and registry codes end
+# in a modulo 11 check digit. Weights cycle through 1-9; when the remainder
+# is 10 a second pass starts the cycle at 3, and a second 10 gives 0.
+
+# First digit of an isikukood -> birth century
+ID_CODE_CENTURIES = {"1": 1800, "2": 1800, "3": 1900, "4": 1900, "5": 2000, "6": 2000, "7": 2100, "8": 2100}
+# Registry codes of companies and other legal persons
+REGISTRY_CODE_LENGTH = 8
+# ASCII digit -> its value, so a code's bytes can be weighted without int()
+_DIGIT_VALUES = bytes.maketrans(b"0123456789", bytes(range(10)))
+# Long enough for the 10 digits an isikukood check digit covers
+_WEIGHTS = (tuple(index % 9 + 1 for index in range(10)), tuple((index + 2) % 9 + 1 for index in range(10)))
+
+
+def check_digit(digits: str) -> str:
+    values = digits.encode().translate(_DIGIT_VALUES)
+    for weights in _WEIGHTS:
+        remainder = sum(map(mul, values, weights)) % 11
+        if remainder < 10:
+            return str(remainder)
+    return "0"
+
+
+def with_check_digit(digits: str) -> str:
+    return digits + check_digit(digits)
+
+
+def validate_id_code(code: str) -> str:
+    if len(code) != 11 or not (code.isascii() and code.isdigit()):
+        raise ValueError("Isikukood must be 11 digits")
+    century = ID_CODE_CENTURIES.get(code[0])
+    if century is None:
+        raise ValueError("Isikukood has an invalid first digit")
+    try:
+        date(century + int(code[1:3]), int(code[3:5]), int(code[5:7]))
+    except ValueError:
+        raise ValueError("Isikukood has an invalid birth date")
+    if check_digit(code[:10]) != code[10]:
+        raise ValueError("Isikukood has an invalid check digit")
+    return code
+
+
+def validate_registry_code(code: str) -> str:
+    if len(code) != REGISTRY_CODE_LENGTH or not (code.isascii() and code.isdigit()):
+        raise ValueError(f"Registry code must be {REGISTRY_CODE_LENGTH} digits")
+    if check_digit(code[:-1]) != code[-1]:
+        raise ValueError("Registry code has an invalid check digit")
+    return code
@@ -0,0 +1,103 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Request, Response, status
+from sqlalchemy.orm import Session
+
+from app import encoding, statements
+
+Version = Tuple[str, Optional[datetime]]
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def latest(*values: Optional[datetime]) -> Optional[datetime]:
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> dict:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        # updated_at columns hold naive UTC timestamps
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def naive_utc(value: datetime) -> datetime:
+    # updated_at and ledger columns hold naive UTC; an offset-aware value
+    # compared with them directly would be read in the session time zone
+    # (PostgreSQL) or compared as text (SQLite).
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return naive_utc(parsed)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Clients send back the tag of the representation they hold, which
+        # EncodingMiddleware marked with its media type and content coding.
+        tags = encoding.if_none_match_tags(if_none_match)
+        return "*" in tags or encoding.matching_etag(tags, etag, encoding.response_media_type()) is not None
+
+    since = parse_http_date(request.headers.get("if-modified-since"))
+    if since is not None and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def not_modified(etag: str, last_modified: Optional[datetime]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
+
+
+def rows_version(*parts, rows: Iterable = ()) -> Version:
+    # Version of an already loaded list of rows carrying id and updated_at
+    rows = list(rows)
+    last_modified = latest(*(row.updated_at for row in rows))
+    return make_etag(*parts, *((row.id, row.updated_at) for row in rows)), last_modified
+
+
+def shareholders_version(db: Session, company_ids: list) -> tuple:
+    # Aggregates over the shareholdings of the given companies and their
+    # persons; the count catches deletions, which leave no updated_at behind.
+    if not company_ids:
+        return None, None, 0
+    return db.execute(statements.SHAREHOLDERS_VERSION, {"company_ids": list(company_ids)}).one()
+
+
+def company_version(db: Session, company_id: int) -> Optional[Version]:
+    company = db.execute(statements.COMPANY_VERSION, {"company_id": company_id}).first()
+    if company is None:
+        return None
+    company_updated_at = company.updated_at
+    shareholding_updated_at, person_updated_at, count = shareholders_version(db, [company_id])
+    etag = make_etag("company", company_id, company_updated_at, shareholding_updated_at, person_updated_at, count)
+    return etag, latest(company_updated_at, shareholding_updated_at, person_updated_at)
+
+
+def person_version(db: Session, person_id: int) -> Optional[Version]:
+    person = db.execute(statements.PERSON_VERSION, {"person_id": person_id}).first()
+    if person is None:
+        return None
+    person_updated_at = person.updated_at
+    shareholding_updated_at, count = db.execute(
+        statements.PERSON_SHAREHOLDINGS_VERSION, {"person_id": person_id}
+    ).one()
+    etag = make_etag("person", person_id, person_updated_at, shareholding_updated_at, count)
+    return etag, latest(person_updated_at, shareholding_updated_at)
@@ -0,0 +1,258 @@
+import os
+import zlib
+from contextvars import ContextVar
+from decimal import Decimal
+from typing import Any, Optional
+
+import brotli
+import msgpack
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+# Accepted in Accept headers for older clients; responses always use MSGPACK
+MEDIA_TYPE_ALIASES = {JSON: JSON, MSGPACK: MSGPACK, "application/x-msgpack": MSGPACK}
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Preferred first when the client accepts several with the same q-value
+CONTENT_ENCODINGS = ("br", "gzip")
+
+_media_type: ContextVar[str] = ContextVar("media_type", default=JSON)
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def encode(content: Any, media_type: str = JSON) -> bytes:
+    return transcode(orjson.dumps(content, default=_default), media_type)
+
+
+def transcode(body: bytes, media_type: str) -> bytes:
+    # MessagePack is packed from the parsed JSON, so both carry the same
+    # values (decimals and datetimes as strings). Going through orjson's C
+    # encoder is also about twice as fast as a msgpack default hook that is
+    # called for every decimal and datetime.
+    if media_type == MSGPACK:
+        return msgpack.packb(orjson.loads(body))
+    return body
+
+
+# Marks a representation's ETag, so each media type and content coding of
+# the same data carries its own strong validator
+MEDIA_TYPE_ETAG_SUFFIXES = {MSGPACK: "msgpack"}
+
+
+def representation_etag(etag: str, media_type: str, content_encoding: Optional[str] = None) -> str:
+    suffixes = [MEDIA_TYPE_ETAG_SUFFIXES[media_type]] if media_type in MEDIA_TYPE_ETAG_SUFFIXES else []
+    if content_encoding is not None:
+        suffixes.append(content_encoding)
+    if not suffixes or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{"-".join(suffixes)}"'
+
+
+def matching_etag(tags: list, etag: str, media_type: str) -> Optional[str]:
+    # The tag among an If-None-Match list that stands for etag in this media
+    # type. Any content coding matches, since they all decode to the same body.
+    for content_encoding in (None, *CONTENT_ENCODINGS):
+        candidate = representation_etag(etag, media_type, content_encoding)
+        if candidate in tags:
+            return candidate
+    return None
+
+
+def if_none_match_tags(header: Optional[str]) -> list:
+    # If-None-Match uses weak comparison, so W/ prefixes are dropped
+    tags = [tag.strip() for tag in (header or "").split(",")]
+    return [tag[2:] if tag.startswith("W/") else tag for tag in tags if tag]
+
+
+def _preferences(header: Optional[str]) -> list:
+    # (q, position, value) for every entry of an Accept-style header, best first
+    preferences = []
+    for position, part in enumerate((header or "").split(",")):
+        value, *params = [item.strip() for item in part.split(";")]
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        preferences.append((quality, position, value.lower()))
+    return sorted(preferences, key=lambda item: (-item[0], item[1]))
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    # JSON unless MessagePack is asked for explicitly; wildcards and types
+    # this API does not produce fall back to JSON rather than a 406.
+    for quality, _, value in _preferences(accept):
+        if quality <= 0:
+            continue
+        if value in MEDIA_TYPE_ALIASES:
+            return MEDIA_TYPE_ALIASES[value]
+        if value in ("*/*", "application/*"):
+            return JSON
+    return JSON
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    accepted = {value: quality for quality, _, value in _preferences(accept_encoding)}
+    wildcard = accepted.get("*", 0.0)
+    best = None
+    for encoding in CONTENT_ENCODINGS:
+        quality = accepted.get(encoding, wildcard)
+        if quality > 0 and (best is None or quality > best[0]):
+            best = (quality, encoding)
+    return best[1] if best else None
+
+
+def response_media_type() -> str:
+    return _media_type.get()
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits=31 writes the gzip container rather than raw zlib
+            self._zlib = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        # Flushed per chunk so streamed responses reach the client as they are produced
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class EncodingMiddleware:
+    # Pure ASGI middleware. It records the negotiated media type for
+    # serializers.EncodedResponse and compresses response bodies of at least
+    # COMPRESSION_MINIMUM_SIZE bytes with brotli or gzip.
+    def __init__(self, app, compression: bool = COMPRESSION_ENABLED, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.compression = compression
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        media_type = negotiate_media_type(request_headers.get("accept"))
+        token = _media_type.set(media_type)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding")) if self.compression else None
+        responder = _ResponseEncoder(
+            send, encoding, self.compression, self.minimum_size,
+            media_type, if_none_match_tags(request_headers.get("if-none-match")),
+        )
+        try:
+            await self.app(scope, receive, responder)
+        finally:
+            _media_type.reset(token)
+
+
+class _ResponseEncoder:
+    def __init__(self, send, encoding: Optional[str], compression: bool, minimum_size: int,
+                 media_type: str = JSON, if_none_match: Optional[list] = None):
+        self.send = send
+        self.encoding = encoding
+        self.compression = compression
+        self.minimum_size = minimum_size
+        self.media_type = media_type
+        self.if_none_match = if_none_match or []
+        self.start = None
+        self.compressor = None
+        self.etag = None
+
+    def _not_modified(self, headers: MutableHeaders):
+        # A 304 carries the Vary and ETag the full response would have. Its
+        # content coding is not known without the body, so the tag the
+        # client sent is echoed when it matches.
+        headers.add_vary_header("Accept")
+        if self.compression:
+            headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag is not None:
+            headers["ETag"] = (
+                matching_etag(self.if_none_match, etag, self.media_type)
+                or representation_etag(etag, self.media_type)
+            )
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(scope=message)
+            if message["status"] == 304:
+                self.encoding = None
+                self._not_modified(headers)
+                await self.send(message)
+                return
+            media_type = headers.get("content-type", "").split(";")[0]
+            if media_type in (JSON, MSGPACK):
+                headers.add_vary_header("Accept")
+            if "etag" in headers:
+                self.etag = headers["etag"]
+                headers["ETag"] = representation_etag(self.etag, media_type)
+            if "content-encoding" in headers or message["status"] == 204:
+                self.encoding = None
+            elif self.compression:
+                headers.add_vary_header("Accept-Encoding")
+            if self.encoding is None:
+                await self.send(message)
+            else:
+                # Held back until the first body chunk shows whether it is worth compressing
+                self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.encoding is None:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not more_body and len(body) < self.minimum_size:
+                self.encoding = None
+                await self.send(start)
+                await self.send(message)
+                return
+            self.compressor = _Compressor(self.encoding)
+            headers = MutableHeaders(scope=start)
+            headers["Content-Encoding"] = self.encoding
+            if self.etag is not None:
+                headers["ETag"] = representation_etag(
+                    self.etag, headers.get("content-type", "").split(";")[0], self.encoding
+                )
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                body = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            await self.send(start)
+
+        if more_body:
+            await self.send({"type": "http.response.body", "body": self.compressor.compress(body), "more_body": True})
+        else:
+            await self.send({"type": "http.response.body", "body": self.compressor.finish(body)})
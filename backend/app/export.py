@@ -0,0 +1,145 @@
+import csv
+import io
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app import models, serializers
+from app.database import SessionLocal
+
+EXPORT_FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+YIELD_PER = 1000
+
+CSV_COLUMNS = [
+    "company_id", "company_name", "company_reg_code", "founding_date", "capital", "company_updated_at",
+    "shareholding_id", "share", "is_founder", "shareholding_updated_at",
+    "person_id", "person_type", "first_name", "last_name", "id_code", "legal_name", "person_reg_code",
+    "person_updated_at",
+]
+
+
+def _export_statement(updated_since: Optional[datetime]):
+    company, shareholding, person = models.Company, models.Shareholding, models.Person
+    stmt = (
+        select(
+            company.id.label("company_id"),
+            company.name.label("company_name"),
+            company.reg_code.label("company_reg_code"),
+            company.founding_date,
+            company.capital,
+            company.created_at.label("company_created_at"),
+            company.updated_at.label("company_updated_at"),
+            shareholding.id.label("shareholding_id"),
+            shareholding.share,
+            shareholding.is_founder,
+            shareholding.updated_at.label("shareholding_updated_at"),
+            person.id.label("person_id"),
+            person.type.label("person_type"),
+            person.first_name,
+            person.last_name,
+            person.id_code,
+            person.legal_name,
+            person.reg_code.label("person_reg_code"),
+            person.updated_at.label("person_updated_at"),
+        )
+        .select_from(company)
+        .outerjoin(shareholding, shareholding.company_id == company.id)
+        .outerjoin(person, person.id == shareholding.person_id)
+        .order_by(company.id, shareholding.id)
+    )
+    if updated_since is not None:
+        # A company is exported in full when it or any of its shareholdings
+        # or shareholder persons changed since the given time.
+        changed_shareholdings = select(shareholding.company_id).where(shareholding.updated_at >= updated_since)
+        changed_persons = (
+            select(shareholding.company_id)
+            .join(person, person.id == shareholding.person_id)
+            .where(person.updated_at >= updated_since)
+        )
+        stmt = stmt.where(or_(
+            company.updated_at >= updated_since,
+            company.id.in_(changed_shareholdings),
+            company.id.in_(changed_persons),
+        ))
+    # yield_per streams through a server-side cursor where the driver has one
+    return stmt.execution_options(yield_per=YIELD_PER)
+
+
+def _ndjson_chunks(db: Session, updated_since: Optional[datetime]) -> Iterator[bytes]:
+    # Lines are sent in chunks so that each iteration step of the streaming
+    # response (a threadpool hop) carries many companies.
+    lines = []
+    current = None
+    for row in db.execute(_export_statement(updated_since)):
+        if current is None or current["id"] != row.company_id:
+            if current is not None:
+                lines.append(serializers.dumps(current))
+                if len(lines) >= YIELD_PER:
+                    yield b"\n".join(lines) + b"\n"
+                    lines = []
+            current = {
+                "id": row.company_id,
+                "name": row.company_name,
+                "reg_code": row.company_reg_code,
+                "founding_date": row.founding_date,
+                "capital": row.capital,
+                "created_at": row.company_created_at,
+                "updated_at": row.company_updated_at,
+                "shareholders": [],
+            }
+        if row.shareholding_id is not None:
+            current["shareholders"].append({
+                "id": row.shareholding_id,
+                "share": row.share,
+                "is_founder": row.is_founder,
+                "updated_at": row.shareholding_updated_at,
+                "person": {
+                    "id": row.person_id,
+                    "type": row.person_type,
+                    "first_name": row.first_name,
+                    "last_name": row.last_name,
+                    "id_code": row.id_code,
+                    "legal_name": row.legal_name,
+                    "reg_code": row.person_reg_code,
+                    "updated_at": row.person_updated_at,
+                },
+            })
+    if current is not None:
+        lines.append(serializers.dumps(current))
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def _csv_chunks(db: Session, updated_since: Optional[datetime]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for count, row in enumerate(db.execute(_export_statement(updated_since)), start=1):
+        values = row._mapping
+        writer.writerow([
+            values[column].value if column == "person_type" and values[column] is not None else values[column]
+            for column in CSV_COLUMNS
+        ])
+        if count % YIELD_PER == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def stream_companies(
+        fmt: str,
+        updated_since: Optional[datetime] = None,
+        session_factory=SessionLocal,
+) -> Iterator[bytes]:
+    # Owns its session: the response body is produced after the request
+    # dependencies have already been closed.
+    db = session_factory()
+    try:
+        chunks = _ndjson_chunks if fmt == "ndjson" else _csv_chunks
+        yield from chunks(db, updated_since)
+    finally:
+        db.close()
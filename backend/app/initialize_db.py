@@ -1,23 +1,16 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import os
 import logging
 from datetime import date, datetime
 from decimal import Decimal
 import random
 
-from app.models import Base, Person, Company, Shareholding, PersonType
+from app.codes import with_check_digit
+from app.database import SessionLocal
+from app.models import Person, Company, Shareholding, PersonType
+from app.ledger import record_ledger_events
+from app.summary import refresh_company_summaries
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
 logger = logging.getLogger(__name__)
 
-DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/company_db")
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
 estonian_first_names = [
     "Andres", "Jaan", "Tiit", "Mart", "Peeter", "Rein", "Tõnu", "Mati", "Aivar", "Toomas",
     "Tiina", "Anne", "Kadri", "Liis", "Kati", "Mari", "Kristi", "Piret", "Liisa", "Riina"
@@ -39,34 +32,30 @@ estonian_company_mids = [
 estonian_company_suffixes = ["OÜ"]
 
 
-def generate_estonian_id_code():
-    gender_century = random.choice([3, 4, 5, 6])
+def generate_estonian_id_code(rng=random):
+    gender_century = rng.choice([3, 4, 5, 6])
 
     if gender_century in [3, 4]:
-        year = random.randint(40, 99)
+        year = rng.randint(40, 99)
     else:
-        year = random.randint(0, 23)
+        year = rng.randint(0, 23)
 
-    month = random.randint(1, 12)
-    day = random.randint(1, 28)
-    serial = random.randint(0, 999)
+    month = rng.randint(1, 12)
+    day = rng.randint(1, 28)
+    serial = rng.randint(0, 999)
 
     id_code = f"{gender_century}{year:02d}{month:02d}{day:02d}{serial:03d}"
-    return f"{id_code}1"
-
+    return with_check_digit(id_code)
 
-def generate_estonian_reg_code():
-    return str(random.randint(10000000, 99999999))
 
+def generate_estonian_reg_code(rng=random):
+    return with_check_digit(str(rng.randint(1000000, 9999999)))
 
-def generate_company_reg_code():
-    return str(random.randint(1000000, 9999999))
 
-
-def generate_company_name():
-    prefix = random.choice(estonian_company_prefixes)
-    mid = random.choice(estonian_company_mids)
-    suffix = random.choice(estonian_company_suffixes)
+def generate_company_name(rng=random):
+    prefix = rng.choice(estonian_company_prefixes)
+    mid = rng.choice(estonian_company_mids)
+    suffix = rng.choice(estonian_company_suffixes)
     return f"{prefix} {mid} {suffix}"
 
 
@@ -123,7 +112,7 @@ def initialize_database():
 
             company = Company(
                 name=generate_company_name(),
-                reg_code=generate_company_reg_code(),
+                reg_code=generate_estonian_reg_code(),
                 founding_date=date(founding_year, founding_month, founding_day),
                 capital=capital,
                 created_at=datetime.utcnow(),
@@ -158,6 +147,8 @@ def initialize_database():
                 )
                 db.add(shareholding)
 
+        refresh_company_summaries(db, [company.id for company in companies])
+        record_ledger_events(db, [company.id for company in companies])
         db.commit()
 
     except Exception as e:
@@ -168,4 +159,8 @@ def initialize_database():
 
 
 if __name__ == "__main__":
-    initialize_database()
\ No newline at end of file
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    initialize_database()
@@ -0,0 +1,331 @@
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, insert, select
+from sqlalchemy.orm import Session
+
+from app import models, serializers
+
+logger = logging.getLogger(__name__)
+
+# A snapshot is written once this many events followed the previous one
+LEDGER_SNAPSHOT_INTERVAL = int(os.getenv("LEDGER_SNAPSHOT_INTERVAL", "100"))
+
+EventType = models.LedgerEventType
+events_table = models.LedgerEvent.__table__
+snapshots_table = models.CapTableSnapshot.__table__
+
+
+def empty_state() -> Dict[str, Any]:
+    return {"capital": None, "registered_at": None, "updated_at": None, "event_id": 0, "holdings": {}}
+
+
+def apply_event(state: Dict[str, Any], event) -> Dict[str, Any]:
+    holdings = state["holdings"]
+    if event.type == EventType.company_registered:
+        state["capital"] = event.capital
+        state["registered_at"] = event.occurred_at
+    elif event.type == EventType.capital_changed:
+        state["capital"] = event.capital
+    elif event.type == EventType.shareholding_removed:
+        holdings.pop(event.shareholding_id, None)
+    else:
+        holding = holdings.get(event.shareholding_id)
+        if holding is None:
+            holding = holdings[event.shareholding_id] = {"created_at": event.occurred_at}
+        holding.update(
+            person_id=event.person_id, share=event.share, is_founder=event.is_founder, updated_at=event.occurred_at
+        )
+    state["updated_at"] = event.occurred_at
+    state["event_id"] = event.id
+    return state
+
+
+def _snapshot_state(snapshot) -> Dict[str, Any]:
+    state = empty_state()
+    state.update(
+        capital=snapshot.capital, registered_at=snapshot.registered_at,
+        updated_at=snapshot.taken_at, event_id=snapshot.event_id,
+    )
+    for holding in snapshot.holdings:
+        state["holdings"][holding["shareholding_id"]] = {
+            "person_id": holding["person_id"],
+            "share": Decimal(holding["share"]),
+            "is_founder": holding["is_founder"],
+            "created_at": datetime.fromisoformat(holding["created_at"]),
+            "updated_at": datetime.fromisoformat(holding["updated_at"]),
+        }
+    return state
+
+
+def _snapshot_row(company_id: int, state: Dict[str, Any]) -> Dict[str, Any]:
+    # JSON columns hold strings for the decimal and datetime values
+    return {
+        "company_id": company_id,
+        "event_id": state["event_id"],
+        "taken_at": state["updated_at"],
+        "capital": state["capital"],
+        "registered_at": state["registered_at"],
+        "holdings": [
+            {
+                "shareholding_id": shareholding_id,
+                "person_id": holding["person_id"],
+                "share": str(holding["share"]),
+                "is_founder": holding["is_founder"],
+                "created_at": holding["created_at"].isoformat(),
+                "updated_at": holding["updated_at"].isoformat(),
+            }
+            for shareholding_id, holding in sorted(state["holdings"].items())
+        ],
+    }
+
+
+def _ledger_states(db: Session, company_ids: set) -> Dict[int, tuple]:
+    # Latest state per company from its newest snapshot plus the events
+    # after it, with the number of events replayed.
+    latest = (
+        select(snapshots_table.c.company_id, func.max(snapshots_table.c.event_id).label("event_id"))
+        .where(snapshots_table.c.company_id.in_(company_ids))
+        .group_by(snapshots_table.c.company_id)
+        .subquery()
+    )
+    states = {company_id: (empty_state(), 0) for company_id in company_ids}
+    for snapshot in db.execute(
+        select(snapshots_table).join(latest, and_(
+            snapshots_table.c.company_id == latest.c.company_id,
+            snapshots_table.c.event_id == latest.c.event_id,
+        ))
+    ):
+        states[snapshot.company_id] = (_snapshot_state(snapshot), 0)
+
+    for event in db.execute(
+        select(events_table)
+        .outerjoin(latest, latest.c.company_id == events_table.c.company_id)
+        .where(
+            events_table.c.company_id.in_(company_ids),
+            events_table.c.id > func.coalesce(latest.c.event_id, 0),
+        )
+        .order_by(events_table.c.company_id, events_table.c.id)
+    ):
+        state, replayed = states[event.company_id]
+        states[event.company_id] = (apply_event(state, event), replayed + 1)
+    return states
+
+
+def _diff(company, holdings: Dict[int, Any], state: Dict[str, Any], occurred_at: datetime) -> List[Dict[str, Any]]:
+    # Every row carries every column so the events insert as one executemany
+    base = {
+        "company_id": company.id, "occurred_at": occurred_at, "capital": None,
+        "shareholding_id": None, "person_id": None, "share": None, "is_founder": None,
+    }
+    events = []
+    if state["registered_at"] is None:
+        events.append({**base, "type": EventType.company_registered, "capital": company.capital})
+    elif state["capital"] != company.capital:
+        events.append({**base, "type": EventType.capital_changed, "capital": company.capital})
+
+    recorded = state["holdings"]
+    for shareholding_id in sorted(recorded.keys() - holdings.keys()):
+        events.append({**base, "type": EventType.shareholding_removed, "shareholding_id": shareholding_id})
+    for shareholding_id, holding in sorted(holdings.items()):
+        previous = recorded.get(shareholding_id)
+        current = (holding.person_id, holding.share, holding.is_founder)
+        if previous is None:
+            event_type = EventType.shareholding_added
+        elif (previous["person_id"], previous["share"], previous["is_founder"]) != current:
+            event_type = EventType.shareholding_changed
+        else:
+            continue
+        events.append({
+            **base, "type": event_type, "shareholding_id": shareholding_id,
+            "person_id": holding.person_id, "share": holding.share, "is_founder": holding.is_founder,
+        })
+    return events
+
+
+def record_ledger_events(db: Session, company_ids: Iterable[int], occurred_at: Optional[datetime] = None):
+    # Appends the changes between the ledger and the current capital and
+    # shareholdings of the given companies, inside the caller's transaction.
+    # Like refresh_company_summaries, call it before committing the write.
+    company_ids = {company_id for company_id in company_ids if company_id is not None}
+    if not company_ids:
+        return
+    db.flush()
+    occurred_at = occurred_at or datetime.utcnow()
+
+    # Locking the company rows, in id order like refresh_company_summaries,
+    # makes concurrent writers to a company diff against each other's events
+    # instead of both appending the same change.
+    companies = {
+        row.id: row
+        for row in db.execute(
+            select(models.Company.id, models.Company.capital)
+            .where(models.Company.id.in_(company_ids))
+            .order_by(models.Company.id)
+            .with_for_update()
+        )
+    }
+    if not companies:
+        return
+    holdings = {company_id: {} for company_id in companies}
+    for row in db.execute(
+        select(
+            models.Shareholding.id, models.Shareholding.company_id, models.Shareholding.person_id,
+            models.Shareholding.share, models.Shareholding.is_founder,
+        ).where(models.Shareholding.company_id.in_(companies))
+    ):
+        holdings[row.company_id][row.id] = row
+
+    states = _ledger_states(db, set(companies))
+    events = []
+    due = []
+    for company_id, company in companies.items():
+        state, replayed = states[company_id]
+        changes = _diff(company, holdings[company_id], state, occurred_at)
+        events.extend(changes)
+        if changes and replayed + len(changes) >= LEDGER_SNAPSHOT_INTERVAL:
+            due.append(company_id)
+    if not events:
+        return
+    db.execute(insert(events_table), events)
+
+    if due:
+        # Snapshots are replayed from the ledger rather than copied from the
+        # live tables, so they always match the events they stand for.
+        snapshots = [
+            _snapshot_row(company_id, state)
+            for company_id, (state, _) in _ledger_states(db, set(due)).items()
+        ]
+        db.execute(insert(snapshots_table), snapshots)
+
+
+def cap_table_as_of(db: Session, company_id: int, as_of: datetime) -> Optional[Dict[str, Any]]:
+    # Nearest snapshot at or before as_of, then the events after it up to
+    # as_of. Events after the snapshot are selected by id alone: one can be
+    # dated before taken_at when its transaction committed after the snapshot's.
+    snapshot = db.execute(
+        select(snapshots_table)
+        .where(snapshots_table.c.company_id == company_id, snapshots_table.c.taken_at <= as_of)
+        .order_by(snapshots_table.c.taken_at.desc(), snapshots_table.c.event_id.desc())
+        .limit(1)
+    ).first()
+    events = select(events_table).where(events_table.c.company_id == company_id, events_table.c.occurred_at <= as_of)
+    if snapshot is not None:
+        state = _snapshot_state(snapshot)
+        events = events.where(events_table.c.id > snapshot.event_id)
+    else:
+        state = empty_state()
+    for event in db.execute(events.order_by(events_table.c.id)):
+        apply_event(state, event)
+    if state["registered_at"] is None:
+        return None
+    return state
+
+
+def company_as_of(db: Session, company_id: int, as_of: datetime) -> Optional[Dict[str, Any]]:
+    # Same shape as serializers.company_payload: capital and shareholdings
+    # as of the given time, company and person details as they are now.
+    company = db.get(models.Company, company_id)
+    if company is None:
+        return None
+    state = cap_table_as_of(db, company_id, as_of)
+    if state is None:
+        return None
+
+    person_ids = {holding["person_id"] for holding in state["holdings"].values()}
+    persons = {
+        person.id: serializers.person_fields(person)
+        for person in db.scalars(select(models.Person).where(models.Person.id.in_(person_ids)))
+    } if person_ids else {}
+
+    company_block = serializers.company_fields(company)
+    company_block.update(capital=state["capital"], updated_at=state["updated_at"])
+    shareholders = []
+    for shareholding_id, holding in sorted(state["holdings"].items()):
+        shareholders.append({
+            "company_id": company_id,
+            "person_id": holding["person_id"],
+            "share": holding["share"],
+            "is_founder": holding["is_founder"],
+            "id": shareholding_id,
+            "created_at": holding["created_at"],
+            "updated_at": holding["updated_at"],
+            "company": company_block,
+            "person": persons.get(holding["person_id"]),
+        })
+    payload = dict(company_block)
+    payload["shareholders"] = shareholders
+    payload["as_of"] = as_of
+    payload["registered_at"] = state["registered_at"]
+    return payload
+
+
+def backfill_ledger(db: Session, batch_size: int = 1000) -> int:
+    # Records the current state of companies that have no ledger events yet,
+    # e.g. after loading data outside the API. History before that is unknown,
+    # so events are dated at the rows' created_at.
+    count = 0
+    last_id = 0
+    while True:
+        company_ids = db.scalars(
+            select(models.Company.id)
+            .where(
+                models.Company.id > last_id,
+                ~select(events_table.c.id).where(events_table.c.company_id == models.Company.id).exists(),
+            )
+            .order_by(models.Company.id)
+            .limit(batch_size)
+        ).all()
+        if not company_ids:
+            break
+        now = datetime.utcnow()
+        registered = db.execute(
+            select(models.Company.id, models.Company.capital, models.Company.created_at)
+            .where(models.Company.id.in_(company_ids))
+        ).all()
+        db.execute(insert(events_table), [
+            {"company_id": row.id, "type": EventType.company_registered, "occurred_at": row.created_at or now,
+             "capital": row.capital}
+            for row in registered
+        ])
+        added = db.execute(
+            select(models.Shareholding)
+            .where(models.Shareholding.company_id.in_(company_ids))
+            .order_by(models.Shareholding.created_at, models.Shareholding.id)
+        ).scalars().all()
+        if added:
+            db.execute(insert(events_table), [
+                {"company_id": sh.company_id, "type": EventType.shareholding_added, "occurred_at": sh.created_at or now,
+                 "shareholding_id": sh.id, "person_id": sh.person_id, "share": sh.share, "is_founder": sh.is_founder}
+                for sh in added
+            ])
+        db.commit()
+        count += len(company_ids)
+        last_id = company_ids[-1]
+    logger.info(f"Backfilled the ledger for {count} companies")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record the current state of companies missing from the ledger")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        backfill_ledger(db, args.batch_size)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sys.exit(main())
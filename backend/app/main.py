@@ -1,11 +1,22 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import logging
-import os
 
 from app.api import router
-from app.database import engine
-from app.models import Base
+from app.cache import company_cache
+from app import serializers
+from app.database import (
+    DB_ASYNC, AsyncReplicaSessionLocal, AsyncSessionLocal, ReplicaSessionLocal, SessionLocal, async_engine,
+    async_replica_engine, engine, pool_status, replica_engine, statement_cache_status
+)
+from app.encoding import EncodingMiddleware
+from app.metrics import METRICS_ENABLED, MetricsMiddleware, registry
+from app.replica import LAST_WRITE_HEADER, ReplicaStickinessMiddleware
+from app.warmup import DB_WARMUP, warm_up, warm_up_async
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,25 +24,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-Base.metadata.create_all(bind=engine)
-logger.info("Database tables created")
-
-initialize_db = os.getenv("INITIALIZE_DB", "false").lower() == "true"
-logger.info(f"INITIALIZE_DB environment variable: {os.getenv('INITIALIZE_DB', 'Not set')}")
-logger.info(f"Will initialize database: {initialize_db}")
-
-if initialize_db:
-    logger.info("Starting database initialization process")
-    try:
-        from app.initialize_db import initialize_database
-        initialize_database()
-        logger.info("Database initialization completed")
-    except ImportError as e:
-        logger.error(f"Failed to import initialize_database function: {e}")
-    except Exception as e:
-        logger.error(f"Error during database initialization: {e}")
-else:
-    logger.info("Database initialization skipped (not requested)")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema migrations and sample data are handled by `python -m app.manage`;
+    # startup only opens pool connections and primes the statement cache.
+    if DB_WARMUP:
+        try:
+            await run_in_threadpool(warm_up, engine, SessionLocal)
+            if replica_engine is not None:
+                await run_in_threadpool(warm_up, replica_engine, ReplicaSessionLocal)
+            if async_engine is not None:
+                await warm_up_async(async_engine, AsyncSessionLocal)
+            if async_replica_engine is not None:
+                await warm_up_async(async_replica_engine, AsyncReplicaSessionLocal)
+        except Exception as e:
+            logger.warning(f"Database warmup failed, continuing without it: {str(e)}")
+    yield
+
 
 app = FastAPI(
     title="Company Registration API",
@@ -39,6 +49,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=serializers.EncodedResponse,
 )
 
 app.add_middleware(
@@ -47,9 +59,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[LAST_WRITE_HEADER],
 )
 
-app.include_router(router)
+app.add_middleware(EncodingMiddleware)
+
+if replica_engine is not None:
+    app.add_middleware(ReplicaStickinessMiddleware)
+
+if METRICS_ENABLED:
+    # Added last so it wraps CORS too and times the whole request
+    app.add_middleware(MetricsMiddleware)
+
+if DB_ASYNC:
+    from app.async_api import build_async_router
+    app.include_router(build_async_router(router))
+    logger.info("Serving API routes with the async database engine")
+else:
+    app.include_router(router)
 
 @app.get("/")
 def read_root():
@@ -62,3 +89,38 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/health/pool")
+def pool_health():
+    pools = {"sync": pool_status(engine)}
+    if replica_engine is not None:
+        pools["replica"] = pool_status(replica_engine)
+    if async_engine is not None:
+        pools["async"] = pool_status(async_engine.sync_engine)
+    if async_replica_engine is not None:
+        pools["async_replica"] = pool_status(async_replica_engine.sync_engine)
+    return pools
+
+@app.get("/health/cache")
+def cache_health():
+    return company_cache.stats()
+
+@app.get("/health/statement_cache")
+def statement_cache_health():
+    engines = {"sync": statement_cache_status(engine)}
+    if replica_engine is not None:
+        engines["replica"] = statement_cache_status(replica_engine)
+    if async_engine is not None:
+        engines["async"] = statement_cache_status(async_engine.sync_engine)
+    if async_replica_engine is not None:
+        engines["async_replica"] = statement_cache_status(async_replica_engine.sync_engine)
+    # Lookup counts cover both engines and are only collected with METRICS_ENABLED
+    return {"engines": engines, "lookups": registry.statement_cache_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/slow_queries")
+def slow_queries():
+    return registry.slow_query_samples()
@@ -0,0 +1,78 @@
+import argparse
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+INITIALIZE_DB = os.getenv("INITIALIZE_DB", "false").lower() == "true"
+
+
+def migrate(revision: str = "head"):
+    from app.database import migrate_database
+
+    logger.info(f"Migrating database to {revision}")
+    migrate_database(revision)
+
+
+# Tables created by Base.metadata.create_all before migrations existed
+BASELINE_REVISION = "0001"
+BASELINE_TABLES = {"persons", "companies", "shareholdings"}
+
+
+def stamp_unversioned():
+    # A database from before migrations has the baseline tables but no
+    # alembic_version; upgrading it from scratch would fail on CREATE TABLE.
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import inspect
+
+    from app.database import ALEMBIC_INI, engine
+
+    tables = set(inspect(engine).get_table_names())
+    if "alembic_version" in tables or not BASELINE_TABLES <= tables:
+        return False
+    logger.info(f"Existing unversioned schema found, stamping it at revision {BASELINE_REVISION}")
+    command.stamp(Config(ALEMBIC_INI), BASELINE_REVISION)
+    return True
+
+
+def seed():
+    from app.initialize_db import initialize_database
+
+    logger.info("Seeding database with sample data")
+    initialize_database()
+
+
+def setup():
+    # Run once before the API workers start (see docker-compose.yml), so the
+    # workers themselves never touch the schema.
+    stamp_unversioned()
+    migrate()
+    if INITIALIZE_DB:
+        seed()
+    else:
+        logger.info("Sample data skipped (INITIALIZE_DB is not true)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Database management commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser("migrate", help="apply schema migrations")
+    migrate_parser.add_argument("--revision", default="head")
+    commands.add_parser("seed", help="insert sample data into an empty database")
+    commands.add_parser("setup", help="migrate (stamping a pre-migration schema first), then seed when INITIALIZE_DB=true")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        migrate(args.revision)
+    elif args.command == "seed":
+        seed()
+    else:
+        setup()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import CacheStats
+from starlette.datastructures import MutableHeaders
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_SAMPLES = int(os.getenv("SLOW_QUERY_SAMPLES", "50"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Outcome of the compiled statement cache lookup for each statement
+CACHE_RESULTS = {
+    CacheStats.CACHE_HIT: "hit",
+    CacheStats.CACHE_MISS: "miss",
+    CacheStats.CACHING_DISABLED: "disabled",
+    CacheStats.NO_CACHE_KEY: "no_key",
+    CacheStats.NO_DIALECT_SUPPORT: "unsupported",
+}
+
+
+class QueryStats:
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.queries = 0
+        self.db_time = 0.0
+
+    def record(self, duration: float):
+        self.queries += 1
+        self.db_time += duration
+
+
+_request_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def route_path(scope: dict) -> str:
+    # The route template rather than the raw path keeps label cardinality low
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(lambda: _Histogram(LATENCY_BUCKETS))
+        self.query_counts = defaultdict(lambda: _Histogram(QUERY_BUCKETS))
+        self.db_seconds = defaultdict(float)
+        self.queries_total = 0
+        self.query_seconds_total = 0.0
+        self.slow_queries = deque(maxlen=SLOW_QUERY_SAMPLES)
+        self.statement_cache = defaultdict(int)
+
+    def observe_request(self, method: str, route: str, status_code: int, elapsed: float, stats: QueryStats):
+        with self._lock:
+            self.latency[(method, route, status_code)].observe(elapsed)
+            self.query_counts[(method, route)].observe(stats.queries)
+            self.db_seconds[(method, route)] += stats.db_time
+
+    def observe_query(self, statement: str, duration: float, stats: Optional[QueryStats], cache_result: Optional[str] = None):
+        with self._lock:
+            self.queries_total += 1
+            self.query_seconds_total += duration
+            if cache_result is not None:
+                self.statement_cache[cache_result] += 1
+            if duration * 1000 >= SLOW_QUERY_MS:
+                self.slow_queries.append({
+                    "at": datetime.utcnow().isoformat(),
+                    "duration_ms": round(duration * 1000, 3),
+                    "route": route_path(stats.scope) if stats is not None and stats.scope else None,
+                    "statement": statement[:2000],
+                })
+
+    def slow_query_samples(self) -> List[dict]:
+        with self._lock:
+            return list(reversed(self.slow_queries))
+
+    def statement_cache_stats(self) -> dict:
+        with self._lock:
+            counts = {result: self.statement_cache.get(result, 0) for result in CACHE_RESULTS.values()}
+        lookups = counts["hit"] + counts["miss"]
+        counts["hit_ratio"] = round(counts["hit"] / lookups, 4) if lookups else None
+        return counts
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        with self._lock:
+            lines.append("# HELP http_request_duration_seconds Request latency by route")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (method, route, status_code), histogram in sorted(self.latency.items()):
+                self._render_histogram(lines, "http_request_duration_seconds", histogram,
+                                       method=method, route=route, status=status_code)
+
+            lines.append("# HELP http_request_db_queries SQL statements executed per request")
+            lines.append("# TYPE http_request_db_queries histogram")
+            for (method, route), histogram in sorted(self.query_counts.items()):
+                self._render_histogram(lines, "http_request_db_queries", histogram, method=method, route=route)
+
+            lines.append("# HELP http_request_db_seconds_total Time spent in SQL statements by route")
+            lines.append("# TYPE http_request_db_seconds_total counter")
+            for (method, route), seconds in sorted(self.db_seconds.items()):
+                lines.append(f"http_request_db_seconds_total{_labels(method=method, route=route)} {seconds:.6f}")
+
+            lines.append("# HELP db_queries_total SQL statements executed")
+            lines.append("# TYPE db_queries_total counter")
+            lines.append(f"db_queries_total {self.queries_total}")
+            lines.append("# HELP db_query_seconds_total Time spent in SQL statements")
+            lines.append("# TYPE db_query_seconds_total counter")
+            lines.append(f"db_query_seconds_total {self.query_seconds_total:.6f}")
+            lines.append("# HELP db_statement_cache_total Compiled statement cache lookups by result")
+            lines.append("# TYPE db_statement_cache_total counter")
+            for result in CACHE_RESULTS.values():
+                lines.append(f"db_statement_cache_total{_labels(result=result)} {self.statement_cache.get(result, 0)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(lines: list, name: str, histogram: _Histogram, **labels):
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+        lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+
+registry = MetricsRegistry()
+
+# Counters opened by count_queries(); they see every statement in the
+# process, whichever thread or event loop runs it.
+_query_counters: set = set()
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    # Usage: with count_queries() as stats: client.get(...); assert stats.queries <= 3
+    stats = QueryStats()
+    _query_counters.add(stats)
+    try:
+        yield stats
+    finally:
+        _query_counters.discard(stats)
+
+
+def instrument_engine(target_engine: Engine):
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(target_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.record(duration)
+        for counter in list(_query_counters):
+            counter.record(duration)
+        cache_hit = getattr(context, "cache_hit", None)
+        registry.observe_query(statement, duration, stats, CACHE_RESULTS.get(cache_hit))
+
+
+class MetricsMiddleware:
+    # Pure ASGI middleware, so streaming responses pass through untouched
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope)
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.db_time * 1000:.3f};desc="{stats.queries} queries", app;dur={elapsed_ms:.3f}'
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            registry.observe_request(
+                scope["method"], route_path(scope), status_code, time.perf_counter() - started, stats
+            )
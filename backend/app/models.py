@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Enum, Numeric, Boolean, Table
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Enum, Numeric, Boolean, JSON, Table, Index, UniqueConstraint, DDL, event, func, literal, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import enum
@@ -6,6 +6,13 @@ from datetime import datetime
 
 Base = declarative_base()
 
+# Trigram indexes need the pg_trgm extension; other dialects skip it.
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 
 class PersonType(enum.Enum):
     individual = "individual"
@@ -14,40 +21,76 @@ class PersonType(enum.Enum):
 
 class Person(Base):
     __tablename__ = "persons"
+    __table_args__ = (
+        # One person per personal / registry code
+        Index(
+            "uq_persons_id_code", "id_code", unique=True,
+            postgresql_where=text("id_code IS NOT NULL"), sqlite_where=text("id_code IS NOT NULL"),
+        ),
+        Index(
+            "uq_persons_reg_code", "reg_code", unique=True,
+            postgresql_where=text("reg_code IS NOT NULL"), sqlite_where=text("reg_code IS NOT NULL"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     type = Column(Enum(PersonType), nullable=False)
 
     first_name = Column(String, nullable=True)
     last_name = Column(String, nullable=True)
-    id_code = Column(String, nullable=True, index=True)
+    id_code = Column(String, nullable=True)
 
     legal_name = Column(String, nullable=True)
-    reg_code = Column(String, nullable=True, index=True)
+    reg_code = Column(String, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    shareholdings = relationship("Shareholding", back_populates="person")
+    # Shareholdings go with their person through ON DELETE CASCADE
+    shareholdings = relationship(
+        "Shareholding", back_populates="person", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class Company(Base):
     __tablename__ = "companies"
+    __table_args__ = (
+        # Sort keys for the company list; id breaks ties for keyset pagination
+        Index("ix_companies_name_id", "name", "id"),
+        Index("ix_companies_founding_date_id", "founding_date", "id"),
+        Index("ix_companies_capital_id", "capital", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    reg_code = Column(String(7), nullable=False, index=True, unique=True)
+    reg_code = Column(String(8), nullable=False, index=True, unique=True)
     founding_date = Column(Date, nullable=False)
     capital = Column(Numeric(precision=10, scale=2), nullable=False)
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    shareholdings = relationship("Shareholding", back_populates="company")
+    shareholdings = relationship(
+        "Shareholding", back_populates="company", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class Shareholding(Base):
     __tablename__ = "shareholdings"
+    __table_args__ = (
+        UniqueConstraint("company_id", "person_id", name="uq_shareholdings_company_person"),
+        # Foreign-key access paths in id order for the list views and
+        # relationship loads; on PostgreSQL the included columns let the
+        # version and summary aggregates run as index-only scans.
+        Index(
+            "ix_shareholdings_company_id_id", "company_id", "id",
+            postgresql_include=["person_id", "share", "is_founder", "updated_at"],
+        ),
+        Index(
+            "ix_shareholdings_person_id_id", "person_id", "id",
+            postgresql_include=["company_id", "share", "is_founder", "updated_at"],
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
@@ -59,4 +102,135 @@ class Shareholding(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     company = relationship("Company", back_populates="shareholdings")
-    person = relationship("Person", back_populates="shareholdings")
\ No newline at end of file
+    person = relationship("Person", back_populates="shareholdings")
+
+
+class CompanySummary(Base):
+    # Denormalized list row per company, rewritten by app.summary in the same
+    # transaction as every write that changes the company or its shareholders.
+    __tablename__ = "company_summary"
+    __table_args__ = (
+        Index("ix_company_summary_name_id", "name", "id"),
+        Index("ix_company_summary_founding_date_id", "founding_date", "id"),
+        Index("ix_company_summary_capital_id", "capital", "id"),
+    )
+
+    id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String, nullable=False)
+    reg_code = Column(String(8), nullable=False, unique=True)
+    founding_date = Column(Date, nullable=False)
+    capital = Column(Numeric(precision=10, scale=2), nullable=False)
+    created_at = Column(DateTime)
+
+    shareholder_count = Column(Integer, nullable=False, default=0)
+    founder_names = Column(String, nullable=False, default="")
+    total_shares = Column(Numeric(precision=12, scale=2), nullable=False, default=0)
+    # Time of the last change to the company, its shareholdings or their persons
+    updated_at = Column(DateTime, nullable=False)
+
+
+class LedgerEventType(enum.Enum):
+    company_registered = "company_registered"
+    capital_changed = "capital_changed"
+    shareholding_added = "shareholding_added"
+    shareholding_changed = "shareholding_changed"
+    shareholding_removed = "shareholding_removed"
+
+
+class LedgerEvent(Base):
+    # Append-only history of capital and shareholding changes, written by
+    # app.ledger in the same transaction as the current-state tables.
+    __tablename__ = "ledger_events"
+    __table_args__ = (
+        Index("ix_ledger_events_company_occurred", "company_id", "occurred_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    type = Column(Enum(LedgerEventType), nullable=False)
+    occurred_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # capital for company events; the shareholding columns for the others.
+    # person_id is kept without a foreign key so history outlives the person.
+    capital = Column(Numeric(precision=10, scale=2), nullable=True)
+    shareholding_id = Column(Integer, nullable=True)
+    person_id = Column(Integer, nullable=True)
+    share = Column(Numeric(precision=10, scale=2), nullable=True)
+    is_founder = Column(Boolean, nullable=True)
+
+
+class CapTableSnapshot(Base):
+    # Cap table of a company after event_id, so point-in-time reads replay
+    # only the events that follow the nearest snapshot.
+    __tablename__ = "cap_table_snapshots"
+    __table_args__ = (
+        Index("ix_cap_table_snapshots_company_taken", "company_id", "taken_at", "event_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    event_id = Column(Integer, nullable=False)
+    taken_at = Column(DateTime, nullable=False)
+    capital = Column(Numeric(precision=10, scale=2), nullable=True)
+    registered_at = Column(DateTime, nullable=True)
+    # [{shareholding_id, person_id, share, is_founder, created_at, updated_at}]
+    holdings = Column(JSON, nullable=False)
+
+
+def person_search_text():
+    # Literal separators are rendered inline so the expression matches the
+    # trigram index below even with server-side prepared statements.
+    columns = Person.__table__.c
+    empty = literal("", literal_execute=True)
+    space = literal(" ", literal_execute=True)
+    return (
+        func.coalesce(columns.first_name, empty) + space
+        + func.coalesce(columns.last_name, empty) + space
+        + func.coalesce(columns.legal_name, empty)
+    )
+
+
+Index(
+    "ix_persons_search_trgm",
+    person_search_text().label("search_text"),
+    postgresql_using="gin",
+    postgresql_ops={"search_text": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_persons_id_code_prefix",
+    Person.id_code,
+    postgresql_ops={"id_code": "varchar_pattern_ops"},
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_persons_reg_code_prefix",
+    Person.reg_code,
+    postgresql_ops={"reg_code": "varchar_pattern_ops"},
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_companies_name_trgm",
+    Company.__table__.c.name,
+    postgresql_using="gin",
+    postgresql_ops={"name": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_companies_reg_code_prefix",
+    Company.__table__.c.reg_code,
+    postgresql_ops={"reg_code": "varchar_pattern_ops"},
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_company_summary_name_trgm",
+    CompanySummary.__table__.c.name,
+    postgresql_using="gin",
+    postgresql_ops={"name": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_company_summary_reg_code_prefix",
+    CompanySummary.__table__.c.reg_code,
+    postgresql_ops={"reg_code": "varchar_pattern_ops"},
+).ddl_if(dialect="postgresql")
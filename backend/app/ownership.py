@@ -0,0 +1,133 @@
+from decimal import Decimal
+from typing import Any, Dict
+
+from sqlalchemy import String, and_, cast, literal, select
+from sqlalchemy.orm import Session, aliased
+
+from app import models, serializers
+
+MAX_DEPTH = 10
+PERCENT = Decimal("0.0001")
+
+
+def _segment(company_id):
+    return cast(company_id, String) + "/"
+
+
+def ownership_chains(company_id: int, max_depth: int = MAX_DEPTH):
+    # Walks shareholdings downwards from the company: a legal person whose
+    # reg_code matches a company is followed into that company's own
+    # shareholders. Each row carries the effective fraction of the root
+    # company held through its chain and the path of company ids walked,
+    # which stops the recursion when a company repeats (a cycle).
+    company, shareholding, person = models.Company, models.Shareholding, models.Person
+
+    chain = (
+        select(
+            shareholding.person_id.label("person_id"),
+            (shareholding.share / company.capital).label("fraction"),
+            literal(1).label("depth"),
+            ("/" + _segment(company.id)).label("path"),
+        )
+        .join(company, company.id == shareholding.company_id)
+        .where(shareholding.company_id == company_id, company.capital > 0)
+        .cte("ownership_chain", recursive=True)
+    )
+
+    owner = aliased(person)
+    held = aliased(company)
+    held_shareholding = aliased(shareholding)
+    chain = chain.union_all(
+        select(
+            held_shareholding.person_id,
+            chain.c.fraction * held_shareholding.share / held.capital,
+            chain.c.depth + 1,
+            chain.c.path + _segment(held.id),
+        )
+        .select_from(chain)
+        .join(owner, owner.id == chain.c.person_id)
+        .join(held, held.reg_code == owner.reg_code)
+        .join(held_shareholding, held_shareholding.company_id == held.id)
+        .where(
+            owner.type == models.PersonType.legal,
+            held.capital > 0,
+            chain.c.depth < max_depth,
+            ~chain.c.path.contains("/" + _segment(held.id)),
+        )
+    )
+
+    held = aliased(company)
+    return (
+        select(
+            chain.c.person_id,
+            chain.c.fraction,
+            chain.c.depth,
+            chain.c.path,
+            held.id.label("held_company_id"),
+        )
+        .select_from(chain)
+        .join(person, person.id == chain.c.person_id)
+        .outerjoin(held, and_(person.type == models.PersonType.legal, held.reg_code == person.reg_code))
+    )
+
+
+def _percentage(fraction: Decimal) -> Decimal:
+    return (fraction * 100).quantize(PERCENT)
+
+
+def beneficial_owners(db: Session, company_id: int, max_depth: int = MAX_DEPTH) -> Dict[str, Any]:
+    # Chains end at a person who is not a company themselves (the ultimate
+    # owners), at a company already on the path (a cycle), or at max_depth.
+    # A legal person whose company has no shareholders or no capital cannot
+    # be followed either, and is reported as an owner itself.
+    rows = db.execute(ownership_chains(company_id, max_depth)).all()
+    # A row's path ends with the company it holds shares in, so these are the
+    # companies whose shareholders were walked, each by the path it was reached on
+    followed = {row.path for row in rows if row.depth > 1}
+
+    owners = {}
+    cycles = []
+    truncated = False
+    for row in rows:
+        fraction = Decimal(str(row.fraction))
+        path = [int(part) for part in row.path.strip("/").split("/")]
+        if row.held_company_id is not None:
+            if row.held_company_id in path:
+                cycles.append({
+                    "person_id": row.person_id,
+                    "path": path + [row.held_company_id],
+                    "percentage": _percentage(fraction),
+                })
+                continue
+            if f"{row.path}{row.held_company_id}/" in followed:
+                continue
+            if row.depth >= max_depth:
+                truncated = True
+                continue
+        owner = owners.setdefault(row.person_id, {"fraction": Decimal(0), "depth": row.depth, "chains": 0})
+        owner["fraction"] += fraction
+        owner["depth"] = min(owner["depth"], row.depth)
+        owner["chains"] += 1
+
+    persons = {}
+    if owners:
+        persons = {
+            person.id: serializers.person_fields(person)
+            for person in db.query(models.Person).filter(models.Person.id.in_(owners))
+        }
+
+    ranked = sorted(owners.items(), key=lambda item: (-item[1]["fraction"], item[0]))
+    return {
+        "company_id": company_id,
+        "owners": [
+            {
+                "person": persons[person_id],
+                "percentage": _percentage(owner["fraction"]),
+                "depth": owner["depth"],
+                "chains": owner["chains"],
+            }
+            for person_id, owner in ranked
+        ],
+        "cycles": cycles,
+        "truncated": truncated,
+    }
@@ -0,0 +1,83 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+
+def _coerce(column, value: Any) -> Any:
+    # Cursor values travel as JSON, so dates and decimals come back as strings
+    python_type = column.type.python_type
+    if value is None or isinstance(value, python_type):
+        return value
+    try:
+        if python_type in (date, datetime):
+            return python_type.fromisoformat(value)
+        if python_type is Decimal:
+            return Decimal(str(value))
+        return python_type(value)
+    except (ArithmeticError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _ordering(columns: Sequence, descending: bool) -> list:
+    return [column.desc() for column in columns] if descending else list(columns)
+
+
+def offset_paginate(query: Query, columns: Sequence, skip: int, limit: int, descending: bool = False) -> list:
+    return query.order_by(*_ordering(columns, descending)).offset(skip).limit(limit).all()
+
+
+def cursor_values(columns: Sequence, cursor: str) -> List[Any]:
+    return [_coerce(column, value) for column, value in zip(columns, decode_cursor(cursor, len(columns)))]
+
+
+def split_page(items: list, columns: Sequence, limit: int) -> Tuple[list, Optional[str]]:
+    # items holds up to limit + 1 rows; the extra row only signals a next page
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns])
+    return items, next_cursor
+
+
+def keyset_paginate(
+        query: Query,
+        columns: Sequence,
+        cursor: str,
+        limit: int,
+        descending: bool = False
+) -> Tuple[list, Optional[str]]:
+    # Seeks past the last row of the previous page instead of counting rows
+    # with OFFSET, so every page costs the same regardless of depth. The last
+    # column must be unique (normally the primary key) to break ties.
+    if cursor:
+        values = cursor_values(columns, cursor)
+        if len(columns) == 1:
+            key, bound = columns[0], values[0]
+        else:
+            key, bound = tuple_(*columns), tuple_(*values)
+        query = query.filter(key < bound if descending else key > bound)
+
+    items = query.order_by(*_ordering(columns, descending)).limit(limit + 1).all()
+    return split_page(items, columns, limit)
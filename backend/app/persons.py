@@ -0,0 +1,104 @@
+from typing import Dict, List, Sequence, Set, Tuple
+
+from sqlalchemy import insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+
+PersonKey = Tuple[str, str]
+
+DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+class UnknownPersonError(LookupError):
+    def __init__(self, ids: List[int]):
+        self.ids = ids
+        super().__init__(f"Person not found: {', '.join(str(person_id) for person_id in ids)}")
+
+
+def _person_key(shareholder) -> PersonKey:
+    if shareholder.type == schemas.PersonType.INDIVIDUAL:
+        return "id_code", shareholder.id_code
+    return "reg_code", shareholder.reg_code
+
+
+def _person_row(shareholder) -> dict:
+    # Every row carries the same columns so they fit one multi-row VALUES
+    individual = shareholder.type == schemas.PersonType.INDIVIDUAL
+    return {
+        "type": shareholder.type.value,
+        "first_name": shareholder.first_name if individual else None,
+        "last_name": shareholder.last_name if individual else None,
+        "id_code": shareholder.id_code if individual else None,
+        "legal_name": None if individual else shareholder.legal_name,
+        "reg_code": None if individual else shareholder.reg_code,
+    }
+
+
+def _collect(rows, keys: Set[PersonKey]) -> Dict[PersonKey, int]:
+    found = {}
+    for person_id, id_code, reg_code in rows:
+        if ("id_code", id_code) in keys:
+            found[("id_code", id_code)] = person_id
+        if ("reg_code", reg_code) in keys:
+            found[("reg_code", reg_code)] = person_id
+    return found
+
+
+def _lookup(db: Session, keys: Set[PersonKey]) -> Dict[PersonKey, int]:
+    id_codes = {code for field, code in keys if field == "id_code"}
+    reg_codes = {code for field, code in keys if field == "reg_code"}
+    conditions = []
+    if id_codes:
+        conditions.append(models.Person.id_code.in_(id_codes))
+    if reg_codes:
+        conditions.append(models.Person.reg_code.in_(reg_codes))
+    if not conditions:
+        return {}
+    rows = db.execute(
+        select(models.Person.id, models.Person.id_code, models.Person.reg_code).where(or_(*conditions))
+    )
+    return _collect(rows, keys)
+
+
+def _insert_missing(db: Session, rows: List[dict]):
+    dialect_insert = DIALECT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is None:
+        stmt = insert(models.Person)
+    else:
+        # Rows another transaction inserted meanwhile are skipped here and
+        # picked up by the second lookup in resolve_person_ids.
+        stmt = dialect_insert(models.Person).on_conflict_do_nothing()
+    return db.execute(
+        stmt.values(rows).returning(models.Person.id, models.Person.id_code, models.Person.reg_code)
+    )
+
+
+def resolve_person_ids(db: Session, shareholders: Sequence) -> List[int]:
+    # Shareholders given with an id must exist. The rest are matched to
+    # existing persons on id_code (individuals) or reg_code (legal persons),
+    # and only the unmatched ones are inserted, all in one statement.
+    given = {shareholder.id for shareholder in shareholders if shareholder.id}
+    if given:
+        unknown = given - set(db.scalars(select(models.Person.id).where(models.Person.id.in_(given))))
+        if unknown:
+            raise UnknownPersonError(sorted(unknown))
+
+    keys = [None if shareholder.id else _person_key(shareholder) for shareholder in shareholders]
+    wanted = {key for key in keys if key is not None}
+    found = _lookup(db, wanted)
+
+    missing = {}
+    for shareholder, key in zip(shareholders, keys):
+        if key is not None and key not in found and key not in missing:
+            missing[key] = _person_row(shareholder)
+    if missing:
+        found.update(_collect(_insert_missing(db, list(missing.values())), wanted))
+        if len(found) < len(wanted):
+            found.update(_lookup(db, wanted - found.keys()))
+
+    return [shareholder.id if key is None else found[key] for shareholder, key in zip(shareholders, keys)]
@@ -0,0 +1,206 @@
+import os
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.pagination import cursor_values, split_page
+
+QUERY_MAX_DEPTH = int(os.getenv("QUERY_MAX_DEPTH", "4"))
+QUERY_MAX_COMPLEXITY = int(os.getenv("QUERY_MAX_COMPLEXITY", "20000"))
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "10000"))
+# Assumed number of items behind a list relation when estimating complexity
+QUERY_LIST_SIZE = int(os.getenv("QUERY_LIST_SIZE", "10"))
+
+
+class Relation(NamedTuple):
+    target: str
+    # Column of the parent row matched against target_key on the target rows
+    parent_key: str
+    target_key: str
+    many: bool
+
+
+class QueryType(NamedTuple):
+    table: Any
+    fields: Tuple[str, ...]
+    relations: Dict[str, Relation]
+
+
+TYPES = {
+    "companies": QueryType(
+        models.Company.__table__,
+        ("id", "name", "reg_code", "founding_date", "capital", "created_at", "updated_at"),
+        {"shareholders": Relation("shareholdings", "id", "company_id", True)},
+    ),
+    "persons": QueryType(
+        models.Person.__table__,
+        ("id", "type", "first_name", "last_name", "id_code", "legal_name", "reg_code", "created_at", "updated_at"),
+        {"shareholdings": Relation("shareholdings", "id", "person_id", True)},
+    ),
+    "shareholdings": QueryType(
+        models.Shareholding.__table__,
+        ("id", "company_id", "person_id", "share", "is_founder", "created_at", "updated_at"),
+        {
+            "company": Relation("companies", "company_id", "id", False),
+            "person": Relation("persons", "person_id", "id", False),
+        },
+    ),
+}
+
+
+class QueryError(ValueError):
+    pass
+
+
+def check_selection(type_name: str, fields: Dict[str, Any], multiplier: int, depth: int = 0, path: str = "") -> int:
+    # Validates a selection against TYPES and returns its estimated
+    # complexity: every selected field costs one per row it is expected to
+    # be resolved for, with list relations assumed to hold QUERY_LIST_SIZE
+    # items.
+    if not isinstance(fields, dict) or not fields:
+        raise QueryError(f"{path or 'fields'}: expected a non-empty object of fields")
+    query_type = TYPES[type_name]
+    complexity = 0
+    for name, selection in fields.items():
+        field_path = f"{path}.{name}" if path else name
+        relation = query_type.relations.get(name)
+        if relation is None:
+            if name not in query_type.fields:
+                raise QueryError(f"{field_path}: unknown field of {type_name}")
+            if selection is not True:
+                raise QueryError(f"{field_path}: scalar fields are selected with true")
+            complexity += multiplier
+            continue
+        if depth + 1 > QUERY_MAX_DEPTH:
+            raise QueryError(f"{field_path}: query is nested deeper than {QUERY_MAX_DEPTH} levels")
+        nested = multiplier * QUERY_LIST_SIZE if relation.many else multiplier
+        complexity += multiplier + check_selection(relation.target, selection, nested, depth + 1, field_path)
+    return complexity
+
+
+class BatchLoader:
+    # Per-request loader. Lookups requested while a depth level is resolved
+    # are collected, then fetched with one IN query per type, and every row
+    # loaded is kept for the rest of the request.
+    def __init__(self, db: Session, max_rows: int = QUERY_MAX_ROWS):
+        self.db = db
+        self.max_rows = max_rows
+        self.rows = defaultdict(dict)
+        self.index = defaultdict(dict)
+        self.wanted = defaultdict(lambda: defaultdict(set))
+        self.loaded = 0
+
+    def add(self, type_name: str, row):
+        rows = self.rows[type_name]
+        if row.id not in rows:
+            rows[row.id] = row
+            self.loaded += 1
+            if self.loaded > self.max_rows:
+                raise QueryError(f"Query would load more than {self.max_rows} rows")
+
+    def want(self, type_name: str, column: str, value):
+        if value is None:
+            return
+        if column == "id" and value in self.rows[type_name]:
+            return
+        if column != "id" and value in self.index[(type_name, column)]:
+            return
+        self.wanted[type_name][column].add(value)
+
+    def dispatch(self):
+        wanted, self.wanted = self.wanted, defaultdict(lambda: defaultdict(set))
+        for type_name, columns in wanted.items():
+            table = TYPES[type_name].table
+            # Matches already loaded come back too but do not count towards
+            # the budget. Reading one row past them and the remaining budget
+            # is enough to know the budget would be exceeded, without reading
+            # every match of an unbounded relation.
+            loaded = sum(
+                1 for row in self.rows[type_name].values()
+                if any(getattr(row, column) in values for column, values in columns.items())
+            )
+            statement = select(table).where(or_(
+                *(table.c[column].in_(sorted(values)) for column, values in columns.items())
+            )).order_by(table.c.id).limit(loaded + self.max_rows - self.loaded + 1)
+            index = {column: {value: [] for value in values} for column, values in columns.items() if column != "id"}
+            for row in self.db.execute(statement):
+                self.add(type_name, row)
+                for column, matches in index.items():
+                    found = matches.get(getattr(row, column))
+                    if found is not None:
+                        found.append(row.id)
+            for column, matches in index.items():
+                self.index[(type_name, column)].update(matches)
+
+    def load(self, type_name: str, column: str, value) -> list:
+        rows = self.rows[type_name]
+        if column == "id":
+            return [rows[value]] if value in rows else []
+        return [rows[row_id] for row_id in self.index[(type_name, column)].get(value, ())]
+
+
+def resolve(loader: BatchLoader, type_name: str, fields: Dict[str, Any], roots: list) -> List[Dict[str, Any]]:
+    # Breadth first: each pass fills the scalar fields of one depth level and
+    # batches the relation lookups of the next one.
+    results = [{} for _ in roots]
+    level = [(type_name, fields, row, result) for row, result in zip(roots, results)]
+    while level:
+        pending = []
+        for current, selection, row, result in level:
+            query_type = TYPES[current]
+            for name, nested in selection.items():
+                relation = query_type.relations.get(name)
+                if relation is None:
+                    result[name] = getattr(row, name)
+                    continue
+                key = getattr(row, relation.parent_key)
+                loader.want(relation.target, relation.target_key, key)
+                pending.append((relation, name, nested, key, result))
+        loader.dispatch()
+
+        level = []
+        for relation, name, nested, key, result in pending:
+            rows = loader.load(relation.target, relation.target_key, key)
+            children = [{} for _ in rows]
+            if relation.many:
+                result[name] = children
+            else:
+                result[name] = children[0] if children else None
+            level.extend((relation.target, nested, row, child) for row, child in zip(rows, children))
+    return results
+
+
+def run_query(
+        db: Session,
+        root: str,
+        fields: Dict[str, Any],
+        ids: Optional[List[int]] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    if root not in TYPES:
+        raise QueryError(f"Unknown root: {root}. Use one of {', '.join(TYPES)}")
+    complexity = check_selection(root, fields, len(ids) if ids is not None else limit)
+    if complexity > QUERY_MAX_COMPLEXITY:
+        raise QueryError(f"Query complexity {complexity} exceeds the limit of {QUERY_MAX_COMPLEXITY}")
+
+    loader = BatchLoader(db)
+    table = TYPES[root].table
+    next_cursor = None
+    if ids is not None:
+        for value in ids:
+            loader.want(root, "id", value)
+        loader.dispatch()
+        roots = [row for value in ids for row in loader.load(root, "id", value)]
+    else:
+        statement = select(table)
+        if cursor is not None:
+            statement = statement.where(table.c.id > cursor_values([table.c.id], cursor)[0])
+        rows = db.execute(statement.order_by(table.c.id).limit(limit + 1)).all()
+        roots, next_cursor = split_page(rows, [table.c.id], limit)
+        for row in roots:
+            loader.add(root, row)
+    return {"items": resolve(loader, root, fields, roots), "next_cursor": next_cursor}
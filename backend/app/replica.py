@@ -0,0 +1,85 @@
+import math
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.datastructures import MutableHeaders
+
+# After a write, the same client reads from the primary for this long so it
+# sees its own changes. It should exceed the replica's usual lag.
+DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+
+LAST_WRITE_COOKIE = "last_write"
+# Same value as the cookie, for clients that do not keep cookies; they send
+# it back on their next requests.
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+class WriteTracker:
+    def __init__(self):
+        self.wrote_at: Optional[float] = None
+
+
+_tracker: ContextVar[Optional[WriteTracker]] = ContextVar("write_tracker", default=None)
+
+
+@event.listens_for(Session, "after_commit")
+def _record_write(session):
+    # Sessions only commit on the primary; replica sessions are read-only
+    tracker = _tracker.get()
+    if tracker is not None and not session.info.get("replica"):
+        tracker.wrote_at = time.time()
+
+
+def last_write(request: Request) -> Optional[float]:
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def reads_from_primary(request: Request, window: float = DB_REPLICA_STICKY_SECONDS) -> bool:
+    wrote_at = last_write(request)
+    if wrote_at is None:
+        return False
+    # A write time in the future is forged or garbled; accepting it would pin
+    # the client to the primary indefinitely.
+    return 0 <= time.time() - wrote_at < window
+
+
+class ReplicaStickinessMiddleware:
+    # Pure ASGI middleware. Responses to requests that committed a write
+    # carry the write time as a cookie and a header, so the client's next
+    # reads within DB_REPLICA_STICKY_SECONDS go to the primary.
+    def __init__(self, app, window: float = DB_REPLICA_STICKY_SECONDS):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracker = WriteTracker()
+        token = _tracker.set(tracker)
+
+        async def send_with_write_time(message):
+            if message["type"] == "http.response.start" and tracker.wrote_at is not None:
+                value = f"{tracker.wrote_at:.3f}"
+                headers = MutableHeaders(scope=message)
+                headers.append(LAST_WRITE_HEADER, value)
+                headers.append(
+                    "Set-Cookie",
+                    f"{LAST_WRITE_COOKIE}={value}; Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_write_time)
+        finally:
+            _tracker.reset(token)
@@ -1,15 +1,25 @@
-from pydantic import BaseModel, Field, validator, constr, model_validator
-from typing import Optional, List
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, TypeAdapter, constr, model_validator
+from typing import Any, Annotated, Dict, Generic, Literal, Optional, List, TypeVar, Union
 from datetime import date, datetime
 from decimal import Decimal
 from enum import Enum
 
+from app import codes
+
 class PersonType(str, Enum):
     INDIVIDUAL = "individual"
     LEGAL = "legal"
 
+# Checksum-validated codes, only applied to persons and companies being created;
+# rows stored before validation existed are read back and updated as plain strings
+IdCode = Annotated[str, AfterValidator(codes.validate_id_code)]
+RegistryCode = Annotated[str, AfterValidator(codes.validate_registry_code)]
+
 # Base Pydantic models
-class PersonBase(BaseModel):
+class OrmModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+class PersonBase(OrmModel):
     type: PersonType
     first_name: Optional[str] = None
     last_name: Optional[str] = None
@@ -17,52 +27,50 @@ class PersonBase(BaseModel):
     legal_name: Optional[str] = None
     reg_code: Optional[str] = None
 
-    class Config:
-        orm_mode = True
-
-# Create models - used for creating new entities
-class PersonCreate(PersonBase):
-    @validator('first_name', 'last_name', 'id_code')
-    def validate_individual_fields(cls, v, values):
-        if 'type' in values and values['type'] == PersonType.INDIVIDUAL:
-            if v is None:
-                field_name = next(
-                    (name for name, value in values.items() if value is v),
-                    "this field"
-                )
-                raise ValueError(f'Individual persons must have {field_name}')
-        return v
-
-    @validator('legal_name', 'reg_code')
-    def validate_legal_fields(cls, v, values):
-        if 'type' in values and values['type'] == PersonType.LEGAL:
-            if v is None:
-                field_name = next(
-                    (name for name, value in values.items() if value is v),
-                    "this field"
-                )
-                raise ValueError(f'Legal persons must have {field_name}')
-        return v
-
-class CompanyBase(BaseModel):
+# Create models - used for creating new entities. The person type selects the
+# model, so each one only checks its own fields. Updates accept the stored
+# code as is, so persons saved before checksums were validated stay editable.
+class IndividualUpdate(BaseModel):
+    type: Literal[PersonType.INDIVIDUAL]
+    first_name: str
+    last_name: str
+    id_code: str
+    legal_name: None = None
+    reg_code: None = None
+
+class LegalPersonUpdate(BaseModel):
+    type: Literal[PersonType.LEGAL]
+    first_name: None = None
+    last_name: None = None
+    id_code: None = None
+    legal_name: str
+    reg_code: str
+
+class IndividualCreate(IndividualUpdate):
+    id_code: IdCode
+
+class LegalPersonCreate(LegalPersonUpdate):
+    reg_code: RegistryCode
+
+PersonCreate = Annotated[Union[IndividualCreate, LegalPersonCreate], Field(discriminator="type")]
+PersonUpdate = Annotated[Union[IndividualUpdate, LegalPersonUpdate], Field(discriminator="type")]
+
+class CompanyBase(OrmModel):
     name: str
-    reg_code: constr(min_length=1, max_length=7)
+    reg_code: constr(min_length=1, max_length=8)
     founding_date: date
     capital: Decimal
 
-    class Config:
-        orm_mode = True
-
-class ShareholdingBase(BaseModel):
+class ShareholdingBase(OrmModel):
     company_id: int
     person_id: int
     share: Decimal
     is_founder: bool = False
 
-    class Config:
-        orm_mode = True
-
 class CompanyCreate(CompanyBase):
+    reg_code: RegistryCode
+
+class CompanyUpdate(CompanyBase):
     pass
 
 class ShareholdingCreate(ShareholdingBase):
@@ -74,33 +82,24 @@ class Person(PersonBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
-
 class Company(CompanyBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
-
 class Shareholding(ShareholdingBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
-
 class ShareholdingWithDetails(Shareholding):
     company: Company
     person: Person
 
-    class Config:
-        orm_mode = True
+class ShareholdingWithPerson(Shareholding):
+    person: Optional[Person] = None
 
-class CompanyShareholder(BaseModel):
+class CompanyShareholder(OrmModel):
     id: int
     type: PersonType
     first_name: Optional[str] = None
@@ -111,22 +110,21 @@ class CompanyShareholder(BaseModel):
     share: Decimal
     is_founder: Optional[bool] = False
 
-    class Config:
-        orm_mode = True
+class CompanySummary(Company):
+    shareholder_count: int
+    founder_names: str
+    total_shares: Decimal
 
 class CompanyWithShareholders(Company):
     shareholders: List[ShareholdingWithDetails] = []
 
-    class Config:
-        orm_mode = True
-
 class PersonWithShareholdings(Person):
     shareholdings: List[Shareholding] = []
 
-    class Config:
-        orm_mode = True
+class PersonBatchRequest(BaseModel):
+    ids: List[int] = Field(..., max_length=500)
 
-class CapitalShareholderUpdate(BaseModel):
+class CapitalShareholderUpdate(OrmModel):
     id: Optional[int] = None
     type: PersonType
     first_name: Optional[str] = None
@@ -137,18 +135,25 @@ class CapitalShareholderUpdate(BaseModel):
     share: Decimal
     is_founder: bool
 
-    class Config:
-        orm_mode = True
+    @model_validator(mode="after")
+    def check_required_fields(self) -> "CapitalShareholderUpdate":
+        if self.id is None:
+            if self.type == PersonType.INDIVIDUAL:
+                if not self.first_name or not self.last_name or not self.id_code:
+                    raise ValueError("For an individual shareholder without an id, first_name, last_name, and id_code are required")
+                codes.validate_id_code(self.id_code)
+            elif self.type == PersonType.LEGAL:
+                if not self.legal_name or not self.reg_code:
+                    raise ValueError("For a legal shareholder without an id, legal_name and reg_code are required")
+                codes.validate_registry_code(self.reg_code)
+        return self
 
-class CapitalIncreaseUpdate(BaseModel):
+class CapitalIncreaseUpdate(OrmModel):
     new_capital: Decimal
     original_capital: Decimal
     shareholders: List[CapitalShareholderUpdate]
 
-    class Config:
-        orm_mode = True
-
-class ShareholderRegistration(BaseModel):
+class ShareholderRegistration(OrmModel):
     id: Optional[int] = None  # if provided this person already exists
     type: PersonType
     # Fields for individuals:
@@ -166,21 +171,87 @@ class ShareholderRegistration(BaseModel):
             if self.type == PersonType.INDIVIDUAL:
                 if not self.first_name or not self.last_name or not self.id_code:
                     raise ValueError("For an individual shareholder without an id, first_name, last_name, and id_code are required")
+                codes.validate_id_code(self.id_code)
             elif self.type == PersonType.LEGAL:
                 if not self.legal_name or not self.reg_code:
                     raise ValueError("For a legal shareholder without an id, legal_name and reg_code are required")
+                codes.validate_registry_code(self.reg_code)
         return self
 
-    class Config:
-        orm_mode = True
-
 
-class CompanyRegistration(BaseModel):
+class CompanyRegistration(OrmModel):
     name: str
-    reg_code: constr(min_length=1, max_length=7)
+    reg_code: RegistryCode
     founding_date: date
     capital: Decimal
     shareholders: List[ShareholderRegistration]
 
-    class Config:
-        orm_mode = True
+
+class ShareholdingImport(BaseModel):
+    company_reg_code: str
+    person_id_code: Optional[str] = None
+    person_reg_code: Optional[str] = None
+    share: Decimal
+    is_founder: bool = False
+
+    @model_validator(mode="after")
+    def check_person_code(self) -> "ShareholdingImport":
+        if not self.person_id_code and not self.person_reg_code:
+            raise ValueError("Either person_id_code or person_reg_code is required")
+        return self
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    entity: str
+    processed: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    error_count: int = 0
+    errors: List[ImportRowError] = []
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class BeneficialOwner(BaseModel):
+    person: Person
+    percentage: Decimal
+    depth: int
+    chains: int
+
+
+class OwnershipCycle(BaseModel):
+    person_id: int
+    path: List[int]
+    percentage: Decimal
+
+
+class BeneficialOwnership(BaseModel):
+    company_id: int
+    owners: List[BeneficialOwner]
+    cycles: List[OwnershipCycle] = []
+    truncated: bool = False
+
+
+class QueryRequest(BaseModel):
+    root: str
+    # Field name -> true for a column, or a nested object for a relation
+    fields: Dict[str, Any]
+    ids: Optional[List[int]] = Field(None, max_length=500)
+    limit: int = Field(100, ge=1, le=1000)
+    cursor: Optional[str] = None
+
+
+# Built once; validating through a module-level adapter avoids rebuilding the
+# union validator for every row
+PERSON_CREATE = TypeAdapter(PersonCreate)
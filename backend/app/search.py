@@ -0,0 +1,89 @@
+from sqlalchemy import and_, case, exists, func, or_, true
+from sqlalchemy.orm import Query
+
+from app import models
+
+COMPANY_SORT_KEYS = ("id", "name", "reg_code", "founding_date", "capital")
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _code_filter(term: str, person_type: str = None):
+    # Codes are matched on their prefix, which the varchar_pattern_ops
+    # indexes (and plain b-tree indexes on SQLite) can serve.
+    pattern = f"{_escape_like(term)}%"
+    id_code = models.Person.id_code.like(pattern, escape="\\")
+    reg_code = models.Person.reg_code.like(pattern, escape="\\")
+    if person_type == "individual":
+        return id_code, models.Person.id_code
+    if person_type == "legal":
+        return reg_code, models.Person.reg_code
+    return or_(id_code, reg_code), func.coalesce(models.Person.id_code, models.Person.reg_code)
+
+
+def person_search_condition(search: str, person_type: str = None):
+    # Every whitespace-separated token must match, in any order: digits as a
+    # code prefix, anything else inside the name. Each token is a separate
+    # condition so the trigram and code indexes still apply.
+    conditions = [
+        _code_filter(token, person_type)[0] if token.isdigit()
+        else models.person_search_text().ilike(f"%{_escape_like(token)}%", escape="\\")
+        for token in search.lower().split()
+    ]
+    return and_(*conditions) if conditions else true()
+
+
+def apply_person_search(query: Query, search: str, person_type: str = None, ranked: bool = True) -> Query:
+    term = search.strip().lower()
+    query = query.filter(person_search_condition(term, person_type))
+    if not ranked:
+        return query
+
+    if term.isdigit():
+        code = _code_filter(term, person_type)[1]
+        return query.order_by(case((code == term, 0), else_=1), func.length(code), models.Person.id)
+
+    search_text = models.person_search_text()
+    if query.session.get_bind().dialect.name == "postgresql":
+        rank = func.word_similarity(term, search_text).desc()
+    else:
+        rank = case((func.lower(search_text).like(f"{_escape_like(term)}%", escape="\\"), 0), else_=1)
+    return query.order_by(rank, models.Person.id)
+
+
+def company_filter_conditions(
+        name: str = None,
+        reg_code: str = None,
+        founded_from=None,
+        founded_to=None,
+        capital_min=None,
+        capital_max=None,
+        shareholder: str = None,
+        source=models.Company,
+) -> list:
+    # source is models.Company or models.CompanySummary, which share the
+    # company columns the filters use.
+    conditions = []
+    if name:
+        conditions.append(source.name.ilike(f"%{_escape_like(name.strip())}%", escape="\\"))
+    if reg_code:
+        conditions.append(source.reg_code.like(f"{_escape_like(reg_code.strip())}%", escape="\\"))
+    if founded_from is not None:
+        conditions.append(source.founding_date >= founded_from)
+    if founded_to is not None:
+        conditions.append(source.founding_date <= founded_to)
+    if capital_min is not None:
+        conditions.append(source.capital >= capital_min)
+    if capital_max is not None:
+        conditions.append(source.capital <= capital_max)
+    if shareholder and shareholder.strip():
+        # Shareholders are matched like the person search: codes by prefix,
+        # anything else against the person's names.
+        conditions.append(exists().where(and_(
+            models.Shareholding.company_id == source.id,
+            models.Shareholding.person_id == models.Person.id,
+            person_search_condition(shareholder),
+        )))
+    return conditions
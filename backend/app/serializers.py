@@ -0,0 +1,106 @@
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+
+from app import encoding, models
+
+
+def dumps(content: Any) -> bytes:
+    return encoding.encode(content)
+
+
+class EncodedResponse(Response):
+    # JSON or MessagePack, whichever encoding.EncodingMiddleware negotiated
+    # from the request's Accept header
+    media_type = encoding.JSON
+
+    def render(self, content: Any) -> bytes:
+        self.media_type = encoding.response_media_type()
+        return encoding.encode(content, self.media_type)
+
+
+def encoded_body(body: bytes, headers: Dict[str, str], status_code: int = 200) -> Response:
+    # Response for a body that was rendered as JSON ahead of time
+    media_type = encoding.response_media_type()
+    return Response(
+        content=encoding.transcode(body, media_type), status_code=status_code, media_type=media_type, headers=headers
+    )
+
+
+# The payload builders below produce plain dicts in the same shape as the
+# schemas.* response models, so handlers can return them without a second
+# round of Pydantic validation.
+
+def company_fields(company: models.Company) -> Dict[str, Any]:
+    return {
+        "name": company.name,
+        "reg_code": company.reg_code,
+        "founding_date": company.founding_date,
+        "capital": company.capital,
+        "id": company.id,
+        "created_at": company.created_at,
+        "updated_at": company.updated_at,
+    }
+
+
+def company_summary_fields(summary: models.CompanySummary) -> Dict[str, Any]:
+    return {
+        "name": summary.name,
+        "reg_code": summary.reg_code,
+        "founding_date": summary.founding_date,
+        "capital": summary.capital,
+        "id": summary.id,
+        "created_at": summary.created_at,
+        "updated_at": summary.updated_at,
+        "shareholder_count": summary.shareholder_count,
+        "founder_names": summary.founder_names,
+        "total_shares": summary.total_shares,
+    }
+
+
+def person_fields(person: models.Person) -> Dict[str, Any]:
+    return {
+        "type": person.type,
+        "first_name": person.first_name,
+        "last_name": person.last_name,
+        "id_code": person.id_code,
+        "legal_name": person.legal_name,
+        "reg_code": person.reg_code,
+        "id": person.id,
+        "created_at": person.created_at,
+        "updated_at": person.updated_at,
+    }
+
+
+def shareholding_fields(shareholding: models.Shareholding) -> Dict[str, Any]:
+    return {
+        "company_id": shareholding.company_id,
+        "person_id": shareholding.person_id,
+        "share": shareholding.share,
+        "is_founder": shareholding.is_founder,
+        "id": shareholding.id,
+        "created_at": shareholding.created_at,
+        "updated_at": shareholding.updated_at,
+    }
+
+
+def company_payload(company: models.Company, persons: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    # Every shareholder references the same parent company block, and person
+    # blocks are shared through `persons` when serializing several companies.
+    if persons is None:
+        persons = {}
+    company_block = company_fields(company)
+
+    shareholders = []
+    for sh in company.shareholdings:
+        person_block = persons.get(sh.person_id)
+        if person_block is None:
+            person_block = persons[sh.person_id] = person_fields(sh.person)
+        shareholder = shareholding_fields(sh)
+        shareholder["company"] = company_block
+        shareholder["person"] = person_block
+        shareholders.append(shareholder)
+
+    payload = dict(company_block)
+    payload["shareholders"] = shareholders
+    return payload
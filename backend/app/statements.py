@@ -0,0 +1,76 @@
+from functools import lru_cache
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import joinedload, selectinload
+
+from app import models
+
+# Hot read statements are built once and executed with bound parameters, so
+# a request only looks up the compiled SQL in the engine's statement cache
+# instead of rebuilding the ORM query and its cache key each time.
+
+COMPANY_VERSION = (
+    select(models.Company.id, models.Company.updated_at)
+    .where(models.Company.id == bindparam("company_id"))
+)
+
+SHAREHOLDERS_VERSION = (
+    select(
+        func.max(models.Shareholding.updated_at),
+        func.max(models.Person.updated_at),
+        func.count(models.Shareholding.id),
+    )
+    .select_from(models.Shareholding)
+    .join(models.Person, models.Person.id == models.Shareholding.person_id)
+    .where(models.Shareholding.company_id.in_(bindparam("company_ids", expanding=True)))
+)
+
+PERSON_VERSION = (
+    select(models.Person.id, models.Person.updated_at)
+    .where(models.Person.id == bindparam("person_id"))
+)
+
+PERSON_SHAREHOLDINGS_VERSION = (
+    select(func.max(models.Shareholding.updated_at), func.count(models.Shareholding.id))
+    .where(models.Shareholding.person_id == bindparam("person_id"))
+)
+
+COMPANY_WITH_SHAREHOLDERS = (
+    select(models.Company)
+    .options(joinedload(models.Company.shareholdings).joinedload(models.Shareholding.person))
+    .where(models.Company.id == bindparam("company_id"))
+)
+
+COMPANIES_WITH_SHAREHOLDERS = (
+    select(models.Company)
+    .options(joinedload(models.Company.shareholdings).joinedload(models.Shareholding.person))
+    .where(models.Company.id.in_(bindparam("company_ids", expanding=True)))
+)
+
+PERSON_WITH_SHAREHOLDINGS = (
+    select(models.Person)
+    .options(selectinload(models.Person.shareholdings))
+    .where(models.Person.id == bindparam("person_id"))
+)
+
+SHAREHOLDING_WITH_DETAILS = (
+    select(models.Shareholding)
+    .options(joinedload(models.Shareholding.company), joinedload(models.Shareholding.person))
+    .where(models.Shareholding.id == bindparam("shareholding_id"))
+)
+
+
+@lru_cache(maxsize=None)
+def shareholdings_page(by_company: bool, by_person: bool, with_person: bool, after_id: bool):
+    # One statement per filter combination; values are passed as company_id,
+    # person_id, after_id (keyset pages), skip and limit.
+    stmt = select(models.Shareholding)
+    if with_person:
+        stmt = stmt.options(joinedload(models.Shareholding.person))
+    if by_company:
+        stmt = stmt.where(models.Shareholding.company_id == bindparam("company_id"))
+    if by_person:
+        stmt = stmt.where(models.Shareholding.person_id == bindparam("person_id"))
+    if after_id:
+        stmt = stmt.where(models.Shareholding.id > bindparam("after_id"))
+    return stmt.order_by(models.Shareholding.id).offset(bindparam("skip")).limit(bindparam("limit"))
@@ -0,0 +1,146 @@
+import argparse
+import logging
+import sys
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.persons import DIALECT_INSERTS
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+FOUNDER_SEPARATOR = ", "
+
+
+def _display_name(first_name, last_name, legal_name) -> str:
+    if legal_name:
+        return legal_name
+    return " ".join(part for part in (first_name, last_name) if part)
+
+
+def refresh_company_summaries(db: Session, company_ids: Iterable[int]):
+    # Rewrites the summary rows of the given companies from their current
+    # state inside the caller's transaction; companies that no longer exist
+    # lose their row. Call it before committing the write that changed them.
+    # The company rows are locked first, in id order, so concurrent writes to
+    # the same company take turns and each one reads the other's shareholdings.
+    company_ids = {company_id for company_id in company_ids if company_id is not None}
+    if not company_ids:
+        return
+    db.flush()
+
+    company, shareholding, person = models.Company, models.Shareholding, models.Person
+    now = datetime.utcnow()
+    rows = {
+        row.id: {
+            "id": row.id,
+            "name": row.name,
+            "reg_code": row.reg_code,
+            "founding_date": row.founding_date,
+            "capital": row.capital,
+            "created_at": row.created_at,
+            "shareholder_count": 0,
+            "founder_names": [],
+            "total_shares": Decimal(0),
+            "updated_at": now,
+        }
+        for row in db.execute(
+            select(company.id, company.name, company.reg_code, company.founding_date, company.capital, company.created_at)
+            .where(company.id.in_(company_ids))
+            .order_by(company.id)
+            .with_for_update()
+        )
+    }
+    if rows:
+        holdings = db.execute(
+            select(
+                shareholding.company_id,
+                shareholding.share,
+                shareholding.is_founder,
+                person.first_name,
+                person.last_name,
+                person.legal_name,
+            )
+            .join(person, person.id == shareholding.person_id)
+            .where(shareholding.company_id.in_(rows))
+            .order_by(shareholding.company_id, shareholding.id)
+        )
+        for holding in holdings:
+            row = rows[holding.company_id]
+            row["shareholder_count"] += 1
+            row["total_shares"] += holding.share
+            if holding.is_founder:
+                row["founder_names"].append(_display_name(holding.first_name, holding.last_name, holding.legal_name))
+        for row in rows.values():
+            row["founder_names"] = FOUNDER_SEPARATOR.join(row["founder_names"])
+
+    summary = models.CompanySummary.__table__
+    dialect_insert = DIALECT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is None:
+        db.execute(delete(summary).where(summary.c.id.in_(company_ids)))
+        if rows:
+            db.execute(insert(summary), list(rows.values()))
+        return
+
+    removed = company_ids - rows.keys()
+    if removed:
+        db.execute(delete(summary).where(summary.c.id.in_(removed)))
+    if rows:
+        stmt = dialect_insert(summary)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[summary.c.id],
+                set_={column: stmt.excluded[column] for column in next(iter(rows.values())) if column != "id"},
+            ),
+            list(rows.values()),
+        )
+
+
+def rebuild_company_summaries(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    # Backfills the whole table in id order, one transaction per batch
+    summary = models.CompanySummary.__table__
+    db.execute(delete(summary).where(summary.c.id.not_in(select(models.Company.id))))
+    db.commit()
+
+    count = 0
+    last_id = 0
+    while True:
+        company_ids = db.scalars(
+            select(models.Company.id)
+            .where(models.Company.id > last_id)
+            .order_by(models.Company.id)
+            .limit(batch_size)
+        ).all()
+        if not company_ids:
+            break
+        refresh_company_summaries(db, company_ids)
+        db.commit()
+        count += len(company_ids)
+        last_id = company_ids[-1]
+    logger.info(f"Rebuilt {count} company summaries")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the company_summary table from companies and shareholdings")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rebuild_company_summaries(db, args.batch_size)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import logging
+import os
+import time
+from contextlib import ExitStack
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, configure_mappers
+
+from app import conditional, models, statements
+from app.pagination import offset_paginate
+
+logger = logging.getLogger(__name__)
+
+DB_WARMUP = os.getenv("DB_WARMUP", "true").lower() == "true"
+# Connections opened at startup; defaults to the pool size
+DB_WARMUP_CONNECTIONS = int(os.getenv("DB_WARMUP_CONNECTIONS", os.getenv("DB_POOL_SIZE", "5")))
+
+# No row has this id, so the warmup queries return nothing
+MISSING_ID = 0
+
+
+def warm_pool(target_engine: Engine, connections: int = DB_WARMUP_CONNECTIONS) -> int:
+    # Connections are held until all are open so that the pool creates new
+    # ones instead of handing the same one out again.
+    with ExitStack() as stack:
+        for _ in range(connections):
+            stack.enter_context(target_engine.connect()).execute(text("SELECT 1"))
+        return connections
+
+
+def precompile_queries(db: Session):
+    # Runs the statements behind the hot read routes once so their compiled
+    # SQL is in the engine's statement cache before the first request.
+    configure_mappers()
+
+    conditional.company_version(db, MISSING_ID)
+    conditional.person_version(db, MISSING_ID)
+    conditional.shareholders_version(db, [MISSING_ID])
+    db.scalars(statements.COMPANY_WITH_SHAREHOLDERS, {"company_id": MISSING_ID}).unique().first()
+    db.scalars(statements.COMPANIES_WITH_SHAREHOLDERS, {"company_ids": [MISSING_ID]}).unique().all()
+    db.scalars(statements.PERSON_WITH_SHAREHOLDINGS, {"person_id": MISSING_ID}).first()
+    db.scalars(statements.SHAREHOLDING_WITH_DETAILS, {"shareholding_id": MISSING_ID}).first()
+    for by_company, with_person in ((True, False), (True, True), (False, False)):
+        db.scalars(
+            statements.shareholdings_page(by_company, False, with_person, False),
+            {"company_id": MISSING_ID, "skip": 0, "limit": 1},
+        ).all()
+    offset_paginate(db.query(models.CompanySummary), [models.CompanySummary.id], 0, 1)
+    offset_paginate(db.query(models.Company.id, models.Company.updated_at), [models.Company.id], 0, 1)
+    db.query(models.Person).order_by(models.Person.id).offset(0).limit(1).all()
+    db.rollback()
+
+
+def warm_up(target_engine: Engine, session_factory) -> float:
+    started = time.perf_counter()
+    opened = warm_pool(target_engine)
+    db = session_factory()
+    try:
+        precompile_queries(db)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    logger.info(f"Warmed up {opened} database connections and hot queries in {elapsed * 1000:.1f} ms")
+    return elapsed
+
+
+async def warm_up_async(target_engine, session_factory) -> float:
+    started = time.perf_counter()
+    connections = []
+    try:
+        for _ in range(DB_WARMUP_CONNECTIONS):
+            connection = await target_engine.connect()
+            connections.append(connection)
+            await connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            await connection.close()
+    async with session_factory() as db:
+        await db.run_sync(precompile_queries)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Warmed up {len(connections)} async database connections and hot queries in {elapsed * 1000:.1f} ms")
+    return elapsed
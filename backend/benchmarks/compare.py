@@ -0,0 +1,44 @@
+import argparse
+import sys
+
+from benchmarks.results import read_results
+
+# Metric compared per result kind; lower is better for all of them
+METRICS = {"micro": "mean_us", "load": "p50_ms", "startup": "p50_ms", "ledger": "p50_ms", "wire": "bytes"}
+
+
+def compare(baseline: dict, current: dict, metric: str, threshold: float) -> list:
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name, {}).get(metric)
+        after = result.get(metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        rows.append((name, before, after, change, change > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--metric", help="defaults to mean_us for micro results, bytes for wire results and p50_ms for the others")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    baseline, current = read_results(args.baseline), read_results(args.current)
+    if baseline["kind"] != current["kind"]:
+        parser.error(f"cannot compare {baseline['kind']} results with {current['kind']} results")
+    metric = args.metric or METRICS[current["kind"]]
+
+    rows = compare(baseline, current, metric, args.threshold)
+    print(f"{'benchmark':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, before, after, change, regressed in rows:
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{name:<48} {before:>12.3f} {after:>12.3f} {change:>+8.1%}{marker}")
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
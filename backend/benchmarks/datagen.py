@@ -0,0 +1,304 @@
+import argparse
+import logging
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Iterator, List
+
+from sqlalchemy import bindparam, func, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.codes import with_check_digit
+from app.initialize_db import (
+    estonian_first_names,
+    estonian_last_names,
+    generate_company_name,
+)
+from app.ledger import backfill_ledger, record_ledger_events
+from app.summary import rebuild_company_summaries
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 10000
+# Approximate total rows (persons + companies + shareholdings) per preset
+SCALES = {"1e4": 10 ** 4, "1e5": 10 ** 5, "1e6": 10 ** 6, "1e7": 10 ** 7}
+
+# (gender/century digit, birth year) pairs the id_code generator in
+# app.initialize_db draws from
+_ID_CODE_YEARS = [(gc, year) for gc in (3, 4) for year in range(40, 100)] + \
+                 [(gc, year) for gc in (5, 6) for year in range(0, 24)]
+_ID_CODE_SPACE = len(_ID_CODE_YEARS) * 12 * 28 * 1000
+
+
+def unique_id_codes(rng: random.Random, count: int) -> Iterator[str]:
+    # Same layout as generate_estonian_id_code, but drawn without
+    # replacement so large datasets satisfy the unique index on id_code.
+    for index in rng.sample(range(_ID_CODE_SPACE), count):
+        index, serial = divmod(index, 1000)
+        index, day = divmod(index, 28)
+        index, month = divmod(index, 12)
+        gender_century, year = _ID_CODE_YEARS[index]
+        yield with_check_digit(f"{gender_century}{year:02d}{month + 1:02d}{day + 1:02d}{serial:03d}")
+
+
+def unique_codes(rng: random.Random, length: int, count: int) -> List[str]:
+    # Registry codes of `length` digits ending in a check digit. Past the
+    # 9 million 8-digit codes, which no preset needs, they fall back to
+    # unchecked codes, as loaded before validation.
+    low, high = 10 ** (length - 2), 10 ** (length - 1) - 1
+    if count <= high - low + 1:
+        return [with_check_digit(str(code)) for code in rng.sample(range(low, high + 1), count)]
+    return [str(code) for code in rng.sample(range(low * 10, high * 10 + 10), count)]
+
+
+def _batched(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class DatasetGenerator:
+    # Builds a deterministic dataset for a seed: the same arguments always
+    # produce the same rows. Ids are assigned here, so every table is
+    # written with plain executemany INSERTs in batches.
+    def __init__(
+            self,
+            companies: int,
+            individuals: int,
+            legal_persons: int,
+            max_shareholders: int = 4,
+            holding_ratio: float = 0.5,
+            history_companies: int = 0,
+            history_changes: int = 2000,
+            seed: int = 42,
+    ):
+        self.companies = companies
+        self.individuals = individuals
+        self.legal_persons = legal_persons
+        self.max_shareholders = max_shareholders
+        self.holding_ratio = holding_ratio
+        self.history_companies = history_companies
+        self.history_changes = history_changes
+        self.seed = seed
+
+    @classmethod
+    def for_rows(cls, rows: int, seed: int = 42, **options) -> "DatasetGenerator":
+        # About 2.5 shareholdings per company, one person per company and a
+        # tenth of the persons legal.
+        companies = max(1, int(rows / 4.5))
+        return cls(companies=companies, individuals=int(companies * 0.9), legal_persons=max(1, int(companies * 0.1)),
+                   seed=seed, **options)
+
+    def company_rows(self, rng: random.Random, reg_codes: List[str]) -> Iterator[dict]:
+        now = datetime.utcnow()
+        epoch = date(1990, 1, 1)
+        for index, reg_code in enumerate(reg_codes, start=1):
+            yield {
+                "id": index,
+                "name": generate_company_name(rng),
+                "reg_code": reg_code,
+                "founding_date": epoch + timedelta(days=rng.randint(0, 12000)),
+                "capital": Decimal(0),
+                "created_at": now,
+                "updated_at": now,
+            }
+
+    def person_rows(
+            self, rng: random.Random, company_reg_codes: List[str], other_reg_codes: List[str]
+    ) -> Iterator[dict]:
+        now = datetime.utcnow()
+        person_id = 0
+        for id_code in unique_id_codes(rng, self.individuals):
+            person_id += 1
+            yield {
+                "id": person_id,
+                "type": models.PersonType.individual.name,
+                "first_name": rng.choice(estonian_first_names),
+                "last_name": rng.choice(estonian_last_names),
+                "id_code": id_code,
+                "legal_name": None,
+                "reg_code": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+
+        # Part of the legal persons are companies of the dataset, which
+        # makes ownership chains for the beneficial-owner queries.
+        holdings = min(int(self.legal_persons * self.holding_ratio), len(company_reg_codes))
+        reg_codes = rng.sample(company_reg_codes, holdings)
+        reg_codes += other_reg_codes[:self.legal_persons - holdings]
+        for reg_code in reg_codes:
+            person_id += 1
+            yield {
+                "id": person_id,
+                "type": models.PersonType.legal.name,
+                "first_name": None,
+                "last_name": None,
+                "id_code": None,
+                "legal_name": f"{rng.choice(estonian_last_names)} Investeeringud",
+                "reg_code": reg_code,
+                "created_at": now,
+                "updated_at": now,
+            }
+
+    def shareholding_rows(self, rng: random.Random, capitals: dict) -> Iterator[dict]:
+        now = datetime.utcnow()
+        persons = self.individuals + self.legal_persons
+        shareholding_id = 0
+        for company_id in range(1, self.companies + 1):
+            count = rng.randint(1, min(self.max_shareholders, persons))
+            capital = Decimal(0)
+            for position, person_id in enumerate(rng.sample(range(1, persons + 1), count)):
+                shareholding_id += 1
+                share = Decimal(rng.randint(1, 400) * 25)
+                capital += share
+                yield {
+                    "id": shareholding_id,
+                    "company_id": company_id,
+                    "person_id": person_id,
+                    "share": share,
+                    "is_founder": position == 0,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            capitals[company_id] = capital
+
+    def load(self, db: Session, batch_size: int = BATCH_SIZE) -> dict:
+        if db.scalar(select(func.count()).select_from(models.Company)):
+            raise RuntimeError("The database already contains companies; load the dataset into an empty database")
+
+        rng = random.Random(self.seed)
+        counts = {}
+        started = time.perf_counter()
+
+        # Companies and legal persons draw from one pool of registry codes, so
+        # only the legal persons meant to be companies share a company's code
+        reg_codes = unique_codes(rng, 8, self.companies + self.legal_persons)
+        company_reg_codes, other_reg_codes = reg_codes[:self.companies], reg_codes[self.companies:]
+        counts["companies"] = self._insert(db, models.Company, self.company_rows(rng, company_reg_codes), batch_size)
+        counts["persons"] = self._insert(
+            db, models.Person, self.person_rows(rng, company_reg_codes, other_reg_codes), batch_size
+        )
+
+        capitals = {}
+        counts["shareholdings"] = self._insert(db, models.Shareholding, self.shareholding_rows(rng, capitals),
+                                               batch_size)
+        # Capital is the sum of the shares, as the API requires
+        company = models.Company.__table__
+        for batch in _batched(({"company_id": key, "capital": value} for key, value in capitals.items()), batch_size):
+            db.execute(
+                company.update().where(company.c.id == bindparam("company_id")).values(capital=bindparam("capital")),
+                batch,
+            )
+            db.commit()
+
+        self._reset_sequences(db)
+        if self.history_companies:
+            counts["ledger_events"] = self.write_history(db, rng)
+        counts["company_summary"] = rebuild_company_summaries(db, batch_size)
+        counts["ledger_backfill"] = backfill_ledger(db, batch_size)
+        counts["seconds"] = round(time.perf_counter() - started, 3)
+        return counts
+
+    def write_history(self, db: Session, rng: random.Random) -> int:
+        # The first companies get a long ledger: registered history_changes
+        # minutes ago, then one share change (and the matching capital) per
+        # minute, each recorded like an API write. Returns the event count.
+        shareholding, company = models.Shareholding.__table__, models.Company.__table__
+        started_at = datetime.utcnow() - timedelta(minutes=self.history_changes)
+        for company_id in range(1, min(self.history_companies, self.companies) + 1):
+            shares = dict(db.execute(
+                select(shareholding.c.id, shareholding.c.share).where(shareholding.c.company_id == company_id)
+            ).all())
+            record_ledger_events(db, [company_id], occurred_at=started_at)
+            for minute in range(1, self.history_changes):
+                shareholding_id = rng.choice(sorted(shares))
+                shares[shareholding_id] = Decimal(rng.randint(1, 400) * 25)
+                db.execute(update(shareholding).where(shareholding.c.id == shareholding_id)
+                           .values(share=shares[shareholding_id]))
+                db.execute(update(company).where(company.c.id == company_id).values(capital=sum(shares.values())))
+                record_ledger_events(db, [company_id], occurred_at=started_at + timedelta(minutes=minute))
+            db.commit()
+            logger.info(f"Wrote ledger history for company {company_id}")
+        return db.scalar(select(func.count()).select_from(models.LedgerEvent))
+
+    @staticmethod
+    def _insert(db: Session, model, rows: Iterator[dict], batch_size: int) -> int:
+        count = 0
+        for batch in _batched(rows, batch_size):
+            db.execute(insert(model.__table__), batch)
+            db.commit()
+            count += len(batch)
+            logger.info(f"Inserted {count} {model.__tablename__}")
+        return count
+
+    @staticmethod
+    def _reset_sequences(db: Session):
+        # Rows were written with explicit ids; move the serial sequences past them
+        if db.get_bind().dialect.name != "postgresql":
+            return
+        for table in ("persons", "companies", "shareholdings"):
+            db.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+            ))
+        db.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load a deterministic synthetic dataset into an empty database")
+    parser.add_argument("--rows", choices=SCALES, help="approximate total row count preset")
+    parser.add_argument("--companies", type=int)
+    parser.add_argument("--individuals", type=int)
+    parser.add_argument("--legal-persons", type=int)
+    parser.add_argument("--max-shareholders", type=int, default=4)
+    parser.add_argument("--holding-ratio", type=float, default=0.5,
+                        help="share of legal persons that are companies of the dataset")
+    parser.add_argument("--history-companies", type=int, default=0,
+                        help="companies that get a long capital/shareholding ledger")
+    parser.add_argument("--history-changes", type=int, default=2000, help="share changes per history company; each writes two ledger events")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.rows:
+        generator = DatasetGenerator.for_rows(
+            SCALES[args.rows], seed=args.seed,
+            history_companies=args.history_companies, history_changes=args.history_changes,
+        )
+    elif args.companies:
+        generator = DatasetGenerator(
+            companies=args.companies,
+            individuals=args.individuals if args.individuals is not None else args.companies,
+            legal_persons=args.legal_persons if args.legal_persons is not None else max(1, args.companies // 10),
+            max_shareholders=args.max_shareholders,
+            holding_ratio=args.holding_ratio,
+            history_companies=args.history_companies,
+            history_changes=args.history_changes,
+            seed=args.seed,
+        )
+    else:
+        parser.error("either --rows or --companies is required")
+
+    from app.database import SessionLocal, migrate_database
+
+    migrate_database()
+    db = SessionLocal()
+    try:
+        counts = generator.load(db, args.batch_size)
+    finally:
+        db.close()
+    print(counts)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import argparse
+import json
+import re
+import sys
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection
+
+from app import models
+from app.search import person_search_condition
+from benchmarks.results import write_results
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    statement: Callable
+    # Any of these indexes satisfies the check
+    indexes: tuple
+    dialect: Optional[str] = None
+
+
+def _shareholdings_of_company():
+    return (
+        select(models.Shareholding)
+        .where(models.Shareholding.company_id == 1)
+        .order_by(models.Shareholding.id)
+        .limit(100)
+    )
+
+
+def _shareholdings_of_person():
+    return (
+        select(models.Shareholding)
+        .where(models.Shareholding.person_id == 1)
+        .order_by(models.Shareholding.id)
+        .limit(100)
+    )
+
+
+def _shareholders_version():
+    return (
+        select(func.max(models.Shareholding.updated_at), func.count(models.Shareholding.id))
+        .where(models.Shareholding.company_id.in_([1, 2, 3]))
+    )
+
+
+def _summary_page():
+    return select(models.CompanySummary).order_by(models.CompanySummary.name, models.CompanySummary.id).limit(50)
+
+
+def _company_by_reg_code():
+    return select(models.Company).where(models.Company.reg_code == "1234567")
+
+
+def _person_by_code():
+    return select(models.Person).where(person_search_condition("4900101", "individual")).limit(20)
+
+
+def _person_by_name():
+    return select(models.Person).where(person_search_condition("mari tamm")).limit(20)
+
+
+CHECKS = [
+    PlanCheck("shareholdings.by_company", _shareholdings_of_company,
+              ("ix_shareholdings_company_id_id", "uq_shareholdings_company_person")),
+    PlanCheck("shareholdings.by_person", _shareholdings_of_person, ("ix_shareholdings_person_id_id",)),
+    PlanCheck("shareholdings.version", _shareholders_version,
+              ("ix_shareholdings_company_id_id", "uq_shareholdings_company_person")),
+    PlanCheck("company_summary.page_by_name", _summary_page, ("ix_company_summary_name_id",)),
+    PlanCheck("companies.by_reg_code", _company_by_reg_code, ("ix_companies_reg_code",)),
+    PlanCheck("persons.by_code_prefix", _person_by_code, ("ix_persons_id_code_prefix",), dialect="postgresql"),
+    PlanCheck("persons.by_name", _person_by_name, ("ix_persons_search_trgm",), dialect="postgresql"),
+]
+
+
+def _index_names_postgresql(plan) -> List[str]:
+    names = []
+    if isinstance(plan, dict):
+        if "Index Name" in plan:
+            names.append(plan["Index Name"])
+        for value in plan.values():
+            names.extend(_index_names_postgresql(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            names.extend(_index_names_postgresql(value))
+    return names
+
+
+def plan_indexes(connection: Connection, statement) -> List[str]:
+    dialect = connection.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "postgresql":
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return _index_names_postgresql(plan)
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    return [match.group(1) for row in rows for match in [re.search(r"USING (?:COVERING )?INDEX (\w+)", row[-1])] if match]
+
+
+def run_checks(connection: Connection, strict: bool = False) -> dict:
+    if connection.dialect.name == "postgresql" and not strict:
+        # Small or freshly loaded tables make sequential scans cheapest;
+        # this asks whether the index can serve the query at all.
+        connection.exec_driver_sql("SET enable_seqscan = off")
+
+    results = {}
+    for check in CHECKS:
+        if check.dialect and check.dialect != connection.dialect.name:
+            continue
+        used = plan_indexes(connection, check.statement())
+        results[check.name] = {
+            "expected": list(check.indexes),
+            "used": used,
+            "ok": any(index in used for index in check.indexes),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check with EXPLAIN that the main access paths use their indexes")
+    parser.add_argument("--strict", action="store_true",
+                        help="keep sequential scans enabled; use on databases loaded with realistic data")
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    from app.database import engine
+
+    with engine.connect() as connection:
+        results = run_checks(connection, args.strict)
+
+    for name, result in results.items():
+        status = "ok" if result["ok"] else "MISSING"
+        print(f"{status:<8} {name:<32} used: {', '.join(result['used']) or 'no index'}")
+    if args.output:
+        write_results(args.output, "explain", results, dialect=engine.dialect.name)
+    return 0 if all(result["ok"] for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
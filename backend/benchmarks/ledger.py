@@ -0,0 +1,94 @@
+import argparse
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import ledger, models
+from benchmarks.results import write_results
+
+COMPANIES = 5
+QUERIES = 200
+SEED = 42
+
+
+def full_replay(db: Session, company_id: int, as_of) -> dict:
+    # Baseline without snapshots: every event up to as_of
+    state = ledger.empty_state()
+    events = ledger.events_table
+    for event in db.execute(
+        select(events).where(events.c.company_id == company_id, events.c.occurred_at <= as_of).order_by(events.c.id)
+    ):
+        ledger.apply_event(state, event)
+    return state
+
+
+def _summarize(latencies: List[float]) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "queries": len(latencies),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+def run(db: Session, companies: int, queries: int, seed: int) -> Dict[str, dict]:
+    # The companies with the longest ledgers, queried at random points of
+    # their history
+    rng = random.Random(seed)
+    events = ledger.events_table
+    histories = db.execute(
+        select(events.c.company_id, func.count(), func.min(events.c.occurred_at), func.max(events.c.occurred_at))
+        .group_by(events.c.company_id)
+        .order_by(func.count().desc())
+        .limit(companies)
+    ).all()
+    if not histories:
+        raise RuntimeError("The ledger is empty; load data with benchmarks.datagen --history-companies first")
+
+    methods: Dict[str, Callable] = {"snapshot": ledger.cap_table_as_of, "full_replay": full_replay}
+    results = {}
+    for company_id, count, first, last in histories:
+        points = [first + (last - first) * rng.random() for _ in range(queries)]
+        for name, method in methods.items():
+            latencies = []
+            for as_of in points:
+                started = time.perf_counter()
+                method(db, company_id, as_of)
+                latencies.append(time.perf_counter() - started)
+            db.rollback()
+            results[f"ledger.as_of.{name}[company={company_id},events={count}]"] = _summarize(latencies)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Point-in-time cap table latency with and without snapshots")
+    parser.add_argument("--companies", type=int, default=COMPANIES, help="companies with the most events to query")
+    parser.add_argument("--queries", type=int, default=QUERIES, help="as_of lookups per company")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", default="-", help="JSON results file, - for stdout")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        results = run(db, args.companies, args.queries, args.seed)
+        snapshots = db.scalar(select(func.count()).select_from(models.CapTableSnapshot))
+    finally:
+        db.close()
+    for name, result in results.items():
+        print(f"{name}: p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms", file=sys.stderr)
+    write_results(args.output, "ledger", results, snapshots=snapshots,
+                  snapshot_interval=ledger.LEDGER_SNAPSHOT_INTERVAL)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
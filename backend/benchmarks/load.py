@@ -0,0 +1,388 @@
+import argparse
+import asyncio
+import random
+import re
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.codes import with_check_digit
+from benchmarks.results import write_results
+
+REQUESTS = 200
+CONCURRENCY = 10
+SEED = 42
+
+RequestSpec = Tuple[str, str, dict]
+
+_SERVER_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+@dataclass
+class Context:
+    # Sample of existing rows, read once from the API before the run
+    rng: random.Random
+    company_ids: List[int]
+    company_reg_codes: List[str]
+    person_ids: List[int]
+    person_codes: List[str]
+    shareholding_ids: List[int]
+    # Codes for new rows come from an unseeded generator so repeated runs
+    # against the same database do not collide with earlier inserts.
+    codes: random.Random = field(default_factory=random.Random)
+    counter: int = 0
+
+    def next_number(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+@dataclass
+class Scenario:
+    name: str
+    prepare: Callable[[httpx.AsyncClient, Context], Awaitable[RequestSpec]]
+    write: bool = False
+
+
+@dataclass
+class Outcome:
+    latencies: List[float] = field(default_factory=list)
+    server_queries: List[int] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+
+
+def _get(url: str, **params) -> RequestSpec:
+    return "GET", url, {"params": params}
+
+
+def _new_person(ctx: Context) -> dict:
+    number = ctx.next_number()
+    return {
+        "type": "individual",
+        "first_name": "Koormus",
+        "last_name": f"Test{number}",
+        "id_code": with_check_digit(f"6{ctx.codes.randint(0, 23):02d}{ctx.codes.randint(1, 12):02d}"
+                                    f"{ctx.codes.randint(1, 28):02d}{ctx.codes.randint(0, 999):03d}"),
+    }
+
+
+def _new_reg_code(ctx: Context) -> str:
+    return with_check_digit(str(ctx.codes.randint(1000000, 9999999)))
+
+
+async def _created_id(client: httpx.AsyncClient, url: str, payload: dict) -> int:
+    response = await client.post(url, json=payload)
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+# Read scenarios
+
+async def persons_search_name(client, ctx):
+    return _get("/persons/", search=ctx.rng.choice(["tamm", "mari", "kask", "investeeringud"]), limit=20)
+
+
+async def persons_search_code(client, ctx):
+    return _get("/persons/", search=ctx.rng.choice(ctx.person_codes)[:5], limit=20)
+
+
+async def persons_page(client, ctx):
+    return _get("/persons/", skip=ctx.rng.randint(0, 1000), limit=100)
+
+
+async def persons_batch(client, ctx):
+    return "POST", "/persons/batch", {"json": {"ids": ctx.rng.sample(ctx.person_ids, min(50, len(ctx.person_ids)))}}
+
+
+async def person_detail(client, ctx):
+    return _get(f"/persons/{ctx.rng.choice(ctx.person_ids)}")
+
+
+async def companies_full(client, ctx):
+    return _get("/companies/", limit=20)
+
+
+async def companies_summary(client, ctx):
+    return _get("/companies/", view="summary", sort=ctx.rng.choice(["name", "-capital", "founding_date"]), limit=50)
+
+
+async def companies_filtered(client, ctx):
+    return _get("/companies/", view="summary", name=ctx.rng.choice(["ehitus", "puit", "energia"]),
+                founded_from="2000-01-01", limit=50)
+
+
+async def companies_by_shareholder(client, ctx):
+    return _get("/companies/", view="summary", shareholder=ctx.rng.choice(["tamm", "saar", "sepp"]), limit=50)
+
+
+async def company_detail(client, ctx):
+    return _get(f"/companies/{ctx.rng.choice(ctx.company_ids)}")
+
+
+async def company_as_of(client, ctx):
+    as_of = datetime.utcnow() - timedelta(seconds=ctx.rng.randint(0, 60))
+    return _get(f"/companies/{ctx.rng.choice(ctx.company_ids)}", as_of=as_of.isoformat())
+
+
+async def beneficial_owners(client, ctx):
+    return _get(f"/companies/{ctx.rng.choice(ctx.company_ids)}/beneficial_owners")
+
+
+async def query_companies(client, ctx):
+    # The companies.full page trimmed to what a list view shows
+    fields = {"name": True, "reg_code": True, "shareholders": {"share": True, "person": {
+        "first_name": True, "last_name": True, "legal_name": True,
+    }}}
+    return "POST", "/query", {"json": {"root": "companies", "limit": 20, "fields": fields}}
+
+
+async def query_person_holdings(client, ctx):
+    # Persons with the companies they hold shares in, which over REST takes
+    # a request per person and per company
+    fields = {"id_code": True, "shareholdings": {"share": True, "company": {"name": True, "capital": True}}}
+    ids = ctx.rng.sample(ctx.person_ids, min(50, len(ctx.person_ids)))
+    return "POST", "/query", {"json": {"root": "persons", "ids": ids, "fields": fields}}
+
+
+async def shareholdings_of_company(client, ctx):
+    return _get("/shareholdings/", company_id=ctx.rng.choice(ctx.company_ids), include="person")
+
+
+async def shareholding_detail(client, ctx):
+    return _get(f"/shareholdings/{ctx.rng.choice(ctx.shareholding_ids)}")
+
+
+async def export_ndjson(client, ctx):
+    return _get("/export/companies", updated_since="2100-01-01T00:00:00")
+
+
+# Write scenarios; each creates the rows it changes or deletes
+
+async def person_create(client, ctx):
+    return "POST", "/persons/", {"json": _new_person(ctx)}
+
+
+async def person_update(client, ctx):
+    payload = _new_person(ctx)
+    person_id = await _created_id(client, "/persons/", payload)
+    return "PUT", f"/persons/{person_id}", {"json": {**payload, "first_name": "Muudetud"}}
+
+
+async def person_delete(client, ctx):
+    return "DELETE", f"/persons/{await _created_id(client, '/persons/', _new_person(ctx))}", {}
+
+
+def _new_company(ctx: Context) -> dict:
+    return {"name": f"Koormus {ctx.next_number()} OÜ", "reg_code": _new_reg_code(ctx),
+            "founding_date": "2020-01-01", "capital": "2500"}
+
+
+async def company_create(client, ctx):
+    return "POST", "/companies/", {"json": _new_company(ctx)}
+
+
+async def company_update(client, ctx):
+    payload = _new_company(ctx)
+    company_id = await _created_id(client, "/companies/", payload)
+    return "PUT", f"/companies/{company_id}", {"json": {**payload, "capital": "5000"}}
+
+
+async def company_delete(client, ctx):
+    return "DELETE", f"/companies/{await _created_id(client, '/companies/', _new_company(ctx))}", {}
+
+
+async def company_registration(client, ctx):
+    shareholders = [{"id": person_id, "type": "individual", "share": "1250"}
+                    for person_id in ctx.rng.sample(ctx.person_ids, 2)]
+    return "POST", "/companies/registration", {"json": {**_new_company(ctx), "shareholders": shareholders}}
+
+
+async def capital_update(client, ctx):
+    company_id = await _created_id(client, "/companies/", _new_company(ctx))
+    person_id = ctx.rng.choice(ctx.person_ids)
+    holding = {"company_id": company_id, "person_id": person_id, "share": "2500", "is_founder": True}
+    shareholding_id = await _created_id(client, "/shareholdings/", holding)
+    payload = {
+        "new_capital": "5000",
+        "original_capital": "2500",
+        "shareholders": [
+            {"id": shareholding_id, "type": "individual", "share": "2500", "is_founder": True},
+            {**_new_person(ctx), "share": "2500", "is_founder": False},
+        ],
+    }
+    return "PUT", f"/companies/{company_id}/capital_update", {"json": payload}
+
+
+def _new_shareholding(ctx: Context) -> dict:
+    return {"company_id": ctx.rng.choice(ctx.company_ids), "person_id": ctx.rng.choice(ctx.person_ids),
+            "share": "1", "is_founder": False}
+
+
+async def shareholding_create(client, ctx):
+    return "POST", "/shareholdings/", {"json": _new_shareholding(ctx)}
+
+
+async def shareholding_update(client, ctx):
+    payload = _new_shareholding(ctx)
+    shareholding_id = await _created_id(client, "/shareholdings/", payload)
+    return "PUT", f"/shareholdings/{shareholding_id}", {"json": {**payload, "share": "2"}}
+
+
+async def shareholding_delete(client, ctx):
+    return "DELETE", f"/shareholdings/{await _created_id(client, '/shareholdings/', _new_shareholding(ctx))}", {}
+
+
+async def import_persons(client, ctx):
+    lines = "\n".join(
+        f'{{"type": "individual", "first_name": "Import", "last_name": "Test", "id_code": "{_new_person(ctx)["id_code"]}"}}'
+        for _ in range(100)
+    )
+    return "POST", "/import/persons", {"files": {"file": ("persons.ndjson", lines.encode(), "application/x-ndjson")}}
+
+
+SCENARIOS = [
+    Scenario("persons.search_name", persons_search_name),
+    Scenario("persons.search_code", persons_search_code),
+    Scenario("persons.page", persons_page),
+    Scenario("persons.batch", persons_batch),
+    Scenario("persons.detail", person_detail),
+    Scenario("companies.full", companies_full),
+    Scenario("companies.summary", companies_summary),
+    Scenario("companies.filtered", companies_filtered),
+    Scenario("companies.by_shareholder", companies_by_shareholder),
+    Scenario("companies.detail", company_detail),
+    Scenario("companies.as_of", company_as_of),
+    Scenario("companies.beneficial_owners", beneficial_owners),
+    Scenario("query.companies", query_companies),
+    Scenario("query.person_holdings", query_person_holdings),
+    Scenario("shareholdings.of_company", shareholdings_of_company),
+    Scenario("shareholdings.detail", shareholding_detail),
+    Scenario("export.ndjson_incremental", export_ndjson),
+    Scenario("persons.create", person_create, write=True),
+    Scenario("persons.update", person_update, write=True),
+    Scenario("persons.delete", person_delete, write=True),
+    Scenario("companies.create", company_create, write=True),
+    Scenario("companies.update", company_update, write=True),
+    Scenario("companies.delete", company_delete, write=True),
+    Scenario("companies.registration", company_registration, write=True),
+    Scenario("companies.capital_update", capital_update, write=True),
+    Scenario("shareholdings.create", shareholding_create, write=True),
+    Scenario("shareholdings.update", shareholding_update, write=True),
+    Scenario("shareholdings.delete", shareholding_delete, write=True),
+    Scenario("import.persons", import_persons, write=True),
+]
+
+
+async def discover(client: httpx.AsyncClient, seed: int) -> Context:
+    companies = (await client.get("/companies/", params={"view": "summary", "limit": 500})).json()
+    persons = (await client.get("/persons/", params={"limit": 500})).json()
+    shareholdings = (await client.get("/shareholdings/", params={"limit": 500})).json()
+    if not companies or not persons:
+        raise SystemExit("The target database is empty; load a dataset with python -m benchmarks.datagen first")
+    return Context(
+        rng=random.Random(seed),
+        company_ids=[company["id"] for company in companies],
+        company_reg_codes=[company["reg_code"] for company in companies],
+        person_ids=[person["id"] for person in persons],
+        person_codes=[person["id_code"] or person["reg_code"] for person in persons],
+        shareholding_ids=[shareholding["id"] for shareholding in shareholdings],
+    )
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: Context, scenario: Scenario,
+                       requests: int, concurrency: int) -> dict:
+    outcome = Outcome()
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            try:
+                method, url, kwargs = await scenario.prepare(client, ctx)
+                started = time.perf_counter()
+                response = await client.request(method, url, **kwargs)
+                await response.aread()
+                outcome.latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                outcome.errors += 1
+                continue
+            outcome.statuses[response.status_code] = outcome.statuses.get(response.status_code, 0) + 1
+            if response.status_code >= 500:
+                outcome.errors += 1
+            queries = _SERVER_QUERIES.search(response.headers.get("server-timing", ""))
+            if queries:
+                outcome.server_queries.append(int(queries.group(1)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(outcome, time.perf_counter() - started)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(outcome: Outcome, elapsed: float) -> dict:
+    latencies = sorted(outcome.latencies)
+    result = {
+        "requests": len(latencies),
+        "errors": outcome.errors,
+        "statuses": {str(code): count for code, count in sorted(outcome.statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    if latencies:
+        result.update({
+            "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+            "p90_ms": round(_percentile(latencies, 0.90) * 1000, 3),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3),
+        })
+    if outcome.server_queries:
+        result["queries_mean"] = round(statistics.mean(outcome.server_queries), 2)
+        result["queries_max"] = max(outcome.server_queries)
+    return result
+
+
+async def run(base_url: str, requests: int, concurrency: int, writes: bool, only: Optional[str], seed: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        ctx = await discover(client, seed)
+        results = {}
+        for scenario in SCENARIOS:
+            if scenario.write and not writes:
+                continue
+            if only and only not in scenario.name:
+                continue
+            results[scenario.name] = await run_scenario(client, ctx, scenario, requests, concurrency)
+            summary = results[scenario.name]
+            print(f"{scenario.name}: p50 {summary.get('p50_ms', '-')} ms, p99 {summary.get('p99_ms', '-')} ms, "
+                  f"{summary['throughput_rps']} rps, {summary['errors']} errors", file=sys.stderr)
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test every API route against a running server")
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--requests", type=int, default=REQUESTS, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--writes", action="store_true", help="also run the scenarios that modify data")
+    parser.add_argument("--only", help="only run scenarios whose name contains this")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", default="-", help="JSON results file, - for stdout")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args.base_url, args.requests, args.concurrency, args.writes, args.only, args.seed))
+    write_results(args.output, "load", results, base_url=args.base_url, requests=args.requests,
+                  concurrency=args.concurrency)
+    return 1 if any(result["errors"] for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import argparse
+import statistics
+import sys
+import timeit
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Dict
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.pool import StaticPool
+
+from app import models, schemas, serializers, statements
+from app.cache import CachedResponse
+from app.codes import with_check_digit
+from app.export import _export_statement
+from app.ownership import ownership_chains
+from app.pagination import encode_cursor
+from app.search import company_filter_conditions, person_search_condition
+from benchmarks.results import write_results
+
+ROUNDS = 5
+DIALECT = postgresql.dialect()
+
+
+def build_company(shareholders: int) -> models.Company:
+    # Transient objects only; nothing here touches a database
+    now = datetime(2024, 1, 1)
+    company = models.Company(
+        id=1, name="Eesti Ehitus OÜ", reg_code="1234567", founding_date=date(2020, 1, 1),
+        capital=Decimal(shareholders * 100), created_at=now, updated_at=now,
+    )
+    for index in range(1, shareholders + 1):
+        person = models.Person(
+            id=index, type=models.PersonType.individual, first_name="Mari", last_name="Tamm",
+            id_code=f"490010{index:05d}", created_at=now, updated_at=now,
+        )
+        company.shareholdings.append(models.Shareholding(
+            id=index, company_id=1, person_id=index, share=Decimal(100), is_founder=index == 1,
+            created_at=now, updated_at=now, person=person,
+        ))
+    return company
+
+
+def serialization_benchmarks(shareholders: int) -> Dict[str, Callable]:
+    company = build_company(shareholders)
+    payload = serializers.company_payload(company)
+    body = serializers.dumps(payload)
+    cached = CachedResponse(body, {"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    packed = cached.pack()
+
+    return {
+        f"serialize.company_payload[{shareholders}]": lambda: serializers.company_payload(company),
+        f"serialize.orjson_dumps[{shareholders}]": lambda: serializers.dumps(payload),
+        f"serialize.pydantic_response_model[{shareholders}]": (
+            lambda: schemas.CompanyWithShareholders.model_validate(payload).model_dump_json()
+        ),
+        f"serialize.cache_pack[{shareholders}]": cached.pack,
+        f"serialize.cache_unpack[{shareholders}]": lambda: CachedResponse.unpack(packed),
+        "serialize.cursor": lambda: encode_cursor(["Eesti Ehitus OÜ", 123456]),
+    }
+
+
+def validation_benchmarks(shareholders: int) -> Dict[str, Callable]:
+    # Request bodies and import rows as the API receives them, plus the
+    # response model path from ORM objects
+    person_create = schemas.PERSON_CREATE
+    individual = {"type": "individual", "first_name": "Mari", "last_name": "Tamm",
+                  "id_code": with_check_digit("4900101000"), "legal_name": None, "reg_code": None}
+    legal = {"type": "legal", "legal_name": "Tamm Investeeringud OÜ", "reg_code": with_check_digit("1234567")}
+    rows = [{**individual, "id_code": with_check_digit(f"4900101{index:03d}")} for index in range(1000)]
+    registration = {
+        "name": "Eesti Ehitus OÜ", "reg_code": with_check_digit("1234567"), "founding_date": "2020-01-01",
+        "capital": str(shareholders * 100),
+        "shareholders": [
+            {**individual, "id_code": with_check_digit(f"4900101{index:03d}"), "share": "100"}
+            for index in range(shareholders)
+        ],
+    }
+    company = build_company(shareholders)
+
+    return {
+        "validate.person_create.individual": lambda: person_create.validate_python(individual),
+        "validate.person_create.legal": lambda: person_create.validate_python(legal),
+        "validate.import_persons[1000]": lambda: [person_create.validate_python(row) for row in rows],
+        f"validate.company_registration[{shareholders}]": (
+            lambda: schemas.CompanyRegistration.model_validate(registration)
+        ),
+        f"validate.shareholdings_from_orm[{shareholders}]": lambda: [
+            schemas.ShareholdingWithDetails.model_validate(shareholding) for shareholding in company.shareholdings
+        ],
+    }
+
+
+def _compile(statement):
+    return statement.compile(dialect=DIALECT)
+
+
+def query_benchmarks() -> Dict[str, Callable]:
+    return {
+        "query.company_list_filters": lambda: _compile(
+            select(models.CompanySummary)
+            .where(*company_filter_conditions(
+                name="ehitus", founded_from=date(2000, 1, 1), capital_min=Decimal(2500),
+                shareholder="tamm", source=models.CompanySummary,
+            ))
+            .order_by(models.CompanySummary.name, models.CompanySummary.id)
+            .limit(100)
+        ),
+        "query.person_search_name": lambda: _compile(
+            select(models.Person).where(person_search_condition("mari tamm")).limit(100)
+        ),
+        "query.person_search_code": lambda: _compile(
+            select(models.Person).where(person_search_condition("4900101", "individual")).limit(100)
+        ),
+        "query.ownership_chains": lambda: _compile(ownership_chains(1)),
+        "query.export_statement": lambda: _compile(_export_statement(datetime(2024, 1, 1))),
+    }
+
+
+def lookup_benchmarks(shareholders: int) -> Dict[str, Callable]:
+    # Hot read lookups against an in-memory SQLite database, built as ad hoc
+    # ORM queries versus the prebuilt statements in app.statements. Both run
+    # the same SQL, so the difference is Python-side query construction.
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    db = Session(engine)
+    db.add(build_company(shareholders))
+    db.commit()
+
+    def orm_company():
+        db.expunge_all()
+        return (
+            db.query(models.Company)
+            .options(joinedload(models.Company.shareholdings).joinedload(models.Shareholding.person))
+            .filter(models.Company.id == 1)
+            .first()
+        )
+
+    def statement_company():
+        db.expunge_all()
+        return db.scalars(statements.COMPANY_WITH_SHAREHOLDERS, {"company_id": 1}).unique().first()
+
+    def orm_person():
+        db.expunge_all()
+        return (
+            db.query(models.Person)
+            .options(selectinload(models.Person.shareholdings))
+            .filter(models.Person.id == 1)
+            .first()
+        )
+
+    def statement_person():
+        db.expunge_all()
+        return db.scalars(statements.PERSON_WITH_SHAREHOLDINGS, {"person_id": 1}).first()
+
+    def orm_shareholdings():
+        db.expunge_all()
+        return (
+            db.query(models.Shareholding)
+            .filter(models.Shareholding.company_id == 1)
+            .order_by(models.Shareholding.id)
+            .offset(0)
+            .limit(100)
+            .all()
+        )
+
+    def statement_shareholdings():
+        db.expunge_all()
+        stmt = statements.shareholdings_page(True, False, False, False)
+        return db.scalars(stmt, {"company_id": 1, "skip": 0, "limit": 100}).all()
+
+    return {
+        f"lookup.get_company.orm_query[{shareholders}]": orm_company,
+        f"lookup.get_company.statement[{shareholders}]": statement_company,
+        "lookup.get_person.orm_query": orm_person,
+        "lookup.get_person.statement": statement_person,
+        f"lookup.list_shareholdings.orm_query[{shareholders}]": orm_shareholdings,
+        f"lookup.list_shareholdings.statement[{shareholders}]": statement_shareholdings,
+    }
+
+
+def measure(function: Callable, rounds: int = ROUNDS) -> dict:
+    timer = timeit.Timer(function)
+    loops, _ = timer.autorange()
+    timings = [elapsed / loops * 1e6 for elapsed in timer.repeat(repeat=rounds, number=loops)]
+    return {
+        "mean_us": round(statistics.mean(timings), 3),
+        "min_us": round(min(timings), 3),
+        "stdev_us": round(statistics.stdev(timings), 3) if len(timings) > 1 else 0.0,
+        "loops": loops,
+        "rounds": rounds,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serialization, query construction and lookup microbenchmarks")
+    parser.add_argument("--output", default="-", help="JSON results file, - for stdout")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--shareholders", type=int, nargs="+", default=[10, 500])
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    args = parser.parse_args(argv)
+
+    benchmarks = {}
+    for count in args.shareholders:
+        benchmarks.update(serialization_benchmarks(count))
+    for count in args.shareholders:
+        benchmarks.update(validation_benchmarks(count))
+    benchmarks.update(query_benchmarks())
+    for count in args.shareholders:
+        benchmarks.update(lookup_benchmarks(count))
+
+    results = {}
+    for name, function in benchmarks.items():
+        if args.filter in name:
+            results[name] = measure(function, args.rounds)
+            print(f"{name}: {results[name]['mean_us']:.1f} us", file=sys.stderr)
+    write_results(args.output, "micro", results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Any, Dict
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(path: str, kind: str, results: Dict[str, Any], **metadata) -> dict:
+    document = {
+        "kind": kind,
+        "created_at": datetime.utcnow().isoformat(),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        **metadata,
+        "results": results,
+    }
+    if path == "-":
+        json.dump(document, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        with open(path, "w", encoding="utf-8") as stream:
+            json.dump(document, stream, indent=2, default=str)
+    return document
+
+
+def read_results(path: str) -> dict:
+    with open(path, encoding="utf-8") as stream:
+        return json.load(stream)
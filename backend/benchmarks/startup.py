@@ -0,0 +1,102 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.results import write_results
+
+RUNS = 5
+PORT = 5055
+READY_TIMEOUT = 60.0
+# Routes requested right after startup; the first request after a cold
+# start pays for anything the lifespan warmup did not do.
+FIRST_REQUESTS = ("/companies/?view=summary&limit=20", "/companies/?limit=20", "/persons/?limit=20")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"
+
+
+def measure_import(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_cold_start(env: dict, port: int) -> Dict[str, float]:
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"server exited with code {server.returncode} during startup")
+                if time.perf_counter() - started > READY_TIMEOUT:
+                    raise RuntimeError("server did not become ready in time")
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    time.sleep(0.01)
+            timings = {"ready": time.perf_counter() - started}
+            for path in FIRST_REQUESTS:
+                for attempt in ("first", "second"):
+                    request_started = time.perf_counter()
+                    client.get(path).raise_for_status()
+                    timings[f"{attempt}_request {path}"] = time.perf_counter() - request_started
+            return timings
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def summarize(samples: List[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "min_ms": round(samples[0] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API import time and cold start to first request")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--no-warmup", action="store_true", help="start the server with DB_WARMUP=false")
+    parser.add_argument("--output", default="-", help="JSON results file, - for stdout")
+    args = parser.parse_args(argv)
+
+    # The server uses DATABASE_URL and the other settings from this environment
+    env = dict(os.environ)
+    if args.no_warmup:
+        env["DB_WARMUP"] = "false"
+
+    samples: Dict[str, List[float]] = {"startup.import": []}
+    for run in range(args.runs):
+        samples["startup.import"].append(measure_import(env))
+        for name, seconds in measure_cold_start(env, args.port).items():
+            samples.setdefault(f"startup.{name}", []).append(seconds)
+        print(f"run {run + 1}/{args.runs} done", file=sys.stderr)
+
+    results = {name: summarize(values) for name, values in samples.items()}
+    for name, result in results.items():
+        print(f"{name}: p50 {result['p50_ms']} ms", file=sys.stderr)
+    write_results(args.output, "startup", results, runs=args.runs, warmup=not args.no_warmup)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
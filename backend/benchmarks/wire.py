@@ -0,0 +1,99 @@
+import argparse
+import random
+import sys
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import encoding, models, schemas, serializers
+from benchmarks.micro import ROUNDS, measure
+from benchmarks.results import write_results
+
+COMPANIES = 100
+SHAREHOLDERS = 5
+SEED = 42
+
+
+def build_companies(companies: int, shareholders: int, seed: int) -> List[models.Company]:
+    # A /companies/ page of transient objects; persons hold stakes in several
+    # companies, as they do in the generated datasets.
+    rng = random.Random(seed)
+    now = datetime(2024, 1, 1, 12, 30, 15, 123456)
+    persons = [
+        models.Person(
+            id=index, type=models.PersonType.individual, first_name=rng.choice(["Mari", "Jaan", "Kati", "Peeter"]),
+            last_name=rng.choice(["Tamm", "Saar", "Kask", "Mägi"]), id_code=f"{rng.randint(3, 6)}{index:010d}",
+            created_at=now, updated_at=now,
+        )
+        for index in range(1, companies * shareholders // 2 + 2)
+    ]
+    result = []
+    for company_id in range(1, companies + 1):
+        capital = Decimal(rng.randint(25, 100000) * 100) / 100
+        company = models.Company(
+            id=company_id, name=f"Ettevõte {company_id} OÜ", reg_code=f"{10000000 + company_id:08d}"[1:],
+            founding_date=date(2000, 1, 1) + timedelta(days=rng.randint(0, 8000)), capital=capital,
+            created_at=now, updated_at=now,
+        )
+        for index, person in enumerate(rng.sample(persons, shareholders)):
+            company.shareholdings.append(models.Shareholding(
+                id=company_id * shareholders + index, company_id=company_id, person_id=person.id,
+                share=(capital / shareholders).quantize(Decimal("0.01")), is_founder=index == 0,
+                created_at=now, updated_at=now, person=person,
+            ))
+        result.append(company)
+    return result
+
+
+def encoders(payload: list) -> Dict[str, Callable[[], bytes]]:
+    return {
+        # What a plain response_model route does: validate, jsonable_encoder, stdlib json
+        "fastapi_json": lambda: JSONResponse(jsonable_encoder(
+            [schemas.CompanyWithShareholders.model_validate(item).model_dump(mode="json") for item in payload]
+        )).body,
+        "orjson": lambda: encoding.encode(payload, encoding.JSON),
+        "msgpack": lambda: encoding.encode(payload, encoding.MSGPACK),
+    }
+
+
+def run(companies: int, shareholders: int, seed: int, rounds: int) -> Dict[str, dict]:
+    persons = {}
+    payload = [serializers.company_payload(company, persons) for company in build_companies(companies, shareholders, seed)]
+    results = {}
+    for name, encode in encoders(payload).items():
+        body = encode()
+        for content_encoding in (None, *encoding.CONTENT_ENCODINGS):
+            if content_encoding is None:
+                wire, function = body, encode
+            else:
+                wire = encoding._Compressor(content_encoding).finish(body)
+                function = lambda encode=encode, content_encoding=content_encoding: (
+                    encoding._Compressor(content_encoding).finish(encode())
+                )
+            label = f"wire.companies[{companies}x{shareholders}].{name}.{content_encoding or 'identity'}"
+            results[label] = {"bytes": len(wire), **measure(function, rounds)}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Response size and encode time of a company list per wire format")
+    parser.add_argument("--companies", type=int, default=COMPANIES, help="companies on the page")
+    parser.add_argument("--shareholders", type=int, default=SHAREHOLDERS, help="shareholders per company")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--output", default="-", help="JSON results file, - for stdout")
+    args = parser.parse_args(argv)
+
+    results = run(args.companies, args.shareholders, args.seed, args.rounds)
+    for name, result in results.items():
+        print(f"{name}: {result['bytes']} bytes, {result['mean_us']:.1f} us", file=sys.stderr)
+    write_results(args.output, "wire", results, gzip_level=encoding.COMPRESSION_GZIP_LEVEL,
+                  brotli_quality=encoding.COMPRESSION_BROTLI_QUALITY)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Baseline schema as created by Base.metadata.create_all
+
+Databases created before migrations were introduced already have this
+schema; mark them with `alembic stamp 0001` and upgrade from there.
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-03-01
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "persons",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("type", sa.Enum("individual", "legal", name="persontype"), nullable=False),
+        sa.Column("first_name", sa.String(), nullable=True),
+        sa.Column("last_name", sa.String(), nullable=True),
+        sa.Column("id_code", sa.String(), nullable=True),
+        sa.Column("legal_name", sa.String(), nullable=True),
+        sa.Column("reg_code", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_persons_id", "persons", ["id"])
+    op.create_index("ix_persons_id_code", "persons", ["id_code"])
+    op.create_index("ix_persons_reg_code", "persons", ["reg_code"])
+
+    op.create_table(
+        "companies",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("reg_code", sa.String(length=7), nullable=False),
+        sa.Column("founding_date", sa.Date(), nullable=False),
+        sa.Column("capital", sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_companies_id", "companies", ["id"])
+    op.create_index("ix_companies_reg_code", "companies", ["reg_code"], unique=True)
+
+    op.create_table(
+        "shareholdings",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("company_id", sa.Integer(), nullable=False),
+        sa.Column("person_id", sa.Integer(), nullable=False),
+        sa.Column("share", sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column("is_founder", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["company_id"], ["companies.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["person_id"], ["persons.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_shareholdings_id", "shareholdings", ["id"])
+
+
+def downgrade():
+    op.drop_table("shareholdings")
+    op.drop_table("companies")
+    op.drop_table("persons")
+    sa.Enum(name="persontype").drop(op.get_bind(), checkfirst=True)
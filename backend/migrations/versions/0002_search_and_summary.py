@@ -0,0 +1,118 @@
+"""Search and sort indexes, unique person codes and the company_summary table
+
+Existing databases must merge duplicate persons (same id_code or reg_code)
+first. company_summary is filled from the existing companies, the same way
+app.summary.refresh_company_summaries builds its rows.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-03-15
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _fill_company_summary():
+    # Founder names in shareholding id order. SQLite has no ordered aggregate
+    # before 3.44, so there the order comes from the subquery.
+    if _is_postgresql():
+        founders = "string_agg(h.founder, ', ' ORDER BY h.id)"
+        now = "(now() AT TIME ZONE 'utc')"
+    else:
+        founders = "group_concat(h.founder, ', ')"
+        now = "CURRENT_TIMESTAMP"
+    display_name = (
+        "COALESCE(NULLIF(p.legal_name, ''), "
+        "TRIM(COALESCE(p.first_name, '') || ' ' || COALESCE(p.last_name, '')))"
+    )
+    op.execute(
+        "INSERT INTO company_summary (id, name, reg_code, founding_date, capital, created_at, "
+        "shareholder_count, founder_names, total_shares, updated_at) "
+        "SELECT c.id, c.name, c.reg_code, c.founding_date, c.capital, c.created_at, "
+        f"COUNT(h.id), COALESCE({founders}, ''), COALESCE(SUM(h.share), 0), {now} "
+        "FROM companies c LEFT JOIN ("
+        f"SELECT sh.id, sh.company_id, sh.share, CASE WHEN sh.is_founder THEN {display_name} END AS founder "
+        "FROM shareholdings sh JOIN persons p ON p.id = sh.person_id ORDER BY sh.company_id, sh.id"
+        ") h ON h.company_id = c.id "
+        "GROUP BY c.id, c.name, c.reg_code, c.founding_date, c.capital, c.created_at"
+    )
+
+
+def upgrade():
+    for column in ("id_code", "reg_code"):
+        # The data checks only run against a live database, not with --sql
+        if not op.get_context().as_sql:
+            duplicates = op.get_bind().execute(sa.text(
+                f"SELECT COUNT(*) FROM (SELECT {column} FROM persons WHERE {column} IS NOT NULL "
+                f"GROUP BY {column} HAVING COUNT(*) > 1) AS duplicates"
+            )).scalar()
+            if duplicates:
+                raise RuntimeError(f"persons has {duplicates} duplicated {column} values; merge them before upgrading")
+        op.drop_index(f"ix_persons_{column}", table_name="persons")
+        op.create_index(
+            f"uq_persons_{column}", "persons", [column], unique=True,
+            postgresql_where=sa.text(f"{column} IS NOT NULL"), sqlite_where=sa.text(f"{column} IS NOT NULL"),
+        )
+
+    op.create_index("ix_companies_name_id", "companies", ["name", "id"])
+    op.create_index("ix_companies_founding_date_id", "companies", ["founding_date", "id"])
+    op.create_index("ix_companies_capital_id", "companies", ["capital", "id"])
+
+    op.create_table(
+        "company_summary",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("reg_code", sa.String(length=7), nullable=False),
+        sa.Column("founding_date", sa.Date(), nullable=False),
+        sa.Column("capital", sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("shareholder_count", sa.Integer(), nullable=False),
+        sa.Column("founder_names", sa.String(), nullable=False),
+        sa.Column("total_shares", sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["id"], ["companies.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("reg_code"),
+    )
+    op.create_index("ix_company_summary_name_id", "company_summary", ["name", "id"])
+    op.create_index("ix_company_summary_founding_date_id", "company_summary", ["founding_date", "id"])
+    op.create_index("ix_company_summary_capital_id", "company_summary", ["capital", "id"])
+    _fill_company_summary()
+
+    if not _is_postgresql():
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "CREATE INDEX ix_persons_search_trgm ON persons USING gin "
+        "((coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || coalesce(legal_name, '')) gin_trgm_ops)"
+    )
+    op.execute("CREATE INDEX ix_persons_id_code_prefix ON persons (id_code varchar_pattern_ops)")
+    op.execute("CREATE INDEX ix_persons_reg_code_prefix ON persons (reg_code varchar_pattern_ops)")
+    op.execute("CREATE INDEX ix_companies_name_trgm ON companies USING gin (name gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_companies_reg_code_prefix ON companies (reg_code varchar_pattern_ops)")
+    op.execute("CREATE INDEX ix_company_summary_name_trgm ON company_summary USING gin (name gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_company_summary_reg_code_prefix ON company_summary (reg_code varchar_pattern_ops)")
+
+
+def downgrade():
+    if _is_postgresql():
+        for name in ("ix_persons_search_trgm", "ix_persons_id_code_prefix", "ix_persons_reg_code_prefix",
+                     "ix_companies_name_trgm", "ix_companies_reg_code_prefix"):
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.drop_table("company_summary")
+    op.drop_index("ix_companies_capital_id", table_name="companies")
+    op.drop_index("ix_companies_founding_date_id", table_name="companies")
+    op.drop_index("ix_companies_name_id", table_name="companies")
+    for column in ("id_code", "reg_code"):
+        op.drop_index(f"uq_persons_{column}", table_name="persons")
+        op.create_index(f"ix_persons_{column}", "persons", [column])
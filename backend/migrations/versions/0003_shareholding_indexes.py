@@ -0,0 +1,60 @@
+"""Foreign-key and covering indexes on shareholdings
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY, so
+the table stays writable while a large registry is upgraded.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-04-02
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+COVERING = {
+    "ix_shareholdings_company_id_id": (["company_id", "id"], ["person_id", "share", "is_founder", "updated_at"]),
+    "ix_shareholdings_person_id_id": (["person_id", "id"], ["company_id", "share", "is_founder", "updated_at"]),
+}
+
+
+def upgrade():
+    if not op.get_context().as_sql:
+        duplicates = op.get_bind().execute(sa.text(
+            "SELECT COUNT(*) FROM (SELECT company_id, person_id FROM shareholdings "
+            "GROUP BY company_id, person_id HAVING COUNT(*) > 1) AS duplicates"
+        )).scalar()
+        if duplicates:
+            raise RuntimeError(
+                f"shareholdings has {duplicates} duplicated (company_id, person_id) pairs; merge them before upgrading"
+            )
+
+    if op.get_bind().dialect.name != "postgresql":
+        with op.batch_alter_table("shareholdings") as batch:
+            batch.create_unique_constraint("uq_shareholdings_company_person", ["company_id", "person_id"])
+        for name, (columns, _) in COVERING.items():
+            op.create_index(name, "shareholdings", columns)
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_shareholdings_company_person", "shareholdings", ["company_id", "person_id"],
+            unique=True, postgresql_concurrently=True,
+        )
+        for name, (columns, include) in COVERING.items():
+            op.create_index(name, "shareholdings", columns, postgresql_include=include, postgresql_concurrently=True)
+    op.execute(
+        "ALTER TABLE shareholdings ADD CONSTRAINT uq_shareholdings_company_person "
+        "UNIQUE USING INDEX uq_shareholdings_company_person"
+    )
+
+
+def downgrade():
+    for name in COVERING:
+        op.drop_index(name, table_name="shareholdings")
+    with op.batch_alter_table("shareholdings") as batch:
+        batch.drop_constraint("uq_shareholdings_company_person", type_="unique")
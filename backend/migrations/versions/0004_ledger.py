@@ -0,0 +1,78 @@
+"""Append-only ledger of capital and shareholding events, with cap table snapshots
+
+The current capital and shareholdings of every company are recorded as its
+first events, dated at the rows' created_at.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-04-20
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+EVENT_TYPES = (
+    "company_registered", "capital_changed", "shareholding_added", "shareholding_changed", "shareholding_removed",
+)
+
+
+def _event_type(name: str) -> str:
+    if op.get_bind().dialect.name == "postgresql":
+        return f"CAST('{name}' AS ledgereventtype)"
+    return f"'{name}'"
+
+
+def upgrade():
+    op.create_table(
+        "ledger_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("company_id", sa.Integer(), nullable=False),
+        sa.Column("type", sa.Enum(*EVENT_TYPES, name="ledgereventtype"), nullable=False),
+        sa.Column("occurred_at", sa.DateTime(), nullable=False),
+        sa.Column("capital", sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.Column("shareholding_id", sa.Integer(), nullable=True),
+        sa.Column("person_id", sa.Integer(), nullable=True),
+        sa.Column("share", sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.Column("is_founder", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["company_id"], ["companies.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_ledger_events_company_occurred", "ledger_events", ["company_id", "occurred_at", "id"])
+
+    op.create_table(
+        "cap_table_snapshots",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("company_id", sa.Integer(), nullable=False),
+        sa.Column("event_id", sa.Integer(), nullable=False),
+        sa.Column("taken_at", sa.DateTime(), nullable=False),
+        sa.Column("capital", sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.Column("registered_at", sa.DateTime(), nullable=True),
+        sa.Column("holdings", sa.JSON(), nullable=False),
+        sa.ForeignKeyConstraint(["company_id"], ["companies.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_cap_table_snapshots_company_taken", "cap_table_snapshots", ["company_id", "taken_at", "event_id"]
+    )
+
+    op.execute(
+        "INSERT INTO ledger_events (company_id, type, occurred_at, capital) "
+        f"SELECT id, {_event_type('company_registered')}, COALESCE(created_at, CURRENT_TIMESTAMP), capital "
+        "FROM companies ORDER BY id"
+    )
+    op.execute(
+        "INSERT INTO ledger_events (company_id, type, occurred_at, shareholding_id, person_id, share, is_founder) "
+        f"SELECT company_id, {_event_type('shareholding_added')}, COALESCE(created_at, CURRENT_TIMESTAMP), "
+        "id, person_id, share, is_founder FROM shareholdings ORDER BY created_at, id"
+    )
+
+
+def downgrade():
+    op.drop_table("cap_table_snapshots")
+    op.drop_table("ledger_events")
+    sa.Enum(name="ledgereventtype").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,36 @@
+"""Company registry codes widened to the registry's 8 digits
+
+Existing 7-character codes are kept as they are. On PostgreSQL widening a
+varchar only changes the catalog, so the table is not rewritten.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-05-06
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+TABLES = ("companies", "company_summary")
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("reg_code", type_=sa.String(8), existing_type=sa.String(7), existing_nullable=False)
+
+
+def downgrade():
+    if not op.get_context().as_sql:
+        longer = op.get_bind().execute(sa.text("SELECT COUNT(*) FROM companies WHERE LENGTH(reg_code) > 7")).scalar()
+        if longer:
+            raise RuntimeError(f"companies has {longer} registry codes longer than 7 characters; change them before downgrading")
+
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("reg_code", type_=sa.String(7), existing_type=sa.String(8), existing_nullable=False)
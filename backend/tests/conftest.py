@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+import pytest
+
+# The app reads its settings when it is imported, so they are set first.
+# Tests migrate and seed an empty database: TEST_DATABASE_URL when given
+# (e.g. PostgreSQL for the index plan tests), otherwise a temporary SQLite file.
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ.pop("REPLICA_DATABASE_URL", None)
+os.environ["DB_ASYNC"] = "false"
+os.environ["DB_WARMUP"] = "false"
+# Query budgets are measured on the uncached path
+os.environ["COMPANY_CACHE_BACKEND"] = "none"
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import ALEMBIC_INI, SessionLocal, engine, migrate_database  # noqa: E402
+from app.models import Base  # noqa: E402
+from benchmarks.datagen import DatasetGenerator  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def database():
+    migrate_database()
+    db = SessionLocal()
+    try:
+        DatasetGenerator(companies=60, individuals=80, legal_persons=20, seed=7).load(db)
+    finally:
+        db.close()
+    yield engine
+    # The downgrades refuse to narrow columns holding data they would not fit
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    engine.dispose()
+    command.downgrade(Config(ALEMBIC_INI), "base")
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db(database):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
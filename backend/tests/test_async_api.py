@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from urllib.parse import urlencode
+
+import orjson
+import pytest
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.requests import Request
+
+from app import api, async_api, encoding, serializers
+from app.cache import LRUBackend, ResponseCache
+from app.database import ASYNC_DATABASE_URL
+
+LIST_PARAMS = {
+    "skip": 0, "limit": 5, "cursor": None, "name": None, "reg_code": None, "founded_from": None,
+    "founded_to": None, "capital_min": None, "capital_max": None, "shareholder": None, "sort": "id", "view": "full",
+}
+
+
+def _request(path: str, **params) -> Request:
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": urlencode(params).encode(),
+                    "headers": []})
+
+
+def _record_thread(monkeypatch, threads: list, owner, name: str):
+    original = getattr(owner, name)
+
+    def recorded(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(owner, name, recorded)
+
+
+def test_native_handlers_keep_cache_and_encoding_off_the_event_loop(client, monkeypatch):
+    driver = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}[make_url(ASYNC_DATABASE_URL).get_backend_name()]
+    pytest.importorskip(driver)
+    expected_detail = client.get("/companies/1").json()
+    expected_page = client.get("/companies/", params={"limit": 5}).json()
+
+    monkeypatch.setattr(api, "company_cache", ResponseCache(LRUBackend(maxsize=10, ttl=60)))
+    threads = []
+    _record_thread(monkeypatch, threads, api.company_cache, "get")
+    _record_thread(monkeypatch, threads, api.company_cache, "set")
+    _record_thread(monkeypatch, threads, serializers, "dumps")
+    _record_thread(monkeypatch, threads, encoding, "encode")
+
+    async def run():
+        engine = create_async_engine(ASYNC_DATABASE_URL)
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                detail = await async_api.get_company(db, 1, _request("/companies/1"))
+                page = await async_api.list_companies(db, _request("/companies/", limit=5), **LIST_PARAMS)
+        finally:
+            await engine.dispose()
+        return threading.get_ident(), detail, page
+
+    loop_thread, detail, page = asyncio.run(run())
+    assert orjson.loads(detail.body) == expected_detail
+    assert orjson.loads(page.body) == expected_page
+    assert threads and loop_thread not in threads
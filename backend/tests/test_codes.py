@@ -0,0 +1,28 @@
+import pytest
+
+from app import schemas
+from app.codes import validate_registry_code, with_check_digit
+
+
+def test_registry_code_takes_eight_digits():
+    code = with_check_digit("1006070")
+    assert validate_registry_code(code) == code
+
+
+@pytest.mark.parametrize("code", [with_check_digit("100607"), "1006070", "1006070x", "100607012"])
+def test_registry_code_rejects_other_lengths(code):
+    with pytest.raises(ValueError):
+        validate_registry_code(code)
+
+
+def test_registry_code_rejects_wrong_check_digit():
+    code = with_check_digit("1006070")
+    with pytest.raises(ValueError):
+        validate_registry_code(code[:-1] + str((int(code[-1]) + 1) % 10))
+
+
+def test_company_and_legal_person_share_the_code_format():
+    code = with_check_digit("1006070")
+    company = schemas.CompanyCreate(name="Kood OÜ", reg_code=code, founding_date="2020-01-01", capital="2500")
+    person = schemas.PERSON_CREATE.validate_python({"type": "legal", "legal_name": "Kood OÜ", "reg_code": code})
+    assert company.reg_code == person.reg_code == code
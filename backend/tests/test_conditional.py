@@ -0,0 +1,48 @@
+import pytest
+
+from app import api
+from app.cache import LRUBackend, ResponseCache
+
+PAGE = "/companies/?limit=50"
+
+
+def _vary(response) -> set:
+    return {value.strip() for value in response.headers.get("vary", "").split(",")}
+
+
+def test_etag_differs_per_content_coding(client):
+    plain = client.get(PAGE, headers={"Accept-Encoding": "identity"})
+    gzipped = client.get(PAGE, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] != plain.headers["etag"]
+    assert gzipped.json() == plain.json()
+
+
+def test_etag_differs_per_media_type(client):
+    as_json = client.get(PAGE)
+    as_msgpack = client.get(PAGE, headers={"Accept": "application/msgpack"})
+    assert as_msgpack.headers["etag"] != as_json.headers["etag"]
+
+    response = client.get(PAGE, headers={"Accept": "application/msgpack", "If-None-Match": as_json.headers["etag"]})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("sent, held", [("gzip", "gzip"), ("identity", "gzip"), ("gzip", "identity")])
+def test_not_modified_for_any_content_coding(client, sent, held):
+    etag = client.get(PAGE, headers={"Accept-Encoding": held}).headers["etag"]
+    response = client.get(PAGE, headers={"Accept-Encoding": sent, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert {"Accept", "Accept-Encoding"} <= _vary(response)
+
+
+def test_not_modified_from_company_cache(client, monkeypatch):
+    monkeypatch.setattr(api, "company_cache", ResponseCache(LRUBackend(maxsize=10, ttl=60)))
+    first = client.get("/companies/1", headers={"Accept": "application/msgpack"})
+    assert first.status_code == 200
+    cached = client.get(
+        "/companies/1", headers={"Accept": "application/msgpack", "If-None-Match": first.headers["etag"]}
+    )
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == first.headers["etag"]
+    assert {"Accept", "Accept-Encoding"} <= _vary(cached)
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from app import api, models
+from app.codes import with_check_digit
+
+
+def _individual(code: str) -> dict:
+    return {"type": "individual", "first_name": "Topelt", "last_name": "Isik", "id_code": with_check_digit(code)}
+
+
+def test_duplicate_person_code_is_a_conflict(client):
+    person = _individual("3900101777")
+    assert client.post("/persons/", json=person).status_code == 201
+    response = client.post("/persons/", json=person)
+    assert response.status_code == 409
+
+    other = client.post("/persons/", json=_individual("3900101778")).json()
+    response = client.put(f"/persons/{other['id']}", json=person)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "A person with this code already exists"
+
+
+def test_concurrent_new_shareholder_is_a_conflict(client, monkeypatch):
+    company = client.get("/companies/3").json()
+    resolve = api.resolve_person_ids
+
+    def resolve_and_race(db, shareholders):
+        # Another request makes the new person a shareholder after the
+        # handler checked the current holders
+        person_ids = resolve(db, shareholders)
+        db.execute(insert(models.Shareholding), [
+            {"company_id": company["id"], "person_id": person_ids[0], "share": Decimal(1)}
+        ])
+        return person_ids
+
+    monkeypatch.setattr(api, "resolve_person_ids", resolve_and_race)
+    shareholders = [
+        {"id": holder["id"], "type": holder["person"]["type"], "share": holder["share"],
+         "is_founder": holder["is_founder"]}
+        for holder in company["shareholders"]
+    ]
+    shareholders.append({**_individual("3900101779"), "share": "100", "is_founder": False})
+    response = client.put(f"/companies/{company['id']}/capital_update", json={
+        "original_capital": company["capital"],
+        "new_capital": str(Decimal(company["capital"]) + 100),
+        "shareholders": shareholders,
+    })
+    assert response.status_code == 409
+    assert "UNIQUE" not in response.text
+    assert client.get(f"/companies/{company['id']}").json()["capital"] == company["capital"]
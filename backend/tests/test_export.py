@@ -0,0 +1,22 @@
+import json
+from datetime import timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app import models
+
+
+def _exported_ids(client, updated_since: str) -> list:
+    response = client.get("/export/companies", params={"updated_since": updated_since})
+    assert response.status_code == 200
+    return [json.loads(line)["id"] for line in response.text.splitlines() if line]
+
+
+def test_updated_since_with_offset_is_compared_in_utc(client, db):
+    latest = db.scalar(select(func.max(models.Company.updated_at)))
+    expected = _exported_ids(client, latest.isoformat())
+    assert expected
+
+    plus_two = timezone(timedelta(hours=2))
+    aware = latest.replace(tzinfo=timezone.utc).astimezone(plus_two)
+    assert _exported_ids(client, aware.isoformat()) == expected
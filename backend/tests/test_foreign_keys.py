@@ -0,0 +1,29 @@
+from sqlalchemy import func, select
+
+from app import models
+from app.codes import with_check_digit
+
+
+def test_deleting_company_removes_its_rows(client, db):
+    response = client.post("/companies/registration", json={
+        "name": "Kustutatav OÜ",
+        "reg_code": with_check_digit("8800001"),
+        "founding_date": "2020-01-01",
+        "capital": "2500",
+        "shareholders": [{
+            "type": "individual",
+            "first_name": "Kaarel",
+            "last_name": "Kustutaja",
+            "id_code": with_check_digit("3800101888"),
+            "share": "2500",
+        }],
+    })
+    assert response.status_code == 201, response.text
+    company_id = response.json()["id"]
+
+    assert client.delete(f"/companies/{company_id}").status_code == 204
+
+    for model in (models.Shareholding, models.LedgerEvent, models.CapTableSnapshot):
+        remaining = db.scalar(select(func.count()).select_from(model).where(model.company_id == company_id))
+        assert remaining == 0, model.__tablename__
+    assert db.get(models.CompanySummary, company_id) is None
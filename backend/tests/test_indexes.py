@@ -0,0 +1,21 @@
+import pytest
+
+from benchmarks.explain import CHECKS, plan_indexes
+
+
+@pytest.fixture(scope="module")
+def connection(database):
+    with database.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # The test dataset is small enough that a sequential scan is
+            # always cheapest; this asks whether the index can serve the query.
+            connection.exec_driver_sql("SET enable_seqscan = off")
+        yield connection
+
+
+@pytest.mark.parametrize("check", CHECKS, ids=[check.name for check in CHECKS])
+def test_plan_uses_index(connection, check):
+    if check.dialect and check.dialect != connection.dialect.name:
+        pytest.skip(f"{check.name} only applies to {check.dialect}")
+    used = plan_indexes(connection, check.statement())
+    assert any(index in used for index in check.indexes), f"{check.name} used {used or 'no index'}"
@@ -0,0 +1,44 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from app import ledger, models
+
+
+def _company(db, reg_code: str, created_at: datetime) -> models.Company:
+    company = models.Company(
+        name=f"Ajalugu {reg_code} OÜ", reg_code=reg_code, founding_date=date(2020, 1, 1),
+        capital=Decimal("2500"), created_at=created_at,
+    )
+    db.add(company)
+    db.flush()
+    return company
+
+
+def test_replays_events_dated_before_the_snapshot(db, monkeypatch):
+    # An event can be dated before a snapshot that was taken first, when its
+    # transaction started earlier and committed later.
+    monkeypatch.setattr(ledger, "LEDGER_SNAPSHOT_INTERVAL", 1)
+    started = datetime(2024, 1, 1, 12)
+    company = _company(db, "7700001", started)
+    ledger.record_ledger_events(db, [company.id], occurred_at=started + timedelta(minutes=5))
+    db.commit()
+
+    company.capital = Decimal("5000")
+    ledger.record_ledger_events(db, [company.id], occurred_at=started + timedelta(minutes=1))
+    db.commit()
+
+    state = ledger.cap_table_as_of(db, company.id, started + timedelta(hours=1))
+    assert state["capital"] == Decimal("5000")
+
+
+def test_company_as_of_keeps_created_at(db):
+    created = datetime(2024, 2, 1, 9)
+    company = _company(db, "7700002", created)
+    registered = created + timedelta(days=3)
+    ledger.record_ledger_events(db, [company.id], occurred_at=registered)
+    db.commit()
+
+    payload = ledger.company_as_of(db, company.id, registered + timedelta(days=1))
+    assert payload["created_at"] == created
+    assert payload["registered_at"] == registered
+    assert ledger.company_as_of(db, company.id, registered - timedelta(days=1)) is None
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, text
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _migrate(url: str, revision: str):
+    # A separate process, since the app reads DATABASE_URL when imported
+    subprocess.run(
+        [sys.executable, "-m", "app.manage", "migrate", "--revision", revision],
+        cwd=BACKEND, env={**os.environ, "DATABASE_URL": url}, check=True, capture_output=True,
+    )
+
+
+def test_summary_filled_from_existing_companies(tmp_path):
+    url = f"sqlite:///{tmp_path}/upgrade.db"
+    _migrate(url, "0001")
+    engine = create_engine(url)
+    now = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO persons (id, type, first_name, last_name, legal_name, created_at, updated_at) VALUES "
+            "(1, 'individual', 'Mari', 'Tamm', NULL, :now, :now), "
+            "(2, 'legal', NULL, NULL, 'Tamm Investeeringud OÜ', :now, :now), "
+            "(3, 'individual', 'Jaan', 'Kask', NULL, :now, :now)"
+        ), {"now": now})
+        connection.execute(text(
+            "INSERT INTO companies (id, name, reg_code, founding_date, capital, created_at, updated_at) VALUES "
+            "(1, 'Vana OÜ', '1000001', :founded, 3000, :now, :now), "
+            "(2, 'Tühi OÜ', '1000002', :founded, 2500, :now, :now)"
+        ), {"now": now, "founded": date(2020, 1, 1)})
+        connection.execute(text(
+            "INSERT INTO shareholdings (id, company_id, person_id, share, is_founder, created_at, updated_at) VALUES "
+            "(1, 1, 2, 1000, 1, :now, :now), (2, 1, 3, 500, 0, :now, :now), (3, 1, 1, 1500, 1, :now, :now)"
+        ), {"now": now})
+
+    _migrate(url, "head")
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT id, reg_code, shareholder_count, founder_names, total_shares FROM company_summary ORDER BY id"
+        )).all()
+    engine.dispose()
+    assert [tuple(row) for row in rows] == [
+        (1, "1000001", 3, "Tamm Investeeringud OÜ, Mari Tamm", 3000),
+        (2, "1000002", 0, "", 0),
+    ]
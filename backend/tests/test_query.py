@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import func, select
+
+from app import models
+from app.query import BatchLoader, QueryError
+
+
+def test_batch_loader_stops_at_max_rows(db):
+    loader = BatchLoader(db, max_rows=10)
+    for company_id in range(1, 61):
+        loader.want("shareholdings", "company_id", company_id)
+    with pytest.raises(QueryError):
+        loader.dispatch()
+    # Only the rows up to the budget and one more were read
+    assert loader.loaded == 11
+
+
+def test_batch_loader_loads_up_to_max_rows(db):
+    total = db.scalar(select(func.count()).select_from(models.Shareholding))
+    loader = BatchLoader(db, max_rows=total)
+    for company_id in range(1, 61):
+        loader.want("shareholdings", "company_id", company_id)
+    loader.dispatch()
+    assert loader.loaded == total
+
+
+def _first_company_holdings(db) -> tuple:
+    company_id = db.scalar(select(models.Shareholding.company_id).order_by(models.Shareholding.id).limit(1))
+    holdings = db.scalars(select(models.Shareholding.id).where(models.Shareholding.company_id == company_id)).all()
+    return company_id, holdings
+
+
+def test_batch_loader_does_not_count_loaded_rows(db):
+    # Looking a relation up again only finds rows the loader already holds,
+    # which fits the budget however close to it the loader is.
+    company_id, holdings = _first_company_holdings(db)
+    loader = BatchLoader(db, max_rows=len(holdings))
+    for shareholding_id in holdings:
+        loader.want("shareholdings", "id", shareholding_id)
+    loader.dispatch()
+    loader.want("shareholdings", "company_id", company_id)
+    loader.dispatch()
+    assert sorted(row.id for row in loader.load("shareholdings", "company_id", company_id)) == sorted(holdings)
+    assert loader.loaded == len(holdings)
+
+
+def test_batch_loader_rejects_one_new_row_over_budget(db):
+    company_id, holdings = _first_company_holdings(db)
+    assert len(holdings) > 1
+    loader = BatchLoader(db, max_rows=len(holdings) - 1)
+    for shareholding_id in holdings[:-1]:
+        loader.want("shareholdings", "id", shareholding_id)
+    loader.dispatch()
+    loader.want("shareholdings", "company_id", company_id)
+    with pytest.raises(QueryError):
+        loader.dispatch()
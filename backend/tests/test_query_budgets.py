@@ -0,0 +1,69 @@
+from itertools import count
+
+import pytest
+
+from app.codes import with_check_digit
+from app.metrics import count_queries
+
+_numbers = count(1)
+
+
+def queries(client, method: str, url: str, **kwargs) -> int:
+    with count_queries() as stats:
+        response = client.request(method, url, **kwargs)
+    assert response.status_code < 300, response.text
+    return stats.queries
+
+
+def _registration(shareholders: int) -> dict:
+    number = next(_numbers)
+    return {
+        "name": f"Budget {number} OÜ",
+        "reg_code": with_check_digit(f"9{number:06d}"),
+        "founding_date": "2020-01-01",
+        "capital": str(shareholders * 100),
+        "shareholders": [
+            {
+                "type": "individual",
+                "first_name": "Eelarve",
+                "last_name": f"Test{number}",
+                "id_code": with_check_digit(f"5000101{number % 10}{index:02d}"),
+                "share": "100",
+            }
+            for index in range(shareholders)
+        ],
+    }
+
+
+@pytest.mark.parametrize("view, budget", [(None, 3), ("summary", 1), ("full", 3)])
+def test_company_list(client, view, budget):
+    params = {"view": view} if view else {}
+    small = queries(client, "GET", "/companies/", params={**params, "limit": 5})
+    large = queries(client, "GET", "/companies/", params={**params, "limit": 50})
+    assert large == small
+    assert large <= budget
+
+
+def test_company_detail(client):
+    assert queries(client, "GET", "/companies/1") <= 3
+    assert queries(client, "GET", "/companies/2") <= 3
+
+
+@pytest.mark.parametrize("search", ["Tamm", "Mari Tamm", "Tamm 4", "4"])
+def test_person_search(client, search):
+    assert queries(client, "GET", "/persons/", params={"search": search, "limit": 50}) <= 1
+
+
+def test_person_detail(client):
+    # Version check (person + holdings), person, holdings with companies
+    assert queries(client, "GET", "/persons/1") <= 4
+    assert queries(client, "GET", "/persons/5") <= 4
+
+
+def test_registration(client):
+    # New shareholders are looked up and inserted in one statement each,
+    # however many there are
+    one = queries(client, "POST", "/companies/registration", json=_registration(1))
+    eight = queries(client, "POST", "/companies/registration", json=_registration(8))
+    assert eight == one
+    assert eight <= 14
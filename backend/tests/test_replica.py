@@ -0,0 +1,22 @@
+import time
+
+import pytest
+from starlette.requests import Request
+
+from app.replica import LAST_WRITE_HEADER, reads_from_primary
+
+
+def _request(last_write: str) -> Request:
+    headers = [(LAST_WRITE_HEADER.lower().encode(), last_write.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.mark.parametrize("offset, expected", [(-1, True), (-10, False), (60, False), (1e12, False)])
+def test_reads_from_primary_within_window(offset, expected):
+    request = _request(f"{time.time() + offset:.3f}")
+    assert reads_from_primary(request, window=5) is expected
+
+
+@pytest.mark.parametrize("value", ["inf", "nan", "soon"])
+def test_reads_from_primary_ignores_invalid_write_times(value):
+    assert reads_from_primary(_request(value), window=5) is False
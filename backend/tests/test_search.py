@@ -0,0 +1,25 @@
+import pytest
+
+from app.codes import with_check_digit
+
+ID_CODE = with_check_digit("3850505123")
+
+
+@pytest.fixture(scope="module")
+def person(client):
+    response = client.post("/persons/", json={
+        "type": "individual", "first_name": "Laur", "last_name": "Otsinguproov", "id_code": ID_CODE,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+@pytest.mark.parametrize("search", ["Laur Otsinguproov", "otsinguproov laur", "Otsinguproov 38505", "3850505 laur"])
+def test_person_search_matches_tokens_in_any_order(client, person, search):
+    found = client.get("/persons/", params={"search": search}).json()
+    assert [match["id"] for match in found] == [person["id"]]
+
+
+@pytest.mark.parametrize("search", ["Laur Otsinguproov Kask", "Otsinguproov 39"])
+def test_person_search_requires_every_token(client, person, search):
+    assert client.get("/persons/", params={"search": search}).json() == []